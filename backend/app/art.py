@@ -0,0 +1,272 @@
+import asyncio
+import base64
+import hashlib
+import io
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+from urllib.parse import urlparse
+
+import httpx
+from fastapi import Request
+from fastapi.responses import FileResponse, Response
+from . import cache, clients, singleflight
+
+# Cover art proxy: Track.coverArt points at /api/v1/art/{id}, where the id encodes the
+# upstream image (size parameters stripped). Each image is fetched once, stored on disk
+# under the SHA-256 of its bytes and served in a few sizes with immutable cache headers.
+ART_PROXY_ENABLED = os.getenv("ART_PROXY_ENABLED", "true").lower() == "true"
+ART_CACHE_DIR = os.getenv("ART_CACHE_DIR", "/tmp/lyricgen-art")
+ART_CACHE_MAX_BYTES = int(os.getenv("ART_CACHE_MAX_BYTES", str(512 * 1024 ** 2)))
+ART_WORKERS = int(os.getenv("ART_WORKERS", "2"))
+ART_PATH = "/api/v1/art"
+
+SIZES = (96, 256, 544)
+QUALITY = {96: 70, 256: 78, 544: 85}   # smaller thumbnails tolerate more compression
+ORIGINAL_SIZE = 1200                    # fetched once and resized locally when Pillow is present
+MEDIA_TYPES = {"webp": "image/webp", "jpeg": "image/jpeg"}
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+TOUCH_INTERVAL = 86400   # refresh a blob's mtime (its eviction age) at most this often
+# Every worker writes into the same directory: each one measures it from disk after
+# storing this much, so together they overshoot the budget by a few percent at most
+MEASURE_AFTER = ART_CACHE_MAX_BYTES // 100
+
+# Hosts we proxy for, and how each one is asked for a given size and format
+_GOOGLE = (".googleusercontent.com", ".ggpht.com")
+_ITUNES = (".mzstatic.com",)
+_ITUNES_SIZE_RE = re.compile(r"/\d+x\d+(bb)?(-\d+)?\.(jpg|jpeg|png|webp)$")
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None   # without Pillow (a requirement, but optional here) each size is fetched from the upstream's own resizer
+
+_executor = ThreadPoolExecutor(max_workers=ART_WORKERS, thread_name_prefix="art")
+_written = 0   # bytes this worker stored since it last measured ART_CACHE_DIR
+_written_lock = threading.Lock()
+
+stats = {"hits": 0, "misses": 0, "fetches": 0, "renders": 0, "errors": 0, "evictions": 0}
+
+
+@dataclass
+class Variant:
+    path: str
+    sha: str
+    media_type: str
+
+
+def _host(url: str) -> str:
+    return urlparse(url).hostname or ""
+
+def _source(url: str) -> Optional[str]:
+    """The upstream image without its size parameters, if it is one we proxy"""
+    host = _host(url)
+    if urlparse(url).scheme != "https":
+        return None
+    if host.endswith(_GOOGLE):
+        return url.split("=", 1)[0]
+    if host.endswith(_ITUNES):
+        return _ITUNES_SIZE_RE.sub("/{size}x{size}bb.{ext}", url) if _ITUNES_SIZE_RE.search(url) else None
+    return None
+
+def _sized(source: str, size: int, fmt: str) -> str:
+    if _host(source).endswith(_GOOGLE):
+        return f"{source}=w{size}-h{size}-l90-{'rw' if fmt == 'webp' else 'rj'}"
+    # Plain replacement: ids come from clients, and str.format would evaluate {size.attr}
+    return source.replace("{size}", str(size)).replace("{ext}", "webp" if fmt == "webp" else "jpg")
+
+def art_id(url: Optional[str]) -> Optional[str]:
+    source = _source(url) if url else None
+    if source is None:
+        return None
+    return base64.urlsafe_b64encode(source.encode()).decode().rstrip("=")
+
+def url_for(url: Optional[str]) -> Optional[str]:
+    """What Track.coverArt should carry: the proxy path, or the URL untouched if we can't proxy it"""
+    identifier = art_id(url) if ART_PROXY_ENABLED else None
+    return f"{ART_PATH}/{identifier}" if identifier else url
+
+def _decode(identifier: str) -> Optional[str]:
+    try:
+        source = base64.urlsafe_b64decode(identifier + "=" * (-len(identifier) % 4)).decode()
+        # Only ids we could have issued: anything else would make this an open proxy
+        if _source(_sized(source, ORIGINAL_SIZE, "jpeg")) != source:
+            return None
+    except (ValueError, KeyError, IndexError):
+        return None
+    return source
+
+def snap(size: int) -> int:
+    """The smallest variant at least this large"""
+    return next((s for s in SIZES if s >= size), SIZES[-1])
+
+
+# ============ DISK ============
+
+def _path(sha: str) -> str:
+    return os.path.join(ART_CACHE_DIR, sha[:2], sha)
+
+def load():
+    """Bring what is on disk within budget (the index itself lives in the "art" cache namespace)"""
+    _evict()
+
+def _store(data: bytes) -> str:
+    """Runs on the art pool: write a blob under its hash"""
+    global _written
+    sha = hashlib.sha256(data).hexdigest()
+    path = _path(sha)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        with _written_lock:
+            _written += len(data)
+            measure = _written >= MEASURE_AFTER
+            if measure:
+                _written = 0
+        if measure:
+            _evict()
+    return sha
+
+def _evict():
+    """Drop the blobs used least recently until the directory is back under 90% of the budget"""
+    blobs = []
+    for root, _dirs, names in os.walk(ART_CACHE_DIR):
+        for name in names:
+            path = os.path.join(root, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            blobs.append((st.st_mtime, st.st_size, path))
+    total = sum(size for _mtime, size, _path in blobs)
+    if total <= ART_CACHE_MAX_BYTES:
+        return
+    for _mtime, size, path in sorted(blobs):
+        if total <= ART_CACHE_MAX_BYTES * 0.9:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        stats["evictions"] += 1
+
+def _cached(key: str) -> Optional[Variant]:
+    entry = cache.get("art", key)
+    if entry is None:
+        return None
+    path = _path(entry["sha"])
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return None   # evicted since
+    if time.time() - mtime > TOUCH_INTERVAL:
+        os.utime(path)
+    return Variant(path, entry["sha"], entry["media_type"])
+
+
+# ============ FETCH & RESIZE ============
+
+async def _on_pool(fn, *args):
+    """Disk and image work runs on the art pool, off the event loop"""
+    return await asyncio.get_running_loop().run_in_executor(_executor, fn, *args)
+
+def _read(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+async def _fetch(url: str) -> Optional[tuple[bytes, str]]:
+    try:
+        response = await clients.request("art", "GET", url)
+    except httpx.HTTPError as e:
+        print(f"Cover art fetch error: {e}")
+        return None
+    if response.status_code != 200 or not response.headers.get("content-type", "").startswith("image/"):
+        print(f"Cover art fetch error: {response.status_code} for {url}")
+        return None
+    stats["fetches"] += 1
+    return response.content, response.headers["content-type"].split(";")[0]
+
+@singleflight.coalesce("art.original", key=lambda source: source)
+async def _original(source: str) -> Optional[bytes]:
+    """The full-size source image, fetched once"""
+    key = f"{source}:original"
+    variant = _cached(key)
+    if variant is not None:
+        try:
+            return await _on_pool(_read, variant.path)
+        except OSError:
+            pass   # evicted since: fetch it again
+    fetched = await _fetch(_sized(source, ORIGINAL_SIZE, "jpeg"))
+    if fetched is None:
+        return None
+    data, media_type = fetched
+    cache.set("art", key, {"sha": await _on_pool(_store, data), "media_type": media_type})
+    return data
+
+def _render(data: bytes, size: int, fmt: str) -> bytes:
+    """Runs on the art pool: crop to a square of at most size pixels and encode"""
+    with Image.open(io.BytesIO(data)) as image:
+        image = image.convert("RGB")
+        side = min(size, *image.size)
+        image = ImageOps.fit(image, (side, side), Image.LANCZOS)
+        out = io.BytesIO()
+        if fmt == "webp":
+            image.save(out, "WEBP", quality=QUALITY[size], method=4)
+        else:
+            image.save(out, "JPEG", quality=QUALITY[size], optimize=True, progressive=True)
+        return out.getvalue()
+
+@singleflight.coalesce("art.variant", key=lambda source, size, fmt: (source, size, fmt))
+async def _variant(source: str, size: int, fmt: str) -> Optional[Variant]:
+    if Image is not None:
+        original = await _original(source)
+        if original is None:
+            return None
+        try:
+            data = await _on_pool(_render, original, size, fmt)
+        except (OSError, ValueError) as e:
+            print(f"Cover art resize error: {e}")
+            stats["errors"] += 1
+            return None
+        stats["renders"] += 1
+        media_type = MEDIA_TYPES[fmt]
+    else:
+        fetched = await _fetch(_sized(source, size, fmt))
+        if fetched is None:
+            stats["errors"] += 1
+            return None
+        data, media_type = fetched
+    sha = await _on_pool(_store, data)
+    cache.set("art", f"{source}:{size}:{fmt}", {"sha": sha, "media_type": media_type})
+    return Variant(_path(sha), sha, media_type)
+
+async def get(identifier: str, size: int, fmt: str) -> Optional[Variant]:
+    """The stored variant for an art id, produced on first request; None if the id is not ours"""
+    source = _decode(identifier)
+    if source is None:
+        return None
+    size = snap(size)
+    variant = _cached(f"{source}:{size}:{fmt}")
+    if variant is not None:
+        stats["hits"] += 1
+        return variant
+    stats["misses"] += 1
+    return await _variant(source, size, fmt)
+
+def serve(request: Request, variant: Variant, negotiated: bool) -> Response:
+    """Immutable response with the content hash as a strong ETag"""
+    headers = {"ETag": f'"{variant.sha}"', "Cache-Control": CACHE_CONTROL}
+    if negotiated:
+        headers["Vary"] = "Accept"
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or headers["ETag"] in [t.strip().removeprefix("W/") for t in if_none_match.split(",")]):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(variant.path, media_type=variant.media_type, headers=headers)
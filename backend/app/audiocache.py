@@ -0,0 +1,346 @@
+import asyncio
+import json
+import os
+import re
+from collections import OrderedDict
+from typing import Optional
+from urllib.parse import urlparse, parse_qs
+
+import anyio
+import httpx
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+# On-disk byte-range cache for proxied audio: each stream (video id + itag) is a sparse
+# file plus a JSON index of the byte ranges present. Covered ranges are served from disk.
+# Every worker shares the directory, so the size budget is checked against what is on
+# disk (least recently used files go first), not against this worker's own entries, and
+# the ranges held in memory are checked against the index on disk before they are served.
+AUDIO_CACHE_ENABLED = os.getenv("AUDIO_CACHE_ENABLED", "true").lower() == "true"
+AUDIO_CACHE_DIR = os.getenv("AUDIO_CACHE_DIR", "/tmp/lyricgen-audio")
+AUDIO_CACHE_MAX_BYTES = int(os.getenv("AUDIO_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+AUDIO_CACHE_FILL_AFTER = int(os.getenv("AUDIO_CACHE_FILL_AFTER", "3"))  # plays before a full background fetch
+READ_CHUNK_SIZE = 64 * 1024
+
+_RANGE_RE = re.compile(r"bytes=(\d+)-(\d*)$")
+_CONTENT_RANGE_RE = re.compile(r"bytes (\d+)-(\d+)/(\d+)")
+
+stats = {"hits": 0, "misses": 0, "bytes_from_cache": 0, "bytes_from_upstream": 0, "evictions": 0, "fills": 0}
+
+
+class Entry:
+    def __init__(self, key: str, size: int, mime_type: str, ranges: Optional[list] = None, plays: int = 0):
+        self.key = key
+        self.size = size
+        self.mime_type = mime_type
+        self.ranges: list[list[int]] = ranges or []  # sorted, merged [start, end) pairs
+        self.plays = plays
+        self.filling = False
+        self.signature: Optional[tuple] = None   # the index file these ranges were read from or saved to
+
+    @property
+    def path(self) -> str:
+        return os.path.join(AUDIO_CACHE_DIR, f"{self.key}.bin")
+
+    @property
+    def index_path(self) -> str:
+        return os.path.join(AUDIO_CACHE_DIR, f"{self.key}.json")
+
+    @property
+    def complete(self) -> bool:
+        return self.ranges == [[0, self.size]]
+
+    def covers(self, start: int, end: int) -> bool:
+        return any(a <= start and end <= b for a, b in self.ranges)
+
+    def add(self, start: int, end: int):
+        merged = []
+        for a, b in sorted(self.ranges + [[start, end]]):
+            if merged and a <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], b)
+            else:
+                merged.append([a, b])
+        self.ranges = merged
+
+    def save(self):
+        # Replaced in one step, so another worker never reads half an index
+        tmp = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"size": self.size, "mime_type": self.mime_type, "ranges": self.ranges, "plays": self.plays}, f)
+        os.replace(tmp, self.index_path)
+        self.signature = _signature(self.index_path)
+
+    def refresh(self) -> bool:
+        """Bring the ranges up to date with the index on disk; False if the index is gone or
+        describes a different stream (another worker evicted the file, maybe recreated it)"""
+        try:
+            signature = _signature(self.index_path)
+            if signature == self.signature:
+                return True
+            with open(self.index_path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if data.get("size") != self.size:
+            return False
+        self.ranges, self.signature = data["ranges"], signature
+        return True
+
+    def commit(self, fd: int, start: int, end: int) -> bool:
+        """Record a range written through fd, unless its file was evicted meanwhile"""
+        try:
+            if os.fstat(fd).st_ino != os.stat(self.path).st_ino:
+                return False
+        except OSError:
+            return False
+        if not self.refresh():
+            self.ranges = []
+        self.add(start, end)
+        try:
+            self.save()
+        except OSError as e:
+            print(f"Audio cache index error: {e}")
+            return False
+        return True
+
+
+def _signature(path: str) -> tuple:
+    stat = os.stat(path)
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+# Least recently used first
+_entries: "OrderedDict[str, Entry]" = OrderedDict()
+_background: set[asyncio.Task] = set()
+
+
+def load():
+    """Rebuild the in-memory index from disk"""
+    if not AUDIO_CACHE_ENABLED:
+        return
+    os.makedirs(AUDIO_CACHE_DIR, exist_ok=True)
+    found = []
+    for name in os.listdir(AUDIO_CACHE_DIR):
+        if not name.endswith(".json"):
+            continue
+        path = os.path.join(AUDIO_CACHE_DIR, name)
+        try:
+            with open(path) as f:
+                data = json.load(f)
+            entry = Entry(name[:-5], data["size"], data["mime_type"], data["ranges"], data.get("plays", 0))
+            entry.signature = _signature(path)
+            found.append((os.path.getmtime(path), entry))
+        except (OSError, ValueError, KeyError):
+            continue
+    for _mtime, entry in sorted(found, key=lambda item: item[0]):
+        _entries[entry.key] = entry
+    _evict(_usage())
+
+
+def key_for(video_id: str, url: str) -> str:
+    """Cache key for a resolved stream; the itag keeps different formats apart"""
+    itag = parse_qs(urlparse(url).query).get("itag", ["0"])[0]
+    return f"{video_id}-{itag}"
+
+
+def parse_range(header: Optional[str]) -> Optional[tuple[int, Optional[int]]]:
+    """(start, inclusive end or None) for a single bytes=a-b range; None if unsupported"""
+    if not header:
+        return 0, None
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    start, end = match.groups()
+    return int(start), int(end) if end else None
+
+
+def complete_path(key: str) -> Optional[str]:
+    """The cached file, if the whole stream is on disk"""
+    entry = _entries.get(key)
+    return entry.path if entry is not None and entry.refresh() and entry.complete else None
+
+
+def lookup(key: str, range_header: Optional[str]) -> Optional["RangeFileResponse"]:
+    """A response served from disk if the requested range is fully cached"""
+    byte_range = parse_range(range_header)
+    entry = _entries.get(key)
+    if entry is None or byte_range is None:
+        stats["misses"] += 1
+        return None
+    if not entry.refresh():
+        _entries.pop(key, None)
+        stats["misses"] += 1
+        return None
+    start, end = byte_range
+    end = entry.size - 1 if end is None else min(end, entry.size - 1)
+    if start > end or not entry.covers(start, end + 1):
+        stats["misses"] += 1
+        return None
+    try:
+        response = RangeFileResponse(entry, start, end, partial=range_header is not None)
+        os.utime(entry.path)   # recently used, for every worker's eviction
+    except OSError:
+        # Evicted by another worker just now
+        _entries.pop(key, None)
+        stats["misses"] += 1
+        return None
+    _entries.move_to_end(key)
+    stats["hits"] += 1
+    stats["bytes_from_cache"] += end - start + 1
+    return response
+
+
+def writer(key: str, response: httpx.Response) -> Optional["Writer"]:
+    """A write-through sink for an upstream response, if it can be cached"""
+    if not AUDIO_CACHE_ENABLED or response.status_code not in (200, 206):
+        return None
+    if response.status_code == 206:
+        match = _CONTENT_RANGE_RE.match(response.headers.get("Content-Range", ""))
+        if not match:
+            return None
+        offset, total = int(match.group(1)), int(match.group(3))
+    else:
+        if "Content-Length" not in response.headers:
+            return None
+        offset, total = 0, int(response.headers["Content-Length"])
+
+    entry = _entries.get(key)
+    # A file another worker evicted takes the ranges it held with it
+    if entry is not None and entry.ranges and not entry.refresh():
+        entry.ranges = []
+    if entry is None or entry.size != total:
+        entry = Entry(key, total, response.headers.get("Content-Type", "audio/webm"))
+        _entries[key] = entry
+    _entries.move_to_end(key)
+    return Writer(entry, offset)
+
+
+class Writer:
+    """Writes upstream chunks into the sparse file at their byte offsets"""
+
+    def __init__(self, entry: Entry, offset: int):
+        self.entry = entry
+        self.start = offset
+        self.offset = offset
+        self.fd: Optional[int] = None
+        try:
+            os.makedirs(AUDIO_CACHE_DIR, exist_ok=True)
+            self.fd = os.open(entry.path, os.O_RDWR | os.O_CREAT, 0o644)
+        except OSError as e:
+            print(f"Audio cache open error: {e}")
+
+    async def write(self, chunk: bytes):
+        stats["bytes_from_upstream"] += len(chunk)
+        if self.fd is None:
+            return
+        try:
+            # On a worker thread: a slow disk must not hold up the event loop
+            await anyio.to_thread.run_sync(os.pwrite, self.fd, chunk, self.offset)
+            self.offset += len(chunk)
+        except OSError as e:
+            print(f"Audio cache write error: {e}")
+            await self.close()
+
+    async def close(self):
+        if self.fd is None:
+            return
+        fd, self.fd = self.fd, None
+        try:
+            # Skip entries evicted or replaced while we were writing
+            if self.offset > self.start and _entries.get(self.entry.key) is self.entry:
+                if await anyio.to_thread.run_sync(self.entry.commit, fd, self.start, self.offset):
+                    _evict(await anyio.to_thread.run_sync(_usage))
+        finally:
+            os.close(fd)
+
+
+def _usage() -> list[tuple[float, int, str]]:
+    """(mtime, bytes on disk, key) for every cached stream, whichever worker wrote it"""
+    found = []
+    try:
+        with os.scandir(AUDIO_CACHE_DIR) as scan:
+            for item in scan:
+                if item.name.endswith(".bin"):
+                    stat = item.stat()
+                    # Allocated blocks: a sparse file only takes up the ranges written to it
+                    found.append((stat.st_mtime, stat.st_blocks * 512, item.name[:-4]))
+    except OSError:
+        pass
+    return found
+
+def _evict(usage: list[tuple[float, int, str]]):
+    """Oldest streams first until the directory fits the budget again (the newest one stays)"""
+    total = sum(size for _mtime, size, _key in usage)
+    for _mtime, size, key in sorted(usage)[:-1]:
+        if total <= AUDIO_CACHE_MAX_BYTES:
+            break
+        _entries.pop(key, None)
+        total -= size
+        stats["evictions"] += 1
+        for path in (os.path.join(AUDIO_CACHE_DIR, f"{key}.bin"), os.path.join(AUDIO_CACHE_DIR, f"{key}.json")):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def record_play(key: str, url: str, client: httpx.AsyncClient, headers: dict):
+    """Count a play and fetch the whole stream in the background once it is hot"""
+    entry = _entries.get(key)
+    if entry is None:
+        return
+    entry.plays += 1
+    if entry.plays >= AUDIO_CACHE_FILL_AFTER and not entry.complete and not entry.filling:
+        entry.filling = True
+        task = asyncio.create_task(_fill(entry, url, client, headers))
+        _background.add(task)
+        task.add_done_callback(_background.discard)
+
+
+async def _fill(entry: Entry, url: str, client: httpx.AsyncClient, headers: dict):
+    try:
+        async with client.stream("GET", url, headers=headers) as response:
+            sink = writer(entry.key, response)
+            if sink is None:
+                return
+            try:
+                async for chunk in response.aiter_bytes(READ_CHUNK_SIZE):
+                    await sink.write(chunk)
+            finally:
+                await sink.close()
+        stats["fills"] += 1
+    except httpx.HTTPError as e:
+        print(f"Audio cache fill error: {e}")
+    finally:
+        entry.filling = False
+
+
+class RangeFileResponse(Response):
+    """Serves a cached byte range, zero-copy when the server supports it. The file is
+    opened here, so a file that is gone raises OSError before anything is sent."""
+
+    def __init__(self, entry: Entry, start: int, end: int, partial: bool, headers: Optional[dict] = None):
+        self.file = open(entry.path, "rb")
+        self.start = start
+        self.count = end - start + 1
+        headers = {**(headers or {}), "Content-Length": str(self.count), "Accept-Ranges": "bytes"}
+        if partial:
+            headers["Content-Range"] = f"bytes {start}-{end}/{entry.size}"
+        super().__init__(status_code=206 if partial else 200, headers=headers, media_type=entry.mime_type)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        with self.file as f:
+            await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+            if "http.response.zerocopysend" in scope.get("extensions", {}):
+                await send({"type": "http.response.zerocopysend", "file": f.fileno(), "offset": self.start, "count": self.count})
+                return
+            offset, remaining = self.start, self.count
+            while remaining > 0:
+                chunk = await anyio.to_thread.run_sync(os.pread, f.fileno(), min(READ_CHUNK_SIZE, remaining), offset)
+                if not chunk:
+                    break
+                offset += len(chunk)
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+        if remaining > 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
@@ -1,33 +1,415 @@
+import asyncio
 import json
 import hashlib
-from typing import Optional, Any
-from cachetools import TTLCache
-
-# Separate caches with different TTLs
-_search_cache = TTLCache(maxsize=500, ttl=86400)      # 24 hours
-_lyrics_cache = TTLCache(maxsize=500, ttl=86400)      # 24 hours  
-_stream_cache = TTLCache(maxsize=100, ttl=7200)       # 2 hours
-_recommendations_cache = TTLCache(maxsize=10, ttl=3600)  # 1 hour
-
-_caches = {
-    "search": _search_cache,
-    "lyrics": _lyrics_cache,
-    "stream": _stream_cache,
-    "recommendations": _recommendations_cache,
+import os
+import sqlite3
+import struct
+import threading
+import time
+from collections import Counter
+from typing import Awaitable, Callable, Optional, Any
+from cachetools import TLRUCache
+from . import limits, singleflight
+
+# Every prefix used by the app gets its own namespace: (maxsize, default ttl, stale grace) in seconds.
+# Within the grace window an expired entry can still be served while it is refreshed.
+NAMESPACES = {
+    "search": (500, 86400, 86400),          # 24 hours
+    "lyrics": (500, 86400, 86400),          # 24 hours
+    "lyrics_miss": (2000, 900, 0),          # 15 minutes; remembers lookups that found nothing
+    "timing": (1500, 86400, 0),             # 24 hours, like the lyrics they belong to
+    "stream": (100, 7200, 0),               # 2 hours
+    "recommendations": (10, 3600, 3600),    # 1 hour
+    "resolved": (500, 3600, 0),             # resolved tracks; ttl follows the signed URL's expiry
+    "alias": (5000, 604800, 0),             # 7 days; identifiers that share another key's entry
+    "art": (20000, 2592000, 0),             # 30 days; cover art variant -> content hash on disk
 }
 
+# Popular keys are refreshed shortly before they expire
+PREWARM_INTERVAL = int(os.getenv("CACHE_PREWARM_INTERVAL", "60"))
+PREWARM_TOP_N = int(os.getenv("CACHE_PREWARM_TOP_N", "50"))
+PREWARM_AHEAD = 300
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory").lower()  # memory | sqlite | tiered
+CACHE_PATH = os.getenv("CACHE_PATH", "/tmp/lyricgen-cache.sqlite3")
+CACHE_L1_SIZE = int(os.getenv("CACHE_L1_SIZE", "100"))
+CACHE_L1_TTL = int(os.getenv("CACHE_L1_TTL", "60"))
+# SQLite calls run on the event loop: wait this long for another worker's write lock, then
+# keep the entry in memory instead of blocking every request behind it
+CACHE_BUSY_TIMEOUT = float(os.getenv("CACHE_BUSY_TIMEOUT", "0.05"))
+# The memory backend is written here on graceful shutdown and reloaded on boot ("" disables)
+CACHE_SNAPSHOT_PATH = os.getenv("CACHE_SNAPSHOT_PATH", "/tmp/lyricgen-cache-snapshot.sqlite3")
+
+
+class _Namespace(TLRUCache):
+    """TLRUCache that counts entries pushed out by the size limit"""
+
+    def __init__(self, ns: str, count_evictions: bool, **kwargs):
+        super().__init__(**kwargs)
+        self.ns = ns
+        self.count_evictions = count_evictions
+
+    def popitem(self):
+        item = super().popitem()
+        if self.count_evictions:
+            stats[self.ns]["evictions"] += 1
+        return item
+
+
+class MemoryBackend:
+    """Process-local cache with per-entry expiry"""
+
+    def __init__(self, max_size: Optional[int] = None, max_ttl: Optional[float] = None, count_evictions: bool = True):
+        self.max_ttl = max_ttl
+        self._caches = {
+            ns: _Namespace(
+                ns,
+                count_evictions,
+                maxsize=min(size, max_size) if max_size else size,
+                ttu=lambda _key, value, _now: value[0],
+                timer=time.time,
+            )
+            for ns, (size, _ttl, _grace) in NAMESPACES.items()
+        }
+
+    def get(self, ns: str, key: str) -> Optional[tuple[bytes, float]]:
+        entry = self._caches[ns].get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        return value, expires
+
+    def set(self, ns: str, key: str, value: bytes, expires: float):
+        if self.max_ttl is not None:
+            expires = min(expires, time.time() + self.max_ttl)
+        self._caches[ns][key] = (expires, value)
+
+    def delete(self, ns: str, key: str):
+        self._caches[ns].pop(key, None)
+
+    def items(self):
+        """(ns, key, value, expires) for every live entry"""
+        for ns, entries in self._caches.items():
+            for key, (expires, value) in list(entries.items()):
+                yield ns, key, value, expires
+
+
+def _busy(e: sqlite3.OperationalError) -> bool:
+    return e.sqlite_errorcode in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+
+
+class SQLiteBackend:
+    """On-disk cache shared by every worker process on the host. While the database is
+    busy, entries go to (and are read from) a short-lived in-memory fallback."""
+
+    def __init__(self, path: str = CACHE_PATH):
+        self._lock = threading.Lock()
+        self._fallback = MemoryBackend(max_size=CACHE_L1_SIZE, max_ttl=CACHE_L1_TTL, count_evictions=False)
+        self._db = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " ns TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, expires REAL NOT NULL,"
+            " PRIMARY KEY (ns, key))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_expiry ON entries (ns, expires)")
+        # Setup may wait for workers starting alongside; requests don't
+        self._db.execute(f"PRAGMA busy_timeout = {int(CACHE_BUSY_TIMEOUT * 1000)}")
+
+    def get(self, ns: str, key: str) -> Optional[tuple[bytes, float]]:
+        try:
+            with self._lock:
+                row = self._db.execute(
+                    "SELECT value, expires FROM entries WHERE ns = ? AND key = ? AND expires > ?",
+                    (ns, key, time.time()),
+                ).fetchone()
+        except sqlite3.OperationalError as e:
+            if not _busy(e):
+                raise
+            stats[ns]["busy"] += 1
+            row = None
+        return (row[0], row[1]) if row else self._fallback.get(ns, key)
+
+    def set(self, ns: str, key: str, value: bytes, expires: float):
+        try:
+            self._set(ns, key, value, expires)
+        except sqlite3.OperationalError as e:
+            if not _busy(e):
+                raise
+            stats[ns]["busy"] += 1
+            self._fallback.set(ns, key, value, expires)
+            return
+        self._fallback.delete(ns, key)
+
+    def _set(self, ns: str, key: str, value: bytes, expires: float):
+        max_size = NAMESPACES[ns][0]
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO entries (ns, key, value, expires) VALUES (?, ?, ?, ?)",
+                    (ns, key, value, expires),
+                )
+                self._db.execute("DELETE FROM entries WHERE ns = ? AND expires <= ?", (ns, time.time()))
+                # Over the size limit: drop the entries closest to expiring
+                evicted = self._db.execute(
+                    "DELETE FROM entries WHERE ns = ? AND key IN ("
+                    " SELECT key FROM entries WHERE ns = ? ORDER BY expires"
+                    " LIMIT max(0, (SELECT COUNT(*) FROM entries WHERE ns = ?) - ?))",
+                    (ns, ns, ns, max_size),
+                ).rowcount
+                self._db.execute("COMMIT")
+                stats[ns]["evictions"] += max(0, evicted)
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def delete(self, ns: str, key: str):
+        self._fallback.delete(ns, key)
+        try:
+            with self._lock:
+                self._db.execute("DELETE FROM entries WHERE ns = ? AND key = ?", (ns, key))
+        except sqlite3.OperationalError as e:
+            if not _busy(e):
+                raise
+            stats[ns]["busy"] += 1
+
+
+class TieredBackend:
+    """Small in-process L1 in front of a shared L2"""
+
+    def __init__(self, l1: MemoryBackend, l2):
+        self.l1 = l1
+        self.l2 = l2
+
+    def get(self, ns: str, key: str) -> Optional[tuple[bytes, float]]:
+        entry = self.l1.get(ns, key)
+        if entry is not None:
+            return entry
+        entry = self.l2.get(ns, key)
+        if entry is not None:
+            self.l1.set(ns, key, entry[0], entry[1])
+        return entry
+
+    def set(self, ns: str, key: str, value: bytes, expires: float):
+        self.l2.set(ns, key, value, expires)
+        self.l1.set(ns, key, value, expires)
+
+    def delete(self, ns: str, key: str):
+        self.l2.delete(ns, key)
+        self.l1.delete(ns, key)
+
+
+def _create_backend():
+    if CACHE_BACKEND == "sqlite":
+        return SQLiteBackend(CACHE_PATH)
+    if CACHE_BACKEND == "tiered":
+        return TieredBackend(MemoryBackend(max_size=CACHE_L1_SIZE, max_ttl=CACHE_L1_TTL, count_evictions=False), SQLiteBackend(CACHE_PATH))
+    return MemoryBackend()
+
+_backend = _create_backend()
+
+def configure(backend):
+    """Swap the active backend (used by tools that share the cache)"""
+    global _backend
+    _backend = backend
+
+def _namespace(prefix: str) -> str:
+    if prefix not in NAMESPACES:
+        raise KeyError(f"Unknown cache namespace: {prefix}")
+    return prefix
+
 def _key(prefix: str, data: str) -> str:
     return f"{prefix}:{hashlib.md5(data.encode()).hexdigest()}"
 
+# Stored values carry an envelope: fresh-until time, when they were stored, and how often refreshed
+_ENVELOPE = struct.Struct("<ddI")
+
+stats = {ns: {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "evictions": 0, "busy": 0} for ns in NAMESPACES}
+
+Loader = Callable[[], Awaitable[Optional[bytes]]]
+
+_popularity = Counter()
+_loaders: dict[tuple[str, str], Loader] = {}
+_pinned: set[tuple[str, str]] = set()
+_background: set[asyncio.Task] = set()
+
+def _read(ns: str, key: str) -> Optional[tuple[bytes, float, float, int]]:
+    """(value, fresh_until, stored_at, refreshes), including stale entries still within grace"""
+    entry = _backend.get(ns, key)
+    if entry is None:
+        return None
+    fresh_until, stored_at, refreshes = _ENVELOPE.unpack_from(entry[0])
+    return entry[0][_ENVELOPE.size:], fresh_until, stored_at, refreshes
+
+def _write(ns: str, key: str, value: bytes, ttl: Optional[int], refreshes: int = 0):
+    size, default_ttl, grace = NAMESPACES[ns]
+    now = time.time()
+    fresh_until = now + (default_ttl if ttl is None else ttl)
+    _backend.set(ns, key, _ENVELOPE.pack(fresh_until, now, refreshes) + value, fresh_until + grace)
+
 def get(prefix: str, identifier: str) -> Optional[Any]:
-    cache = _caches.get(prefix, _search_cache)
-    key = _key(prefix, identifier)
-    val = cache.get(key)
-    if val:
-        return json.loads(val)
-    return None
+    value = get_bytes(prefix, identifier)
+    if value is None:
+        return None
+    return json.loads(value)
 
 def set(prefix: str, identifier: str, data: Any, ttl: int = None):
-    cache = _caches.get(prefix, _search_cache)
-    key = _key(prefix, identifier)
-    cache[key] = json.dumps(data)
+    set_bytes(prefix, identifier, json.dumps(data).encode(), ttl)
+
+def get_bytes(prefix: str, identifier: str) -> Optional[bytes]:
+    """Raw stored bytes, for values that are already encoded (e.g. response bodies)"""
+    entry = _read(_namespace(prefix), _key(prefix, identifier))
+    if entry is None or entry[1] <= time.time():
+        return None
+    return entry[0]
+
+def set_bytes(prefix: str, identifier: str, data: bytes, ttl: int = None):
+    _write(_namespace(prefix), _key(prefix, identifier), data, ttl)
+
+def exists(prefix: str, identifier: str) -> bool:
+    """Whether an entry is stored, fresh or stale"""
+    return _read(_namespace(prefix), _key(prefix, identifier)) is not None
+
+def delete(prefix: str, identifier: str):
+    _backend.delete(_namespace(prefix), _key(prefix, identifier))
+
+async def _load(ns: str, identifier: str, loader: Loader, ttl: Optional[int]) -> Optional[bytes]:
+    value = await loader()
+    if value is None:
+        # Keep serving whatever we had rather than caching a failed lookup
+        return None
+    key = _key(ns, identifier)
+    previous = _read(ns, key)
+    refreshes = previous[3] + 1 if previous else 0
+    if previous:
+        stats[ns]["refreshes"] += 1
+    _write(ns, key, value, ttl, refreshes)
+    return value
+
+def _refresh(ns: str, identifier: str, loader: Loader, ttl: Optional[int]) -> Awaitable[Optional[bytes]]:
+    # One refresh per key at a time, however many callers see it stale
+    return singleflight.do("cache.refresh", (ns, identifier), _load, ns, identifier, loader, ttl)
+
+async def _refresh_quietly(ns: str, identifier: str, loader: Loader, ttl: Optional[int]):
+    try:
+        await _refresh(ns, identifier, loader, ttl)
+    except limits.Unavailable:
+        pass  # keep serving the stale value; the next request or prewarm pass retries
+    except Exception as e:
+        print(f"Cache refresh error ({ns}): {e}")
+
+def _refresh_in_background(ns: str, identifier: str, loader: Loader, ttl: Optional[int]):
+    task = asyncio.create_task(_refresh_quietly(ns, identifier, loader, ttl))
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+
+def _track(ns: str, identifier: str, loader: Loader):
+    _popularity[(ns, identifier)] += 1
+    _loaders[(ns, identifier)] = loader
+    if len(_loaders) > 4 * PREWARM_TOP_N + 1000:
+        keep = {k for k, _ in _popularity.most_common(2 * PREWARM_TOP_N)} | _pinned
+        for k in list(_loaders):
+            if k not in keep:
+                del _loaders[k]
+                _popularity.pop(k, None)
+
+async def get_or_refresh(prefix: str, identifier: str, loader: Loader, ttl: int = None,
+                         on_lookup: Optional[Callable[[bool], Any]] = None) -> Optional[bytes]:
+    """Cached bytes, loading on a miss; within the grace window a stale value is
+    returned immediately while a single background task refreshes it.
+    on_lookup is told whether an entry (fresh or stale) was found."""
+    ns = _namespace(prefix)
+    _track(ns, identifier, loader)
+    entry = _read(ns, _key(prefix, identifier))
+    if on_lookup:
+        on_lookup(entry is not None)
+    if entry is not None:
+        if entry[1] > time.time():
+            stats[ns]["hits"] += 1
+        else:
+            stats[ns]["stale_hits"] += 1
+            _refresh_in_background(ns, identifier, loader, ttl)
+        return entry[0]
+    stats[ns]["misses"] += 1
+    return await _refresh(ns, identifier, loader, ttl)
+
+def pin(prefix: str, identifier: str, loader: Loader):
+    """Always keep this key warm (e.g. the recommendations feed)"""
+    ns = _namespace(prefix)
+    _pinned.add((ns, identifier))
+    _loaders[(ns, identifier)] = loader
+
+async def refresh_loop():
+    """Pre-warm pinned and most-requested keys before they expire"""
+    while True:
+        await asyncio.sleep(PREWARM_INTERVAL)
+        hot = [k for k, _ in _popularity.most_common(PREWARM_TOP_N)]
+        for ns, identifier in list(_pinned) + [k for k in hot if k not in _pinned]:
+            entry = _read(ns, _key(ns, identifier))
+            if entry is not None and entry[1] - time.time() > PREWARM_AHEAD:
+                continue
+            loader = _loaders.get((ns, identifier))
+            if loader:
+                await _refresh_quietly(ns, identifier, loader, None)
+        # Decay so popularity follows recent traffic
+        for k in list(_popularity):
+            _popularity[k] //= 2
+            if not _popularity[k]:
+                del _popularity[k]
+
+def entries(limit: int = 20) -> list[dict]:
+    """Age and refresh count of the most requested entries"""
+    now = time.time()
+    result = []
+    for (ns, identifier), requests in _popularity.most_common(limit):
+        entry = _read(ns, _key(ns, identifier))
+        result.append({
+            "namespace": ns,
+            "key": identifier,
+            "requests": requests,
+            "age": round(now - entry[2], 1) if entry else None,
+            "stale": entry[1] <= now if entry else None,
+            "refreshes": entry[3] if entry else None,
+        })
+    return result
+
+
+def snapshot(path: str = CACHE_SNAPSHOT_PATH) -> int:
+    """Write the in-memory entries to disk; the SQLite-backed caches survive restarts on their own"""
+    if not path or type(_backend) is not MemoryBackend:
+        return 0
+    rows = list(_backend.items())
+    tmp = f"{path}.{os.getpid()}.tmp"
+    db = sqlite3.connect(tmp)
+    try:
+        db.execute("DROP TABLE IF EXISTS entries")
+        db.execute("CREATE TABLE entries (ns TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, expires REAL NOT NULL)")
+        db.executemany("INSERT INTO entries VALUES (?, ?, ?, ?)", rows)
+        db.commit()
+    finally:
+        db.close()
+    # Atomic, so a crash mid-write leaves the previous snapshot in place
+    os.replace(tmp, path)
+    return len(rows)
+
+def restore(path: str = CACHE_SNAPSHOT_PATH) -> int:
+    """Reload a snapshot into the memory backend, skipping entries that expired in between"""
+    if not path or type(_backend) is not MemoryBackend or not os.path.exists(path):
+        return 0
+    try:
+        db = sqlite3.connect(path)
+        try:
+            rows = db.execute("SELECT ns, key, value, expires FROM entries WHERE expires > ? ORDER BY rowid", (time.time(),)).fetchall()
+        finally:
+            db.close()
+    except sqlite3.Error as e:
+        print(f"Cache snapshot unreadable, starting cold: {e}")
+        return 0
+    restored = 0
+    for ns, key, value, expires in rows:
+        if ns in NAMESPACES:
+            _backend.set(ns, key, value, expires)
+            restored += 1
+    return restored
@@ -0,0 +1,106 @@
+import re
+import unicodedata
+from collections import OrderedDict
+from typing import Optional
+from . import cache
+
+# Canonical cache keys: requests that differ only in case, spacing, punctuation,
+# diacritics or noise like "(Official Video)" / "feat. X" share one entry.
+_NOISE = re.compile(
+    r"[(\[]\s*(?:official\s+)?(?:music\s+|lyric\s+|lyrics\s+)?(?:video|audio|visuali[sz]er|lyrics?|hd|hq|4k)\s*[)\]]"
+    r"|\bofficial\s+(?:music\s+|lyric\s+)?(?:video|audio)\b"
+)
+_FEAT = re.compile(r"[(\[]?\s*\b(?:feat|ft|featuring)\b\.?.*?(?:[)\]]|$)")
+_PUNCTUATION = re.compile(r"[^\w\s]+")
+_SPACE = re.compile(r"\s+")
+TRACKED_ENTRIES = 20000
+
+stats: dict[str, dict[str, int]] = {}
+_raws: OrderedDict = OrderedDict()   # (namespace, key) -> raw identifiers that looked the entry up
+
+
+def text(value: str) -> str:
+    """NFKC, case and whitespace folding"""
+    return _SPACE.sub(" ", unicodedata.normalize("NFKC", value or "").casefold()).strip()
+
+def _fold(c: str) -> str:
+    """Drop the accents of a Latin letter (é -> e); other scripts keep their marks,
+    which are part of the letter (が is not か, and दि is not द)"""
+    decomposed = unicodedata.normalize("NFD", c)
+    if len(decomposed) > 1 and unicodedata.name(decomposed[0], "").startswith("LATIN"):
+        return "".join(m for m in decomposed if not unicodedata.combining(m))
+    return c
+
+def _unpunctuate(value: str) -> str:
+    if value.isascii():
+        return _PUNCTUATION.sub(" ", value)
+    # \w does not cover combining marks (Devanagari vowel signs): go by category instead
+    return "".join(" " if unicodedata.category(c)[0] in "PS" else c for c in value)
+
+def name(value: str) -> str:
+    """An artist, title or query reduced to its words: also folds Latin diacritics,
+    punctuation, feat. credits and video/audio noise"""
+    value = unicodedata.normalize("NFKC", value or "")
+    if not value.isascii():
+        value = unicodedata.normalize("NFC", "".join(_fold(c) for c in value))
+    value = _FEAT.sub(" ", _NOISE.sub(" ", value.casefold()))
+    value = _unpunctuate(value.replace("&", " and "))
+    return _SPACE.sub(" ", value).strip()
+
+def video_id(value: str) -> str:
+    """ytm_<id> and the bare id are the same video"""
+    return value.strip().removeprefix("ytm_")
+
+def search_key(q: str) -> str:
+    return name(q) or text(q)
+
+def track_key(artist: str, title: str) -> str:
+    return f"{name(artist)}:{name(title)}"
+
+def lyrics_key(trackId: Optional[str], query: Optional[str], artist: Optional[str], title: Optional[str]) -> str:
+    if artist and title:
+        return track_key(artist, title)
+    if trackId:
+        # An lrclib id that an artist + title lookup already resolved to shares its entry
+        return cache.get("alias", trackId) or trackId
+    return search_key(query or "")
+
+def alias(identifier: str, key: str):
+    """Record that identifier names the same thing as key"""
+    if identifier != key:
+        cache.set("alias", identifier, key)
+
+
+def note(prefix: str, raw: str, key: str, hit: bool):
+    """Count a lookup of key (made for the raw identifier) that found an entry or not.
+    A hit is gained when no earlier lookup of that entry came with this raw identifier:
+    only canonicalization produced it. Hits on entries stored before this process
+    started, or no longer tracked, are not attributed."""
+    counts = stats.setdefault(prefix, {"lookups": 0, "hits": 0, "gained": 0})
+    counts["lookups"] += 1
+    entry = (prefix, key)
+    if not hit:
+        _raws[entry] = {raw}   # about to be stored, reached by this identifier alone
+    else:
+        counts["hits"] += 1
+        raws = _raws.get(entry)
+        if raws is None:
+            return
+        if raw not in raws:
+            counts["gained"] += 1
+            raws.add(raw)
+    _raws.move_to_end(entry)
+    if len(_raws) > TRACKED_ENTRIES:
+        _raws.popitem(last=False)
+
+def report() -> dict:
+    """Hit rate per namespace with canonical keys, and what raw keys would have given"""
+    result = {}
+    for prefix, counts in stats.items():
+        lookups = counts["lookups"] or 1
+        result[prefix] = dict(
+            counts,
+            hit_rate=round(counts["hits"] / lookups, 3),
+            raw_hit_rate=round((counts["hits"] - counts["gained"]) / lookups, 3),
+        )
+    return result
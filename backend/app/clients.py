@@ -0,0 +1,118 @@
+import asyncio
+import os
+import random
+import time
+from typing import Optional
+import httpx
+from . import limits, metrics
+
+# App-scoped HTTP clients, one pooled client per upstream host
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "false").lower() == "true"
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+HTTP_BACKOFF = float(os.getenv("HTTP_BACKOFF", "0.2"))
+AUDIO_MAX_CONNECTIONS = int(os.getenv("AUDIO_MAX_CONNECTIONS", "64"))
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+PROVIDERS = {
+    "lrclib": {"max_connections": 20, "timeout": httpx.Timeout(10.0)},
+    "itunes": {"max_connections": 10, "timeout": httpx.Timeout(10.0)},
+    "art": {"max_connections": 16, "timeout": httpx.Timeout(10.0)},
+    "audio": {"max_connections": AUDIO_MAX_CONNECTIONS, "timeout": httpx.Timeout(10.0, read=30.0, pool=10.0)},
+}
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+_clients: dict[str, httpx.AsyncClient] = {}
+# Adaptive concurrency and a circuit breaker per provider, up to its connection pool size
+_upstreams = {name: limits.upstream(name, maximum=config["max_connections"]) for name, config in PROVIDERS.items()}
+
+stats = {
+    name: {"requests": 0, "errors": 0, "retries": 0, "latency_total": 0.0, "latency_max": 0.0}
+    for name in PROVIDERS
+}
+
+def _create(name: str) -> httpx.AsyncClient:
+    config = PROVIDERS[name]
+    if HTTP2_ENABLED and not HTTP2_AVAILABLE:
+        print("HTTP2_ENABLED is set but the h2 package is missing, using HTTP/1.1")
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=config["max_connections"],
+            max_keepalive_connections=config["max_connections"] // 2,
+        ),
+        timeout=config["timeout"],
+        http2=HTTP2_ENABLED and HTTP2_AVAILABLE,
+        follow_redirects=True,
+    )
+
+async def startup():
+    for name in PROVIDERS:
+        if name not in _clients:
+            _clients[name] = _create(name)
+
+async def shutdown():
+    clients = list(_clients.values())
+    _clients.clear()
+    await asyncio.gather(*[client.aclose() for client in clients])
+
+def get(name: str) -> httpx.AsyncClient:
+    """The shared client for a provider (created on first use outside the app lifespan)"""
+    client = _clients.get(name)
+    if client is None:
+        client = _clients[name] = _create(name)
+    return client
+
+def guard(name: str):
+    """Concurrency slot + breaker for one call to a provider (see limits.Upstream.guard)"""
+    return _upstreams[name].guard()
+
+def record(name: str, latency: float, error: bool = False):
+    """Account one upstream request; for streamed audio the latency is time to first byte"""
+    metrics.observe_stage(f"upstream.{name}", latency)
+    entry = stats[name]
+    entry["requests"] += 1
+    entry["latency_total"] += latency
+    entry["latency_max"] = max(entry["latency_max"], latency)
+    if error:
+        entry["errors"] += 1
+
+async def request(name: str, method: str, url: str, retries: Optional[int] = None, **kwargs) -> httpx.Response:
+    """Send a request on the provider's client, retrying transient failures with jittered backoff"""
+    client = get(name)
+    retries = HTTP_RETRIES if retries is None else retries
+    attempt = 0
+    while True:
+        try:
+            async with guard(name) as call:
+                start = time.perf_counter()
+                try:
+                    response = await client.request(method, url, **kwargs)
+                except httpx.TransportError:
+                    record(name, time.perf_counter() - start, error=True)
+                    raise
+                retryable = response.status_code in RETRY_STATUSES
+                record(name, time.perf_counter() - start, error=response.status_code >= 500)
+                call.ok = not retryable
+        except httpx.TransportError:
+            if attempt >= retries:
+                raise
+        else:
+            if not retryable or attempt >= retries:
+                return response
+        attempt += 1
+        stats[name]["retries"] += 1
+        await asyncio.sleep(HTTP_BACKOFF * (2 ** (attempt - 1)) * random.uniform(0.5, 1.5))
+
+def summary() -> dict:
+    return {
+        name: {
+            **entry,
+            "latency_avg": entry["latency_total"] / entry["requests"] if entry["requests"] else 0.0,
+        }
+        for name, entry in stats.items()
+    }
@@ -0,0 +1,236 @@
+import asyncio
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Optional
+
+# Per-upstream protection: an adaptive concurrency limit (AIMD on observed latency),
+# a circuit breaker that fails fast while the upstream is down, and load shedding
+# when the wait for a slot would blow the deadline budget. Cached traffic never
+# goes through here, so it keeps its latency while an upstream struggles.
+SHED_BUDGET = float(os.getenv("SHED_BUDGET", "2.0"))            # max seconds to queue for a slot
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))      # consecutive failures that open it
+BREAKER_COOLDOWN = float(os.getenv("BREAKER_COOLDOWN", "10"))   # seconds open before a probe
+BREAKER_MAX_COOLDOWN = 120
+SLOW_FACTOR = 2.0        # a call this much slower than the baseline counts as congestion
+SLOW_FLOOR = 0.05        # ...but never below this many seconds
+DECREASE = 0.7           # multiplicative decrease on congestion or failure
+BASELINE_ALPHA = 0.05
+
+
+class Unavailable(Exception):
+    """An upstream is shedding load or its breaker is open; retry after retry_after seconds"""
+
+    def __init__(self, upstream: str, retry_after: int, reason: str = "busy"):
+        super().__init__(f"{upstream} {reason}")
+        self.upstream = upstream
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class Call:
+    """Handed to the body of a guard; set ok = False for failures that are not exceptions
+    (None means the call was abandoned and says nothing about the upstream)"""
+    __slots__ = ("ok",)
+
+    def __init__(self):
+        self.ok = True
+
+
+class Upstream:
+    def __init__(self, name: str, maximum: int, initial: Optional[int] = None, minimum: int = 1):
+        self.name = name
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = float(initial or max(minimum, maximum // 2))
+        self.inflight = 0
+        self.baseline: Optional[float] = None     # slow EWMA of successful-call latency
+        self.latency = 0.0                        # EWMA of all latency, for wait estimates
+        self._waiters: deque[asyncio.Future] = deque()
+        self._decreased_at = 0.0
+        # Circuit breaker
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.cooldown = BREAKER_COOLDOWN
+        self._probing = False
+        self.stats = {"calls": 0, "failures": 0, "shed": 0, "rejected": 0, "opened": 0}
+
+    # ---- breaker ----
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.cooldown else "open"
+
+    def _retry_after(self) -> int:
+        if self.opened_at is not None:
+            return max(1, int(self.cooldown - (time.monotonic() - self.opened_at)) + 1)
+        return max(1, int(self.latency * (len(self._waiters) + 1) / max(self.limit, 1)) + 1)
+
+    def _check_breaker(self) -> bool:
+        """True if this call is the half-open probe"""
+        state = self.state
+        if state == "open" or (state == "half_open" and self._probing):
+            self.stats["rejected"] += 1
+            raise Unavailable(self.name, self._retry_after(), "unavailable")
+        if state == "half_open":
+            self._probing = True
+            return True
+        return False
+
+    def _record_outcome(self, ok: bool, probe: bool):
+        if probe:
+            self._probing = False
+        if ok:
+            self.failures = 0
+            if self.opened_at is not None:
+                self.opened_at, self.cooldown = None, BREAKER_COOLDOWN
+            return
+        self.failures += 1
+        self.stats["failures"] += 1
+        if probe:
+            # Still down: stay open, and back off further
+            self.opened_at, self.cooldown = time.monotonic(), min(self.cooldown * 2, BREAKER_MAX_COOLDOWN)
+        elif self.opened_at is None and self.failures >= BREAKER_FAILURES:
+            self.opened_at = time.monotonic()
+            self.stats["opened"] += 1
+            print(f"Circuit breaker for {self.name} opened after {self.failures} failures")
+
+    # ---- adaptive limit ----
+    def observe(self, latency: float, ok: bool):
+        """AIMD: grow by 1/limit per healthy call, shrink on a slow or failed one (once per latency window)"""
+        self.latency = latency if not self.latency else 0.8 * self.latency + 0.2 * latency
+        slow = self.baseline is not None and latency > max(self.baseline * SLOW_FACTOR, SLOW_FLOOR)
+        if ok:
+            # The baseline follows successful calls slowly, so a lasting shift stops counting as congestion
+            self.baseline = latency if self.baseline is None else (1 - BASELINE_ALPHA) * self.baseline + BASELINE_ALPHA * latency
+        if ok and not slow:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+        else:
+            now = time.monotonic()
+            if now - self._decreased_at >= max(self.latency, 0.1):
+                self.limit = max(self.minimum, self.limit * DECREASE)
+                self._decreased_at = now
+
+    def _admit(self) -> bool:
+        return self.inflight < int(self.limit)
+
+    async def _acquire(self):
+        if self._admit() and not self._waiters:
+            self.inflight += 1
+            return
+        # Shed now if the expected wait for a slot is already past the budget
+        expected = self.latency * (len(self._waiters) + 1) / max(self.limit, 1)
+        if expected > SHED_BUDGET:
+            self.stats["shed"] += 1
+            raise Unavailable(self.name, self._retry_after())
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, SHED_BUDGET)
+        except asyncio.TimeoutError:
+            self.stats["shed"] += 1
+            raise Unavailable(self.name, self._retry_after())
+        except BaseException:
+            # Cancelled right after being handed a slot: pass it on
+            if waiter.done() and not waiter.cancelled():
+                self._release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        # The slot was handed over by _release
+
+    def _release(self):
+        self.inflight -= 1
+        while self._waiters and self._admit():
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.inflight += 1
+                waiter.set_result(None)
+
+    @asynccontextmanager
+    async def guard(self):
+        """Hold a concurrency slot around one upstream call; raises Unavailable when shedding"""
+        probe = self._check_breaker()
+        try:
+            await self._acquire()
+        except BaseException:
+            if probe:
+                self._probing = False
+            raise
+        self.stats["calls"] += 1
+        call = Call()
+        start = time.perf_counter()
+        try:
+            yield call
+        except asyncio.CancelledError:
+            # Abandoned (e.g. a hedge that lost the race): no signal either way
+            call.ok = None
+            if probe:
+                self._probing = False
+            raise
+        except Exception:
+            call.ok = False
+            raise
+        finally:
+            if call.ok is not None:
+                latency = time.perf_counter() - start
+                self.observe(latency, call.ok)
+                self._record_outcome(call.ok, probe)
+            self._release()
+
+    def check(self):
+        """Fail fast while the breaker is open or its probe is out, without taking the probe"""
+        state = self.state
+        if state == "open" or (state == "half_open" and self._probing):
+            self.stats["rejected"] += 1
+            raise Unavailable(self.name, self._retry_after(), "unavailable")
+
+    def admit(self) -> bool:
+        """The breaker half of guard() for callers that manage their own queue: raises while
+        open, lets one probe through once the cooldown is over. The result goes to record()."""
+        return self._check_breaker()
+
+    async def acquire(self):
+        """The slot half of guard(), for work that can outlive the caller's wait (a thread
+        that keeps running after a timeout): release() it once the work is done"""
+        await self._acquire()
+
+    def release(self):
+        self._release()
+
+    def abandon(self, probe: bool):
+        """The call admitted by admit() was given up without an outcome"""
+        if probe:
+            self._probing = False
+
+    def record(self, latency: float, ok: bool, probe: bool = False):
+        """Feed the limit and breaker from a call made outside guard()"""
+        self.stats["calls"] += 1
+        self.observe(latency, ok)
+        self._record_outcome(ok, probe)
+
+    def summary(self) -> dict:
+        return {
+            **self.stats,
+            "state": self.state,
+            "limit": round(self.limit, 2),
+            "inflight": self.inflight,
+            "queued": len(self._waiters),
+            "latency": round(self.latency, 4),
+            "baseline": round(self.baseline, 4) if self.baseline is not None else None,
+        }
+
+
+_upstreams: dict[str, Upstream] = {}
+
+def upstream(name: str, maximum: int, initial: Optional[int] = None, minimum: int = 1) -> Upstream:
+    """The shared limiter/breaker for an upstream, created on first registration"""
+    if name not in _upstreams:
+        _upstreams[name] = Upstream(name, maximum, initial, minimum)
+    return _upstreams[name]
+
+def stats() -> dict:
+    return {name: up.summary() for name, up in _upstreams.items()}
@@ -0,0 +1,137 @@
+import re
+from array import array
+from itertools import accumulate
+from typing import Optional
+from .models import LyricLine, WordTimes
+
+# Single-pass LRC parser producing a compact columnar form: one array('d') of line times,
+# text offsets into a shared string buffer (repeated lines store their text once) and,
+# for enhanced LRC, the <mm:ss.xx> start time of every word. Handles repeated-timestamp
+# lines ([00:12.00][01:40.00]Chorus), [offset:], minutes of any length and [mm:ss]
+# without a fraction.
+_TIME_TAG = re.compile(r"\[(\d+):(\d{1,2})(?:[.:](\d{1,3}))?\]")
+_LINE = re.compile(
+    r"^\[(\d+):(\d{1,2})(?:[.:](\d{1,3}))?\]((?:\[\d+:\d{1,2}(?:[.:]\d{1,3})?\])*)([^\r\n]*)",
+    re.MULTILINE,
+)
+_OFFSET_TAG = re.compile(r"\[offset:\s*([+-]?\d+)\s*\]", re.IGNORECASE)
+_WORD_TAG = re.compile(r"<(\d+):(\d{1,2})(?:[.:](\d{1,3}))?>")
+
+INSTRUMENTAL = {"", "♪", "instrumental"}
+
+# Seconds and fractions come as short digit strings: look them up instead of converting
+_SECONDS = {f"{n:0{width}d}": n for width in (1, 2) for n in range(10 ** width)}
+_FRACTIONS = {"": 0.0, **{f"{n:0{width}d}": int(f"{n:0{width}d}".ljust(3, "0")) / 1000
+                          for width in (1, 2, 3) for n in range(10 ** width)}}
+
+
+def _seconds(mins: str, secs: str, frac: str) -> float:
+    return int(mins) * 60 + _SECONDS[secs] + _FRACTIONS[frac]
+
+
+def _words(text: str, stamp: float) -> tuple[str, tuple[float, ...]]:
+    """Text without its word tags, and each word's start relative to the line's time.
+    The times are kept only when every word has its own tag (a trailing tag marks the
+    end of the last word and is dropped)."""
+    parts = _WORD_TAG.split(text)   # text, then (mins, secs, frac, text) per tag
+    clean = "".join(parts[::4]).strip()
+    if parts[0].strip():
+        return clean, ()
+    starts = []
+    for i in range(1, len(parts), 4):
+        words = len(parts[i + 3].split())
+        if words > 1:
+            return clean, ()
+        if words:
+            starts.append(round(_seconds(*parts[i:i + 3]) - stamp, 3))
+    return clean, tuple(starts)
+
+
+class Lyrics:
+    __slots__ = ("times", "texts", "bounds", "buffer", "word_offsets", "word_starts")
+
+    def __init__(self, times: array, texts: array, bounds: array, buffer: str, word_offsets: array, word_starts: array):
+        self.times = times                  # line times in seconds, sorted
+        self.texts = texts                  # line i shows text texts[i]...
+        self.bounds = bounds                # ...which is buffer[bounds[t]:bounds[t + 1]]
+        self.buffer = buffer
+        self.word_offsets = word_offsets    # words of line i are word_starts[word_offsets[i]:word_offsets[i + 1]]
+        self.word_starts = word_starts      # (empty when the file has no word tags)
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def text(self, i: int) -> str:
+        index = self.texts[i]
+        return self.buffer[self.bounds[index]:self.bounds[index + 1]]
+
+    def lines(self) -> list[LyricLine]:
+        """LyricLine models for the API"""
+        buffer, bounds = self.buffer, self.bounds
+        texts = [buffer[start:end] for start, end in zip(bounds, bounds[1:])]
+        shown = [text or "♪" for text in texts]
+        instrumental = [text.lower() in INSTRUMENTAL for text in texts]
+        return [
+            LyricLine(time=round(time, 2), text=shown[index], isInstrumental=instrumental[index])
+            for time, index in zip(self.times, self.texts)
+        ]
+
+    def word_times(self) -> Optional[WordTimes]:
+        if not self.word_starts:
+            return None
+        return WordTimes(lineOffsets=self.word_offsets.tolist(), start=self.word_starts.tolist())
+
+
+def parse(lrc: str) -> Lyrics:
+    """Timed lines in playback order, with word times from enhanced tags"""
+    times = []
+    texts = []          # text index of each stamp
+    distinct = []       # text of each index
+    relative = []       # word starts of each index, relative to its first stamp
+    tagged = False
+    for mins, secs, frac, more, text in _LINE.findall(lrc):
+        index = len(distinct)
+        stamp = int(mins) * 60 + _SECONDS[secs] + _FRACTIONS[frac]
+        times.append(stamp)
+        texts.append(index)
+        if more:
+            for tag in _TIME_TAG.findall(more):
+                times.append(_seconds(*tag))
+                texts.append(index)
+        if "<" in text:
+            text, starts = _words(text, stamp)
+            tagged = tagged or bool(starts)
+            relative.append(starts)
+        else:
+            text = text.strip()
+            relative.append(())
+        distinct.append(text)
+
+    # Repeated lines put later timestamps out of order
+    if any(a > b for a, b in zip(times, times[1:])):
+        order = sorted(range(len(times)), key=times.__getitem__)
+        times = [times[i] for i in order]
+        texts = [texts[i] for i in order]
+
+    # A positive offset makes lyrics appear sooner
+    tag = _OFFSET_TAG.search(lrc)
+    offset = int(tag.group(1)) / 1000 if tag else 0.0
+    if offset:
+        times = [max(0.0, time - offset) for time in times]
+
+    # A repeated line's words move with it
+    word_offsets, word_starts = array("I"), array("d")
+    if tagged:
+        word_offsets.append(0)
+        for time, index in zip(times, texts):
+            word_starts.extend([round(time + start, 3) for start in relative[index]])
+            word_offsets.append(len(word_starts))
+
+    return Lyrics(
+        array("d", times),
+        array("I", texts),
+        array("I", accumulate(map(len, distinct), initial=0)),
+        "".join(distinct),
+        word_offsets,
+        word_starts,
+    )
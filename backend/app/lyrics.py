@@ -0,0 +1,156 @@
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional
+from .models import LyricsResponse
+from .providers import lrclib
+from . import limits, singleflight
+
+# Lyrics aggregator: fan out to every provider at once, hedge slow ones,
+# and return the first good synced result (or the best of what came back)
+LYRICS_TIMEOUT = float(os.getenv("LYRICS_TIMEOUT", "8"))
+HEDGE_DEFAULT_DELAY = float(os.getenv("LYRICS_HEDGE_DELAY", "1.0"))
+HEDGE_MIN_DELAY = 0.2
+HEDGE_MIN_SAMPLES = 20
+DURATION_TOLERANCE = 5.0  # seconds of drift still considered the same recording
+
+
+class LookupFailed(Exception):
+    """Nothing was found, but not every provider answered (an error or LYRICS_TIMEOUT),
+    so the lyrics may exist: not a miss to remember"""
+
+
+Fetch = Callable[[str, str, str, Optional[float]], Awaitable[Optional[LyricsResponse]]]
+
+
+class Provider:
+    def __init__(self, name: str, fetch: Fetch, hedge: bool = True):
+        self.name = name
+        self.fetch = fetch
+        self.hedge = hedge
+        self.latencies = deque(maxlen=200)
+
+    def hedge_delay(self) -> float:
+        """p95 of recent latencies; a request slower than this gets a second copy"""
+        if len(self.latencies) < HEDGE_MIN_SAMPLES:
+            return HEDGE_DEFAULT_DELAY
+        ordered = sorted(self.latencies)
+        return max(HEDGE_MIN_DELAY, ordered[int(len(ordered) * 0.95) - 1])
+
+    async def call(self, artist: str, title: str, query: str, duration: Optional[float], hedged: bool = False):
+        if hedged:
+            # A hedge must not join the slow in-flight call it is racing
+            singleflight.bypass()
+        start = time.perf_counter()
+        result = await self.fetch(artist, title, query, duration)
+        self.latencies.append(time.perf_counter() - start)
+        return result
+
+
+async def _lrclib_get(artist: str, title: str, query: str, duration: Optional[float]):
+    if not (artist and title):
+        return None
+    return await lrclib.get_lyrics_by_query(artist, title)
+
+async def _lrclib_search(artist: str, title: str, query: str, duration: Optional[float]):
+    q = f"{artist} {title}".strip() if artist or title else query
+    return await lrclib.search_lyrics(q, duration)
+
+_providers: list[Provider] = [
+    Provider("lrclib.get", _lrclib_get),
+    Provider("lrclib.search", _lrclib_search),
+]
+
+def register(name: str, fetch: Fetch, hedge: bool = True):
+    """Add an extra lyrics source; fetch(artist, title, query, duration) -> LyricsResponse | None"""
+    _providers.append(Provider(name, fetch, hedge))
+
+
+def _distance(result: LyricsResponse, duration: Optional[float]) -> float:
+    if not duration or not result.meta.duration:
+        return DURATION_TOLERANCE
+    return abs(result.meta.duration - duration)
+
+def rank(result: LyricsResponse, duration: Optional[float]) -> tuple:
+    """Synced before static, then closest duration"""
+    return (result.type != "synced", _distance(result, duration))
+
+def _is_best(result: LyricsResponse, duration: Optional[float]) -> bool:
+    return result.type == "synced" and _distance(result, duration) <= DURATION_TOLERANCE
+
+
+async def find(artist: str = "", title: str = "", query: str = "", duration: Optional[float] = None) -> Optional[LyricsResponse]:
+    """Race every provider and return the best lyrics found within LYRICS_TIMEOUT"""
+    # Lyrics we have fetched before are served from the local store
+    result = lrclib.stored(artist, title, query, duration)
+    if result:
+        return result
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    owner: dict[asyncio.Task, Provider] = {}
+    hedge_at: dict[Provider, float] = {}
+    finished: set[Provider] = set()
+
+    for provider in _providers:
+        task = asyncio.create_task(provider.call(artist, title, query, duration))
+        owner[task] = provider
+        if provider.hedge:
+            hedge_at[provider] = started + provider.hedge_delay()
+
+    pending = set(owner)
+    best: Optional[LyricsResponse] = None
+    unavailable: Optional[limits.Unavailable] = None
+    try:
+        while pending:
+            now = loop.time()
+            deadline = started + LYRICS_TIMEOUT
+            wake = min([deadline] + list(hedge_at.values()))
+            done, pending = await asyncio.wait(pending, timeout=max(0, wake - now), return_when=asyncio.FIRST_COMPLETED)
+
+            for task in done:
+                provider = owner[task]
+                error = task.exception()
+                if isinstance(error, limits.Unavailable):
+                    unavailable = error
+                    finished.add(provider)
+                    hedge_at.pop(provider, None)
+                    continue
+                if error is not None:
+                    print(f"Lyrics provider {provider.name} error: {error}")
+                    continue
+                result = task.result()
+                finished.add(provider)
+                hedge_at.pop(provider, None)
+                if result is None:
+                    continue
+                if _is_best(result, duration):
+                    return result
+                if best is None or rank(result, duration) < rank(best, duration):
+                    best = result
+
+            # The other copy of a provider that already answered is no longer needed
+            for task in list(pending):
+                if owner[task] in finished:
+                    task.cancel()
+                    pending.discard(task)
+
+            now = loop.time()
+            if now >= deadline:
+                break
+            for provider, at in list(hedge_at.items()):
+                if now >= at:
+                    del hedge_at[provider]
+                    task = asyncio.create_task(provider.call(artist, title, query, duration, hedged=True))
+                    owner[task] = provider
+                    pending.add(task)
+    finally:
+        for task in pending:
+            task.cancel()
+    if best is None and unavailable is not None:
+        # Upstreams are shedding: say so rather than caching a miss
+        raise unavailable
+    if best is None and len(finished) < len(_providers):
+        raise LookupFailed(f"{len(_providers) - len(finished)} lyrics provider(s) failed or timed out")
+    return best
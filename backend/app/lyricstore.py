@@ -0,0 +1,202 @@
+import os
+import sqlite3
+import threading
+import time
+from difflib import SequenceMatcher
+from typing import Optional
+from .canonical import name as normalize
+
+# Persistent local copy of every lrclib record we have fetched, keyed by lrclib id.
+# Artist/title are stored normalized, with an exact-match index for the common case
+# and an FTS5 index to find candidates for fuzzy matching.
+LYRICS_STORE_ENABLED = os.getenv("LYRICS_STORE_ENABLED", "true").lower() == "true"
+LYRICS_STORE_PATH = os.getenv("LYRICS_STORE_PATH", "/tmp/lyricgen-lyrics.sqlite3")
+MATCH_THRESHOLD = 0.9     # similarity of normalized "artist title" needed for a fuzzy match
+MATCH_CANDIDATES = 20
+DURATION_TOLERANCE = 5.0  # seconds; beyond this a stored duration rules a match out
+# Calls run on the event loop: wait this long for another worker's write lock, then treat
+# the store as a miss (or skip the save) rather than hold up every request
+LYRICS_STORE_BUSY_TIMEOUT = float(os.getenv("LYRICS_STORE_BUSY_TIMEOUT", "0.05"))
+
+_lock = threading.Lock()
+_db: Optional[sqlite3.Connection] = None
+
+stats = {"hits": 0, "fuzzy_hits": 0, "misses": 0, "saved": 0, "errors": 0}
+
+
+def _connect() -> sqlite3.Connection:
+    global _db
+    if _db is None:
+        db = sqlite3.connect(LYRICS_STORE_PATH, timeout=5, isolation_level=None, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS lyrics ("
+            " id INTEGER PRIMARY KEY, artist TEXT, title TEXT, album TEXT, duration REAL,"
+            " synced TEXT, plain TEXT, artist_norm TEXT NOT NULL, title_norm TEXT NOT NULL, fetched REAL NOT NULL)"
+        )
+        db.execute("CREATE INDEX IF NOT EXISTS lyrics_name ON lyrics (artist_norm, title_norm)")
+        db.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS lyrics_fts USING fts5("
+            " artist_norm, title_norm, content='lyrics', content_rowid='id')"
+        )
+        # Keep the external-content FTS index in step with the table
+        db.execute(
+            "CREATE TRIGGER IF NOT EXISTS lyrics_ai AFTER INSERT ON lyrics BEGIN"
+            " INSERT INTO lyrics_fts (rowid, artist_norm, title_norm) VALUES (new.id, new.artist_norm, new.title_norm); END"
+        )
+        db.execute(
+            "CREATE TRIGGER IF NOT EXISTS lyrics_ad AFTER DELETE ON lyrics BEGIN"
+            " INSERT INTO lyrics_fts (lyrics_fts, rowid, artist_norm, title_norm)"
+            " VALUES ('delete', old.id, old.artist_norm, old.title_norm); END"
+        )
+        if db.execute("PRAGMA user_version").fetchone()[0] < 1:
+            _renormalize(db)
+            db.execute("PRAGMA user_version = 1")
+        # Setup may wait for workers starting alongside; lookups and saves don't
+        db.execute(f"PRAGMA busy_timeout = {int(LYRICS_STORE_BUSY_TIMEOUT * 1000)}")
+        _db = db
+    return _db
+
+
+def connect():
+    """Open (and migrate) the store ahead of the first lookup; runs on a worker thread at startup"""
+    if LYRICS_STORE_ENABLED:
+        with _lock:
+            _connect()
+
+
+def _renormalize(db: sqlite3.Connection):
+    """Names stored before non-Latin scripts kept their marks: redo those (and their FTS rows)"""
+    rows = db.execute("SELECT id, artist, title, artist_norm, title_norm FROM lyrics").fetchall()
+    for row_id, artist, title, artist_norm, title_norm in rows:
+        if (artist or "").isascii() and (title or "").isascii():
+            continue
+        new = (normalize(artist or ""), normalize(title or ""))
+        if new == (artist_norm, title_norm):
+            continue
+        db.execute("INSERT INTO lyrics_fts (lyrics_fts, rowid, artist_norm, title_norm) VALUES ('delete', ?, ?, ?)",
+                   (row_id, artist_norm, title_norm))
+        db.execute("UPDATE lyrics SET artist_norm = ?, title_norm = ? WHERE id = ?", (*new, row_id))
+        db.execute("INSERT INTO lyrics_fts (rowid, artist_norm, title_norm) VALUES (?, ?, ?)", (row_id, *new))
+
+
+def _record(row) -> dict:
+    """An lrclib-shaped record, so the provider can build its response from it"""
+    return {
+        "id": row[0], "artistName": row[1], "trackName": row[2], "albumName": row[3],
+        "duration": row[4], "syncedLyrics": row[5], "plainLyrics": row[6],
+    }
+
+_COLUMNS = "id, artist, title, album, duration, synced, plain"
+
+
+def _failed(what: str, e: sqlite3.Error):
+    """A store that is locked or broken only costs the local copy, never the request"""
+    stats["errors"] += 1
+    print(f"Lyrics store {what} error: {e}")
+
+
+def save(records: list[dict]):
+    """Store lrclib records (as returned by /get or /search) in one transaction"""
+    if not LYRICS_STORE_ENABLED:
+        return
+    now = time.time()
+    rows = []
+    for data in records:
+        if not data.get("id") or not (data.get("syncedLyrics") or data.get("plainLyrics")):
+            continue
+        artist, title = data.get("artistName") or "", data.get("trackName") or ""
+        rows.append((int(data["id"]), artist, title, data.get("albumName"), data.get("duration"),
+                     data.get("syncedLyrics"), data.get("plainLyrics"), normalize(artist), normalize(title), now))
+    if not rows:
+        return
+    try:
+        with _lock:
+            db = _connect()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                # REPLACE is a delete + insert, which the triggers mirror into the FTS index
+                db.executemany(
+                    f"INSERT OR REPLACE INTO lyrics ({_COLUMNS}, artist_norm, title_norm, fetched) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+    except sqlite3.Error as e:
+        _failed("write", e)
+        return
+    stats["saved"] += len(rows)
+
+
+def get(lrclib_id: str) -> Optional[dict]:
+    """Stored record by lrclib id"""
+    if not LYRICS_STORE_ENABLED or not str(lrclib_id).isdigit():
+        return None
+    try:
+        with _lock:
+            row = _connect().execute(f"SELECT {_COLUMNS} FROM lyrics WHERE id = ?", (int(lrclib_id),)).fetchone()
+    except sqlite3.Error as e:
+        _failed("read", e)
+        return None
+    stats["hits" if row else "misses"] += 1
+    return _record(row) if row else None
+
+
+def _rank(row, duration: Optional[float]) -> tuple:
+    distance = abs(row[4] - duration) if duration and row[4] else DURATION_TOLERANCE
+    return (not row[5], distance)
+
+def _fits(row, duration: Optional[float]) -> bool:
+    return not duration or not row[4] or abs(row[4] - duration) <= DURATION_TOLERANCE
+
+
+def find(artist: str = "", title: str = "", query: str = "", duration: Optional[float] = None) -> Optional[dict]:
+    """Best stored record for artist + title (or a free-text query): an exact normalized
+    match if there is one, else the closest fuzzy match; duration breaks ties"""
+    if not LYRICS_STORE_ENABLED:
+        return None
+    try:
+        with _lock:
+            db = _connect()
+            rows = []
+            if artist and title:
+                rows = db.execute(
+                    f"SELECT {_COLUMNS} FROM lyrics WHERE artist_norm = ? AND title_norm = ?",
+                    (normalize(artist), normalize(title)),
+                ).fetchall()
+                rows = [row for row in rows if _fits(row, duration)]
+            if rows:
+                stats["hits"] += 1
+                return _record(min(rows, key=lambda row: _rank(row, duration)))
+
+            wanted = normalize(f"{artist} {title}" if artist or title else query)
+            if not wanted:
+                return None
+            terms = " OR ".join(f'"{token}"' for token in wanted.split())
+            candidates = db.execute(
+                f"SELECT {', '.join('l.' + c.strip() for c in _COLUMNS.split(','))}, l.artist_norm, l.title_norm"
+                " FROM lyrics_fts JOIN lyrics l ON l.id = lyrics_fts.rowid"
+                " WHERE lyrics_fts MATCH ? ORDER BY bm25(lyrics_fts) LIMIT ?",
+                (terms, MATCH_CANDIDATES),
+            ).fetchall()
+    except sqlite3.Error as e:
+        _failed("read", e)
+        return None
+
+    best, best_key = None, None
+    for row in candidates:
+        if not _fits(row, duration):
+            continue
+        # Free-text queries may put the title first ("yellow coldplay")
+        names = [f"{row[7]} {row[8]}", f"{row[8]} {row[7]}"]
+        similarity = max(SequenceMatcher(None, wanted, name).ratio() for name in names)
+        if similarity < MATCH_THRESHOLD:
+            continue
+        key = (-similarity,) + _rank(row, duration)
+        if best_key is None or key < best_key:
+            best, best_key = row, key
+    stats["fuzzy_hits" if best else "misses"] += 1
+    return _record(best) if best else None
@@ -1,24 +1,102 @@
 from fastapi import FastAPI, Query, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, StreamingResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.routing import APIRouter
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.background import BackgroundTask
+from contextlib import asynccontextmanager
+from functools import partial
 from typing import Optional
 from pydantic import BaseModel
+import asyncio
 import httpx
+import importlib
 import os
+import sqlite3
+import time
 
-from .models import SearchResponse, LyricsResponse, ErrorResponse
+from .models import SearchResponse, LyricsResponse, ErrorResponse, BatchRequest, SearchItem, LyricsItem, StreamItem
 from .providers import lrclib, ytmusic, youtube
-from . import cache
+from . import art, audiocache, cache, canonical, clients, limits, lyrics, lyricstore, metrics, responses, singleflight, spa, suggest, timing, transcode
 
 # Static directory for SPA
 STATIC_DIR = os.path.join(os.path.dirname(__file__), "static")
 SPA_ENABLED = os.path.exists(STATIC_DIR)
 MAINTENANCE_MODE = os.getenv("MAINTENANCE_MODE", "false").lower() == "true"
 
-app = FastAPI(title="SonicScript API", version="1.0.0")
+# Upstream audio proxy (the pooled "audio" client lives in clients.py)
+AUDIO_CHUNK_SIZE = int(os.getenv("AUDIO_CHUNK_SIZE", str(64 * 1024)))
+AUDIO_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+    # Keep Content-Length/Content-Range valid for the bytes we pass through
+    "Accept-Encoding": "identity",
+}
+# Browser cache lifetimes for cached API responses
+SEARCH_MAX_AGE = 3600
+RECOMMENDATIONS_MAX_AGE = 300
+LYRICS_MAX_AGE = 86400
+SUGGEST_MAX_AGE = 60
+# Typeahead: below SUGGEST_SPARSE local matches, upstream search results are merged in
+# for prefixes of at least SUGGEST_UPSTREAM_MIN_CHARS, waiting at most SUGGEST_UPSTREAM_WAIT
+SUGGEST_SPARSE = int(os.getenv("SUGGEST_SPARSE", "3"))
+SUGGEST_UPSTREAM_MIN_CHARS = int(os.getenv("SUGGEST_UPSTREAM_MIN_CHARS", "3"))
+SUGGEST_UPSTREAM_WAIT = float(os.getenv("SUGGEST_UPSTREAM_WAIT", "1.5"))
+# Batch endpoints (the item limit itself lives on BatchRequest)
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "6"))
+# Fast start: serve right away and bring up the heavy providers (yt-dlp workers, ytmusicapi,
+# numpy) in the background once the first request has been answered, or after WARMUP_DELAY
+FAST_START = os.getenv("FAST_START", "true").lower() == "true"
+WARMUP_DELAY = float(os.getenv("WARMUP_DELAY", "30"))
+
+PASSTHROUGH_HEADERS = ("Content-Type", "Content-Length", "Content-Range", "Accept-Ranges", "Last-Modified", "ETag")
+
+_first_request = asyncio.Event()
+startup = {"fast_start": FAST_START, "restored_entries": 0, "ready_seconds": None, "warm_seconds": None}
+
+async def _warm_up(started: float):
+    if FAST_START:
+        try:
+            await asyncio.wait_for(_first_request.wait(), WARMUP_DELAY)
+        except asyncio.TimeoutError:
+            pass
+    try:
+        await asyncio.gather(youtube.start(), ytmusic.start(), asyncio.to_thread(importlib.import_module, "numpy"),
+                             asyncio.to_thread(lyricstore.connect))
+    except Exception as e:
+        print(f"Warm-up failed, providers will start on first use: {e}")
+    startup["warm_seconds"] = round(time.perf_counter() - started, 3)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    started = time.perf_counter()
+    # Pick up where the previous process left off instead of sending every key upstream again
+    startup["restored_entries"] = cache.restore()
+    await clients.startup()
+    audiocache.load()
+    art.load()
+    warm_task = asyncio.create_task(_warm_up(started))
+    suggest_task = asyncio.create_task(suggest.load())
+    refresh_task = asyncio.create_task(youtube.refresh_loop())
+    # Keep the home feed warm and refresh popular entries before they expire
+    cache.pin("recommendations", "home", _load_recommendations)
+    prewarm_task = asyncio.create_task(cache.refresh_loop())
+    lag_task = asyncio.create_task(metrics.loop_lag_monitor())
+    startup["ready_seconds"] = round(time.perf_counter() - started, 3)
+    try:
+        yield
+    finally:
+        warm_task.cancel()
+        suggest_task.cancel()
+        refresh_task.cancel()
+        prewarm_task.cancel()
+        lag_task.cancel()
+        try:
+            print(f"Cache snapshot: {cache.snapshot()} entries saved")
+        except (OSError, sqlite3.Error) as e:
+            print(f"Cache snapshot failed: {e}")
+        youtube.shutdown()
+        await clients.shutdown()
+
+app = FastAPI(title="SonicScript API", version="1.0.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -26,23 +104,60 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
+app.add_middleware(metrics.MetricsMiddleware)
 
-# Maintenance mode middleware - only block API routes, allow static files
-@app.middleware("http")
-async def maintenance_middleware(request: Request, call_next):
-    path = request.url.path
-    # Allow: health check, static assets, and root (for SPA to load)
-    is_api = path.startswith("/api/")
-    is_allowed = path == "/health" or path.startswith("/assets") or not is_api
-    
-    if MAINTENANCE_MODE and not is_allowed:
-        from fastapi.responses import JSONResponse
-        return JSONResponse(
-            {"maintenance": True, "message": "Site is under maintenance. Please check back soon!"},
-            status_code=503
-        )
-    return await call_next(request)
+class FirstRequestMiddleware:
+    """Lets the background warm-up start once the first response is out"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if scope["type"] == "http":
+                _first_request.set()
+
+app.add_middleware(FirstRequestMiddleware)
+
+@app.exception_handler(youtube.ExtractionBusy)
+async def extraction_busy_handler(request: Request, exc: youtube.ExtractionBusy):
+    return JSONResponse(
+        {"error": "Audio extraction is busy, retry shortly", "code": "EXTRACTION_BUSY"},
+        status_code=503,
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+@app.exception_handler(limits.Unavailable)
+async def upstream_unavailable_handler(request: Request, exc: limits.Unavailable):
+    return JSONResponse(
+        {"error": f"Upstream {exc.upstream} is {exc.reason}, retry shortly", "code": "UPSTREAM_UNAVAILABLE"},
+        status_code=503,
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+class MaintenanceMiddleware:
+    """Only blocks API routes; the SPA, static files and /health keep working"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].startswith("/api/"):
+            response = JSONResponse(
+                {"maintenance": True, "message": "Site is under maintenance. Please check back soon!"},
+                status_code=503
+            )
+            await response(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+
+# Not installed at all outside maintenance, so normal requests pay nothing for it
+if MAINTENANCE_MODE:
+    app.add_middleware(MaintenanceMiddleware)
 
 class StreamResponse(BaseModel):
     url: str
@@ -51,119 +166,352 @@ class StreamResponse(BaseModel):
 # ============ API ROUTER ============
 api_router = APIRouter(prefix="/api/v1")
 
+def _pack_results(results) -> bytes:
+    return responses.pack(responses.dumps(SearchResponse(results=results)))
+
+async def _search(q: str) -> bytes:
+    async def load():
+        # An empty result (or an upstream error) never replaces what is cached
+        results = await ytmusic.search(q)
+        return _pack_results(results) if results else None
+
+    key = canonical.search_key(q)
+    return await cache.get_or_refresh("search", key, load, on_lookup=partial(canonical.note, "search", q, key)) or _pack_results([])
+
 @api_router.get("/search", response_model=SearchResponse)
-async def search(q: str = Query(..., min_length=1)):
-    cached = cache.get("search", q)
-    if cached:
-        return SearchResponse(results=cached)
-    results = await ytmusic.search(q)
-    cache.set("search", q, [r.model_dump() for r in results])
-    return SearchResponse(results=results)
+async def search(request: Request, q: str = Query(..., min_length=1)):
+    return responses.serve(request, await _search(q), max_age=SEARCH_MAX_AGE)
 
-@api_router.get("/recommendations", response_model=SearchResponse)
-async def recommendations():
-    cached = cache.get("recommendations", "home")
-    if cached:
-        return SearchResponse(results=cached)
+@api_router.get("/suggest", response_model=SearchResponse)
+async def suggest_tracks(request: Request, q: str = Query(..., min_length=1), limit: int = Query(8, ge=1, le=suggest.MAX_RESULTS)):
+    """Search-as-you-type from the local index of tracks already seen"""
+    ids = suggest.lookup(q, limit)
+    bodies = [suggest.body(track_id) for track_id in ids]
+    if len(ids) < min(SUGGEST_SPARSE, limit) and len(suggest.prefix(q)) >= SUGGEST_UPSTREAM_MIN_CHARS:
+        bodies += await _suggest_upstream(q, set(ids), limit - len(ids))
+    packed = responses.pack(b'{"results":[' + b",".join(bodies) + b"]}")
+    return responses.serve(request, packed, max_age=SUGGEST_MAX_AGE)
+
+async def _search_quietly(q: str) -> Optional[bytes]:
+    try:
+        return await _search(q)
+    except limits.Unavailable:
+        return None
+
+async def _suggest_upstream(q: str, seen: set, limit: int) -> list[bytes]:
+    """Full search results for a prefix the index knows little about. A search that
+    outlasts the wait keeps running, so its tracks are indexed for the next keystroke."""
+    suggest.stats["sparse"] += 1
+    try:
+        packed = await asyncio.wait_for(asyncio.shield(_search_quietly(q)), SUGGEST_UPSTREAM_WAIT)
+    except asyncio.TimeoutError:
+        suggest.stats["upstream_timeouts"] += 1
+        return []
+    if not packed:
+        return []
+    results = SearchResponse.model_validate_json(responses.decode(packed)).results
+    if results:
+        suggest.stats["upstream_merges"] += 1
+    return [track.model_dump_json().encode() for track in results if track.id not in seen][:limit]
+
+async def _load_recommendations() -> Optional[bytes]:
     results = await ytmusic.get_recommendations(limit=20)
-    cache.set("recommendations", "home", [r.model_dump() for r in results], ttl=3600)
-    return SearchResponse(results=results)
+    return _pack_results(results) if results else None
+
+@api_router.get("/recommendations", response_model=SearchResponse)
+async def recommendations(request: Request):
+    packed = await cache.get_or_refresh("recommendations", "home", _load_recommendations) or _pack_results([])
+    return responses.serve(request, packed, max_age=RECOMMENDATIONS_MAX_AGE)
 
 @api_router.get("/lyrics", response_model=LyricsResponse, responses={404: {"model": ErrorResponse}})
 async def get_lyrics(
+    request: Request,
     trackId: Optional[str] = None,
     query: Optional[str] = None,
     artist: Optional[str] = None,
-    title: Optional[str] = None
+    title: Optional[str] = None,
+    duration: Optional[float] = None,
+    mode: Optional[str] = Query(None, pattern="^(story|drill|kinetic)$")
 ):
-    cache_key = f"{artist}:{title}" if artist and title else (trackId or query)
-    cached = cache.get("lyrics", cache_key)
-    if cached:
-        return LyricsResponse(**cached)
-    
-    result = None
-    if artist and title:
-        result = await lrclib.get_lyrics_by_query(artist, title)
-    elif trackId and trackId.startswith("lrclib_"):
-        result = await lrclib.get_lyrics(trackId)
-    elif query:
-        result = await lrclib.get_lyrics_by_query("", query)
+    packed = await _lyrics(trackId, query, artist, title, duration, mode)
+    return responses.serve(request, packed, max_age=LYRICS_MAX_AGE)
+
+async def _lyrics(
+    trackId: Optional[str],
+    query: Optional[str],
+    artist: Optional[str],
+    title: Optional[str],
+    duration: Optional[float],
+    mode: Optional[str],
+) -> bytes:
+    raw_key = f"{artist}:{title}" if artist and title else (trackId or query)
+    cache_key = canonical.lyrics_key(trackId, query, artist, title)
     
-    if not result:
+    # Hits are served as the compressed bytes stored with the entry
+    packed = cache.get_bytes("timing", f"{mode}:{cache_key}") if mode else None
+    if packed:
+        canonical.note("lyrics", raw_key, cache_key, True)
+        return packed
+    if cache.get("lyrics_miss", cache_key):
+        canonical.note("lyrics", raw_key, cache_key, False)
         raise HTTPException(status_code=404, detail={"error": "Lyrics not found", "code": "LYRICS_NOT_FOUND"})
-    
-    cache.set("lyrics", cache_key, result.model_dump())
-    return result
+
+    async def load():
+        result = None
+        if artist and title:
+            result = await lyrics.find(artist=artist, title=title, duration=duration)
+        elif trackId and trackId.startswith("lrclib_"):
+            result = await lrclib.get_lyrics(trackId)
+        elif query:
+            result = await lyrics.find(query=query, duration=duration)
+        if not result:
+            return None
+        # A later request by the lrclib id this resolved to shares the entry
+        canonical.alias(result.trackId, cache_key)
+        return responses.pack(responses.dumps(result))
+
+    # Stale lyrics are served while a background refresh runs. Only a clean "not found"
+    # is remembered as a miss; a timeout or upstream error may hide lyrics that exist.
+    try:
+        packed = await cache.get_or_refresh("lyrics", cache_key, load, on_lookup=partial(canonical.note, "lyrics", raw_key, cache_key))
+    except (lyrics.LookupFailed, lrclib.UpstreamError, httpx.HTTPError) as e:
+        print(f"Lyrics lookup failed: {e}")
+        raise HTTPException(status_code=503, detail={"error": "Lyrics providers did not answer, retry shortly", "code": "LYRICS_UNAVAILABLE"},
+                            headers={"Retry-After": "5"})
+    if not packed:
+        cache.set("lyrics_miss", cache_key, True)
+        raise HTTPException(status_code=404, detail={"error": "Lyrics not found", "code": "LYRICS_NOT_FOUND"})
+    if not mode:
+        return packed
+
+    # Word timing for a renderer mode is computed once and cached next to the lyrics
+    result = LyricsResponse.model_validate_json(responses.decode(packed))
+    if result.type == "synced":
+        result.timing = timing.compute(result.lyrics, mode, result.wordTimes)
+    packed = responses.pack(responses.dumps(result))
+    cache.set_bytes("timing", f"{mode}:{cache_key}", packed)
+    return packed
 
 @api_router.get("/stream", response_model=StreamResponse, responses={404: {"model": ErrorResponse}})
 async def get_stream(
     request: Request,
     artist: Optional[str] = None,
     title: Optional[str] = None,
-    videoId: Optional[str] = None
+    videoId: Optional[str] = None,
+    bitrate: Optional[int] = Query(None, ge=8, le=512, description="Ask for Opus at about this many kbps (when transcoding is available)"),
 ):
     if videoId:
-        vid = videoId.replace("ytm_", "")
-    else:
+        # The track was picked from a list: it ranks higher in suggestions from now on
+        suggest.played(f"ytm_{canonical.video_id(videoId)}")
+    return await _stream(request, artist, title, videoId, bitrate)
+
+async def _track_for(artist: str, title: str) -> dict:
+    """The video an artist + title plays ({"id", "duration"}), cached in the "stream" namespace"""
+    key = canonical.track_key(artist, title)
+    track = cache.get("stream", key)
+    canonical.note("stream", f"{artist}:{title}", key, track is not None)
+    if not track:
         results = await ytmusic.search(f"{artist} {title}", limit=1)
         if not results:
             raise HTTPException(status_code=404, detail={"error": "Track not found", "code": "TRACK_NOT_FOUND"})
-        vid = results[0].id.replace("ytm_", "")
+        track = {"id": canonical.video_id(results[0].id), "duration": results[0].duration or None}
+        cache.set("stream", key, track)
+    return track
+
+async def _stream(request: Request, artist: Optional[str], title: Optional[str], videoId: Optional[str],
+                  bitrate: Optional[int] = None) -> StreamResponse:
+    duration = None
+    if videoId:
+        vid = canonical.video_id(videoId)
+    else:
+        track = await _track_for(artist or "", title or "")
+        vid, duration = track["id"], track["duration"]
     
     # Build proxy URL with correct scheme (respect X-Forwarded-Proto from reverse proxy)
     scheme = request.headers.get("x-forwarded-proto", request.url.scheme)
     host = request.headers.get("x-forwarded-host", request.url.netloc)
     proxy_url = f"{scheme}://{host}/api/v1/audio/{vid}"
     
-    # Get duration from cache or fetch
-    cache_key = f"duration_{vid}"
-    duration = cache.get("duration", vid)
-    if not duration:
-        info = await youtube.get_stream_url(vid)
+    # Search already gave us the duration: resolve in the background for the
+    # /audio request that follows. Otherwise the same resolution serves both.
+    if duration:
+        youtube.prefetch(vid)
+    else:
+        info = await youtube.resolve(vid)
         if info:
             duration = info.get("duration")
-            cache.set("duration", vid, duration, ttl=86400)
+
+    # Opus for weak links only once its rendition is on disk: one URL, one byte stream
+    if bitrate and transcode.available():
+        bitrate = transcode.snap(bitrate)
+        if transcode.ready(vid, bitrate):
+            proxy_url += f"/opus/{bitrate}"
+        else:
+            transcode.prepare(vid, bitrate, youtube.resolve)
     
     return StreamResponse(url=proxy_url, duration=duration)
 
+# ============ BATCH ============
+# Up to BATCH_MAX_ITEMS items per call, resolved BATCH_CONCURRENCY at a time;
+# each result is written as one NDJSON line as soon as it is ready:
+# {"index": 3, "status": 200, "result": {...}} or {"index": 3, "status": 404, "error": {...}}
+
+def _batch_line(index: int, status: int, key: str, body: bytes) -> bytes:
+    return b'{"index":%d,"status":%d,"%s":%s}\n' % (index, status, key.encode(), body)
+
+async def _batch(items: list, handler) -> StreamingResponse:
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def run(index: int, item) -> bytes:
+        async with semaphore:
+            try:
+                result = await handler(item)
+            except HTTPException as e:
+                return _batch_line(index, e.status_code, "error", responses.dumps(e.detail))
+            except limits.Unavailable as e:
+                body = {"error": f"Upstream {e.upstream} is {e.reason}, retry shortly", "code": "UPSTREAM_UNAVAILABLE", "retryAfter": e.retry_after}
+                return _batch_line(index, 503, "error", responses.dumps(body))
+            except Exception as e:
+                print(f"Batch item error: {e}")
+                return _batch_line(index, 500, "error", b'{"error":"Internal error","code":"INTERNAL_ERROR"}')
+        body = responses.decode(result) if isinstance(result, bytes) else responses.dumps(result)
+        return _batch_line(index, 200, "result", body)
+
+    async def lines():
+        tasks = [asyncio.create_task(run(i, item)) for i, item in enumerate(items)]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            # Client went away: stop the rest of the batch
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@api_router.post("/batch/search")
+async def batch_search(batch: BatchRequest[SearchItem]):
+    return await _batch(batch.items, lambda item: _search(item.q))
+
+@api_router.post("/batch/lyrics")
+async def batch_lyrics(batch: BatchRequest[LyricsItem]):
+    return await _batch(batch.items, lambda item: _lyrics(item.trackId, item.query, item.artist, item.title, item.duration, item.mode))
+
+@api_router.post("/batch/stream")
+async def batch_stream(request: Request, batch: BatchRequest[StreamItem]):
+    return await _batch(batch.items, lambda item: _stream(request, item.artist, item.title, item.videoId))
+
+@api_router.get("/art/{art_id}", responses={404: {"model": ErrorResponse}})
+async def cover_art(
+    art_id: str,
+    request: Request,
+    size: int = Query(max(art.SIZES), ge=1, le=2048),
+    format: Optional[str] = Query(None, pattern="^(webp|jpeg)$"),
+):
+    """Cover art in one of art.SIZES; WebP for clients that accept it unless format is given"""
+    fmt = format or ("webp" if "image/webp" in request.headers.get("accept", "") else "jpeg")
+    variant = await art.get(art_id, size, fmt)
+    if variant is None:
+        raise HTTPException(status_code=404, detail="Cover art not found")
+    return art.serve(request, variant, negotiated=format is None)
+
 @api_router.get("/audio/{video_id}")
 async def proxy_audio(video_id: str, request: Request):
     """Proxy audio stream from YouTube to bypass CORS/IP restrictions"""
-    cache_key = f"yt_url_{video_id}"
-    yt_url = cache.get("yt_url", video_id)
+    info = await youtube.resolve(video_id, playing=True)
+    if not info or not info.get("url"):
+        raise HTTPException(status_code=404, detail="Audio not found")
+    yt_url = info["url"]
     
-    if not yt_url:
-        info = await youtube.get_stream_url(video_id)
-        if not info or not info.get("url"):
-            raise HTTPException(status_code=404, detail="Audio not found")
-        yt_url = info["url"]
-        cache.set("yt_url", video_id, yt_url, ttl=3600)
+    # Serve from the on-disk segment cache when the whole range is there
+    cache_key = audiocache.key_for(video_id, yt_url)
+    range_header = request.headers.get("range")
+    byte_range = audiocache.parse_range(range_header)
+    if byte_range and byte_range[0] == 0:
+        audiocache.record_play(cache_key, yt_url, clients.get("audio"), AUDIO_HEADERS)
+    cached = audiocache.lookup(cache_key, range_header)
+    if cached:
+        return cached
     
     # Forward range header if present
-    headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"}
-    range_header = request.headers.get("range")
+    headers = dict(AUDIO_HEADERS)
     if range_header:
         headers["Range"] = range_header
     
-    async with httpx.AsyncClient() as client:
-        yt_response = await client.get(yt_url, headers=headers)
-        
-        response_headers = {
-            "Accept-Ranges": "bytes",
-            "Content-Type": yt_response.headers.get("Content-Type", "audio/webm"),
-        }
-        
-        if "Content-Length" in yt_response.headers:
-            response_headers["Content-Length"] = yt_response.headers["Content-Length"]
-        if "Content-Range" in yt_response.headers:
-            response_headers["Content-Range"] = yt_response.headers["Content-Range"]
-        
-        return StreamingResponse(
-            iter([yt_response.content]),
-            status_code=yt_response.status_code,
-            headers=response_headers,
-            media_type=response_headers["Content-Type"]
-        )
+    audio_client = clients.get("audio")
+    upstream = audio_client.build_request("GET", yt_url, headers=headers)
+    # The slot covers connecting and the first byte; the body then streams unthrottled
+    async with clients.guard("audio") as call:
+        start = time.perf_counter()
+        try:
+            yt_response = await audio_client.send(upstream, stream=True)
+        except httpx.HTTPError as e:
+            clients.record("audio", time.perf_counter() - start, error=True)
+            call.ok = False
+            print(f"Audio proxy upstream error: {e}")
+            raise HTTPException(status_code=502, detail="Audio upstream unavailable")
+        clients.record("audio", time.perf_counter() - start, error=yt_response.status_code >= 500)
+        call.ok = yt_response.status_code < 500
+    
+    response_headers = {"Accept-Ranges": "bytes"}
+    for name in PASSTHROUGH_HEADERS:
+        if name in yt_response.headers:
+            response_headers[name] = yt_response.headers[name]
+    response_headers.setdefault("Content-Type", info.get("mime_type") or "audio/webm")
+    
+    # Chunks are forwarded as they arrive (and written through to the segment cache);
+    # the upstream stream is closed once the body is done or the client disconnects
+    # (Starlette runs background tasks either way)
+    sink = audiocache.writer(cache_key, yt_response)
+    return StreamingResponse(
+        _tee(yt_response.aiter_bytes(AUDIO_CHUNK_SIZE), sink),
+        status_code=yt_response.status_code,
+        headers=response_headers,
+        media_type=response_headers["Content-Type"],
+        background=BackgroundTask(_close_upstream, yt_response, sink),
+    )
+
+@api_router.get("/audio/{video_id}/opus/{bitrate}")
+async def audio_rendition(video_id: str, bitrate: int, request: Request):
+    """Opus rendition at a lower bitrate for weak links (/stream hands this out once it exists)"""
+    rendition = transcode.serve(video_id, bitrate, request.headers.get("range"))
+    if rendition is None:
+        raise HTTPException(status_code=404, detail="Rendition not found")
+    return rendition
+
+@api_router.get("/audio/{video_id}/hls/{bitrate}/index.m3u8")
+async def audio_playlist(video_id: str, bitrate: int):
+    """HLS playlist of short Opus segments, so a seek fetches one small file"""
+    if not transcode.available():
+        raise HTTPException(status_code=404, detail="Segmented audio is not available")
+    info = await youtube.resolve(video_id, playing=True)
+    if not info or not info.get("url"):
+        raise HTTPException(status_code=404, detail="Audio not found")
+    playlist = await transcode.playlist(video_id, info, bitrate)
+    if playlist is None:
+        raise HTTPException(status_code=502, detail="Audio could not be segmented")
+    return playlist
+
+@api_router.get("/audio/{video_id}/hls/{bitrate}/{name}")
+async def audio_segment(video_id: str, bitrate: int, name: str):
+    segment = transcode.segment(video_id, bitrate, name)
+    if segment is None:
+        raise HTTPException(status_code=404, detail="Segment not found")
+    return segment
+
+async def _tee(chunks, sink: Optional[audiocache.Writer]):
+    async for chunk in chunks:
+        if sink:
+            await sink.write(chunk)
+        yield chunk
+
+async def _close_upstream(response: httpx.Response, sink: Optional[audiocache.Writer]):
+    if sink:
+        await sink.close()
+    await response.aclose()
+    seconds = response.elapsed.total_seconds()
+    if response.num_bytes_downloaded and seconds > 0:
+        metrics.audio_throughput.observe(response.num_bytes_downloaded / seconds)
 
 # Include API router FIRST
 app.include_router(api_router)
@@ -172,26 +520,61 @@ app.include_router(api_router)
 async def health():
     return {"status": "ok"}
 
-# ============ SPA MIDDLEWARE ============
-# Handle SPA routing via middleware to ensure API routes are never intercepted
+def _by_key(stats: dict, *fields: str) -> dict:
+    return {(key, field): entry[field] for key, entry in stats.items() for field in fields}
+
+metrics.register("cache_requests_total", "counter", "Cache lookups by namespace and result", ("namespace", "result"),
+                 lambda: _by_key(cache.stats, "hits", "stale_hits", "misses"))
+metrics.register("cache_refreshes_total", "counter", "Background cache refreshes", ("namespace",),
+                 lambda: {(ns, ): entry["refreshes"] for ns, entry in cache.stats.items()})
+metrics.register("cache_evictions_total", "counter", "Cache entries dropped for space", ("namespace",),
+                 lambda: {(ns, ): entry["evictions"] for ns, entry in cache.stats.items()})
+metrics.register("cache_busy_total", "counter", "Shared cache calls that found the database locked", ("namespace",),
+                 lambda: {(ns, ): entry["busy"] for ns, entry in cache.stats.items()})
+metrics.register("audio_cache_total", "counter", "Audio segment cache events and bytes", ("event",),
+                 lambda: {(name, ): value for name, value in audiocache.stats.items()})
+metrics.register("lyrics_store_total", "counter", "Local lyrics store lookups and saves", ("event",),
+                 lambda: {(name, ): value for name, value in lyricstore.stats.items()})
+metrics.register("art_requests_total", "counter", "Cover art cache outcomes, upstream fetches and resizes", ("event",),
+                 lambda: {(name, ): value for name, value in art.stats.items()})
+metrics.register("transcode_total", "counter", "Cached Opus renditions served and made, and plays left on passthrough", ("event",),
+                 lambda: {(name, ): value for name, value in transcode.stats.items()})
+metrics.register("suggest_total", "counter", "Typeahead queries, upstream merges and index changes", ("event",),
+                 lambda: {(name, ): value for name, value in suggest.stats.items()})
+metrics.register("suggest_index_tracks", "gauge", "Tracks in the typeahead index", (),
+                 lambda: {(): suggest.size()})
+metrics.register("upstream_requests_total", "counter", "Upstream HTTP requests by provider and outcome", ("provider", "outcome"),
+                 lambda: _by_key(clients.stats, "requests", "errors", "retries"))
+metrics.register("singleflight_calls_total", "counter", "Coalescable calls and how many joined an in-flight one", ("group", "kind"),
+                 lambda: _by_key(singleflight.stats(), "calls", "coalesced"))
+metrics.register("singleflight_inflight", "gauge", "Calls currently in flight", ("group",),
+                 lambda: {(group, ): entry["inflight"] for group, entry in singleflight.stats().items()})
+metrics.register("upstream_concurrency_limit", "gauge", "Current adaptive concurrency limit", ("upstream",),
+                 lambda: {(name, ): entry["limit"] for name, entry in limits.stats().items()})
+metrics.register("upstream_inflight", "gauge", "Calls holding a concurrency slot", ("upstream",),
+                 lambda: {(name, ): entry["inflight"] for name, entry in limits.stats().items()})
+metrics.register("upstream_queued", "gauge", "Calls waiting for a concurrency slot", ("upstream",),
+                 lambda: {(name, ): entry["queued"] for name, entry in limits.stats().items()})
+metrics.register("upstream_breaker_open", "gauge", "1 while the circuit breaker is open or half-open", ("upstream",),
+                 lambda: {(name, ): int(entry["state"] != "closed") for name, entry in limits.stats().items()})
+metrics.register("upstream_rejected_total", "counter", "Calls shed (queue over budget) or rejected (breaker open)", ("upstream", "reason"),
+                 lambda: _by_key(limits.stats(), "shed", "rejected"))
+metrics.register("extractions_inflight", "gauge", "yt-dlp extractions running or queued", (),
+                 lambda: {(): youtube.pending()})
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/stats")
+async def stats():
+    return {"singleflight": singleflight.stats(), "audio_cache": audiocache.stats, "http": clients.summary(),
+            "lyrics_store": lyricstore.stats, "art": art.stats, "transcode": transcode.stats, "suggest": suggest.summary(), "upstreams": limits.stats(), "canonical": canonical.report(),
+            "startup": startup, "cache": {"namespaces": cache.stats, "entries": cache.entries()}}
+
+# ============ SPA ============
+# Served by a middleware in front of the router, so API routes are never intercepted
+# and client-side routes get index.html without a trip through the route table
 
 if SPA_ENABLED:
-    app.mount("/assets", StaticFiles(directory=os.path.join(STATIC_DIR, "assets")), name="assets")
-    
-    class SPAMiddleware(BaseHTTPMiddleware):
-        async def dispatch(self, request: Request, call_next):
-            response = await call_next(request)
-            
-            # If we got a 404 and it's NOT an API route, serve index.html
-            if response.status_code == 404:
-                path = request.url.path
-                if not path.startswith("/api/") and not path.startswith("/health") and not path.startswith("/assets") and not path.startswith("/docs") and not path.startswith("/openapi"):
-                    return FileResponse(os.path.join(STATIC_DIR, "index.html"))
-            
-            return response
-    
-    app.add_middleware(SPAMiddleware)
-    
-    @app.get("/")
-    async def serve_index():
-        return FileResponse(os.path.join(STATIC_DIR, "index.html"))
+    app.add_middleware(spa.SPAMiddleware, directory=STATIC_DIR)
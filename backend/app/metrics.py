@@ -0,0 +1,154 @@
+import asyncio
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+# Prometheus text-format metrics without a client library: histograms for routes
+# and provider stages, plus counters/gauges read from the stats the modules
+# already keep. Stage timings of the current request also go out as Server-Timing.
+PREFIX = "lyricgen"
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+THROUGHPUT_BUCKETS = (64e3, 256e3, 1e6, 4e6, 16e6, 64e6, 256e6)  # bytes/s
+LOOP_LAG_INTERVAL = 0.5
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...], buckets: tuple = LATENCY_BUCKETS):
+        self.name = f"{PREFIX}_{name}"
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self.series: dict[tuple, list] = {}   # label values -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, *label_values: str):
+        series = self.series.get(label_values)
+        if series is None:
+            series = self.series[label_values] = [0] * len(self.buckets) + [0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for values, series in sorted(self.series.items()):
+            labels = _labels(self.labels, values)
+            for bound, count in zip(self.buckets, series):
+                lines.append(f'{self.name}_bucket{{{labels}{"," if labels else ""}le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{labels}{"," if labels else ""}le="+Inf"}} {series[-1]}')
+            lines.append(f"{self.name}_sum{{{labels}}} {series[-2]}")
+            lines.append(f"{self.name}_count{{{labels}}} {series[-1]}")
+        return lines
+
+
+class Collected:
+    """Counter or gauge whose samples are read from existing stats at scrape time"""
+
+    def __init__(self, name: str, kind: str, help: str, labels: tuple[str, ...], collect: Callable[[], dict]):
+        self.name = f"{PREFIX}_{name}"
+        self.kind = kind
+        self.help = help
+        self.labels = labels
+        self.collect = collect   # -> {label values tuple: number}
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for values, value in sorted(self.collect().items()):
+            labels = _labels(self.labels, values)
+            lines.append(f"{self.name}{{{labels}}} {value}" if labels else f"{self.name} {value}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(names: tuple, values: tuple) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+route_seconds = Histogram("http_request_duration_seconds", "API response time by route", ("method", "route", "status"))
+stage_seconds = Histogram("stage_duration_seconds", "Time spent in each provider stage", ("stage",))
+audio_throughput = Histogram("audio_upstream_throughput_bytes", "Upstream audio transfer rate per response in bytes/s", (), THROUGHPUT_BUCKETS)
+loop_lag_seconds = Histogram("event_loop_lag_seconds", "How late the event loop woke a sleeping task", ())
+
+_registry: list = [route_seconds, stage_seconds, audio_throughput, loop_lag_seconds]
+
+def register(name: str, kind: str, help: str, labels: tuple[str, ...], collect: Callable[[], dict]):
+    """Export a counter/gauge computed from existing stats when /metrics is scraped"""
+    _registry.append(Collected(name, kind, help, labels, collect))
+
+def render() -> str:
+    return "\n".join(line for metric in _registry for line in metric.render()) + "\n"
+
+
+# Stage timings of the request being handled, for its Server-Timing header
+_timings: contextvars.ContextVar[Optional[list]] = contextvars.ContextVar("server_timing", default=None)
+
+def observe_stage(stage: str, seconds: float):
+    stage_seconds.observe(seconds, stage)
+    timings = _timings.get()
+    if timings is not None:
+        timings.append((stage, seconds))
+
+@contextmanager
+def stage(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, time.perf_counter() - start)
+
+def _server_timing(timings: list, total: float) -> bytes:
+    parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts).encode()
+
+
+class MetricsMiddleware:
+    """Times every API request and adds its stage breakdown as a Server-Timing header"""
+
+    def __init__(self, app):
+        self.app = app
+        self.routes: Optional[dict] = None
+
+    def _route(self, scope) -> str:
+        if self.routes is None:
+            self.routes = {getattr(r, "endpoint", None): r.path for r in scope["app"].routes if hasattr(r, "path")}
+        return self.routes.get(scope.get("endpoint"), "unmatched")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith("/api/"):
+            await self.app(scope, receive, send)
+            return
+
+        timings = []
+        token = _timings.set(timings)
+        start = time.perf_counter()
+        status = [500]
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", _server_timing(timings, time.perf_counter() - start)))
+                # Lets the cross-origin frontend read it through the Resource Timing API
+                headers.append((b"timing-allow-origin", b"*"))
+                message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _timings.reset(token)
+            route_seconds.observe(time.perf_counter() - start, scope["method"], self._route(scope), str(status[0]))
+
+
+async def loop_lag_monitor():
+    """Sleep for a fixed interval and record how much later than asked we woke up"""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+        loop_lag_seconds.observe(max(0.0, loop.time() - start - LOOP_LAG_INTERVAL))
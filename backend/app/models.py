@@ -1,5 +1,8 @@
-from pydantic import BaseModel
-from typing import Optional
+import os
+from pydantic import BaseModel, Field
+from typing import Generic, Optional, TypeVar
+
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "50"))
 
 class Track(BaseModel):
     id: str
@@ -18,12 +21,26 @@ class LyricLine(BaseModel):
 class LyricsMeta(BaseModel):
     provider: str
     copyright: Optional[str] = None
+    duration: Optional[float] = None
+
+class WordTimes(BaseModel):
+    """Word start times from enhanced LRC <mm:ss.xx> tags"""
+    lineOffsets: list[int]  # words of line i start at start[lineOffsets[i]:lineOffsets[i + 1]] (none if it has no tags)
+    start: list[float]
+
+class WordTiming(BaseModel):
+    mode: str  # "story", "drill" or "kinetic"
+    lineOffsets: list[int]  # words of line i are start/end[lineOffsets[i]:lineOffsets[i + 1]]
+    start: list[float]
+    end: list[float]
 
 class LyricsResponse(BaseModel):
     trackId: str
     type: str  # "synced" or "static"
     lyrics: list[LyricLine]
     meta: LyricsMeta
+    wordTimes: Optional[WordTimes] = None
+    timing: Optional[WordTiming] = None
 
 class SearchResponse(BaseModel):
     results: list[Track]
@@ -34,4 +51,26 @@ class StreamResponse(BaseModel):
 
 class ErrorResponse(BaseModel):
     error: str
-    code: str
\ No newline at end of file
+    code: str
+
+# Batch requests: POST /batch/{search,lyrics,stream} with {"items": [...]}
+class SearchItem(BaseModel):
+    q: str = Field(..., min_length=1)
+
+class LyricsItem(BaseModel):
+    trackId: Optional[str] = None
+    query: Optional[str] = None
+    artist: Optional[str] = None
+    title: Optional[str] = None
+    duration: Optional[float] = None
+    mode: Optional[str] = Field(None, pattern="^(story|drill|kinetic)$")
+
+class StreamItem(BaseModel):
+    videoId: Optional[str] = None
+    artist: Optional[str] = None
+    title: Optional[str] = None
+
+Item = TypeVar("Item")
+
+class BatchRequest(BaseModel, Generic[Item]):
+    items: list[Item] = Field(..., min_length=1, max_length=BATCH_MAX_ITEMS)
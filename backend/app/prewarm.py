@@ -0,0 +1,183 @@
+"""Pre-warm the shared cache from a catalog file.
+
+    python -m app.prewarm charts.txt [--concurrency 8] [--rate 5] [--no-stream]
+
+Each line is either "artist,title" or a YouTube video ID (optionally ytm_-prefixed);
+blank lines and lines starting with # are skipped. Each line goes through the same
+cached helpers the routes use, so the /search, /lyrics and /stream entries (and
+the resolved stream URL) land in the cache backend the server reads (CACHE_BACKEND
+sqlite or tiered, at CACHE_PATH). Finished lines are appended to a checkpoint
+file, so an interrupted run picks up where it stopped and a rerun retries
+only the lines that failed.
+"""
+import argparse
+import asyncio
+import os
+import re
+import sys
+import time
+from collections import Counter
+from typing import Optional
+
+from fastapi import HTTPException
+from . import cache, clients, responses
+from .models import SearchResponse
+from .main import _lyrics, _search, _track_for
+from .providers import youtube, ytmusic
+
+VIDEO_ID = re.compile(r"^(?:ytm_)?[A-Za-z0-9_-]{11}$")
+REPORT_INTERVAL = 10
+
+
+class RateLimiter:
+    """Spaces calls to at most `rate` per second"""
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate if rate > 0 else 0
+        self.next_at = 0.0
+        self.lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        async with self.lock:
+            now = time.monotonic()
+            if self.next_at > now:
+                await asyncio.sleep(self.next_at - now)
+            self.next_at = max(now, self.next_at) + self.interval
+
+
+class Progress:
+    def __init__(self, total: int):
+        self.total = total
+        self.done = 0
+        self.failures = Counter()   # stage -> failed items
+        self.started = time.monotonic()
+
+    def report(self, final: bool = False):
+        elapsed = time.monotonic() - self.started
+        rate = self.done / elapsed if elapsed else 0.0
+        failed = ", ".join(f"{stage} {n} ({n / max(self.done, 1):.0%})" for stage, n in sorted(self.failures.items()))
+        print(f"{'done' if final else 'progress'}: {self.done}/{self.total} in {elapsed:.0f}s, "
+              f"{rate:.2f} items/s; failures: {failed or 'none'}", flush=True)
+
+
+def read_catalog(path: str) -> list[str]:
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+def read_checkpoint(path: str) -> set[str]:
+    if not os.path.exists(path):
+        return set()
+    with open(path, encoding="utf-8") as f:
+        return {line.rstrip("\n") for line in f}
+
+
+async def _stage(progress: Progress, stage: str, limiter: RateLimiter, fn, *args) -> Optional[object]:
+    """Run one provider call; a failure is counted and does not stop the other stages"""
+    await limiter.wait()
+    try:
+        result = await fn(*args)
+    except HTTPException:
+        result = None
+    except Exception as e:
+        print(f"Prewarm {stage} error for {args}: {e}")
+        result = None
+    if not result:
+        progress.failures[stage] += 1
+    return result
+
+async def _searched(q: str) -> bool:
+    """Warm the /search entry; True if it holds any results"""
+    return bool(SearchResponse.model_validate_json(responses.decode(await _search(q))).results)
+
+async def warm(line: str, progress: Progress, limits: dict[str, RateLimiter], stream: bool) -> bool:
+    """Warm one catalog line; True if every stage succeeded"""
+    if VIDEO_ID.match(line):
+        # /stream?videoId= only needs the resolved URL; artist and title are for the lyrics
+        vid = line.replace("ytm_", "")
+        track = await _stage(progress, "metadata", limits["ytmusic"], ytmusic.get_track, vid)
+        artist, title = (track.artist, track.title) if track else (None, None)
+    else:
+        # The entry /stream?artist=&title= reads, plus the /search results for the same words
+        artist, _, title = (part.strip() for part in line.partition(","))
+        track = await _stage(progress, "metadata", limits["ytmusic"], _track_for, artist, title)
+        vid = track["id"] if track else None
+
+    if not track:
+        return False
+    tasks = [_stage(progress, "lyrics", limits["lrclib"], _lyrics, None, None, artist, title, None, None)]
+    if not VIDEO_ID.match(line):
+        tasks.append(_stage(progress, "search", limits["ytmusic"], _searched, f"{artist} {title}"))
+    if stream:
+        tasks.append(_stage(progress, "stream", limits["youtube"], youtube.resolve, vid))
+    return all(await asyncio.gather(*tasks))
+
+
+async def run(args) -> Progress:
+    """Warm every catalog line not yet in the checkpoint"""
+    lines = read_catalog(args.catalog)
+    checkpoint = args.checkpoint or f"{args.catalog}.done"
+    finished = read_checkpoint(checkpoint)
+    pending = [line for line in lines if line not in finished]
+    if finished:
+        print(f"Resuming: {len(lines) - len(pending)} of {len(lines)} already warmed ({checkpoint})")
+
+    progress = Progress(len(pending))
+    limits = {name: RateLimiter(args.rate) for name in ("ytmusic", "lrclib", "youtube")}
+    queue: asyncio.Queue[str] = asyncio.Queue()
+    for line in pending:
+        queue.put_nowait(line)
+
+    await clients.startup()
+    if not args.no_stream:
+        await youtube.start()
+    with open(checkpoint, "a", encoding="utf-8") as done_file:
+        async def worker():
+            while not queue.empty():
+                line = queue.get_nowait()
+                if await warm(line, progress, limits, not args.no_stream):
+                    done_file.write(line + "\n")
+                    done_file.flush()
+                progress.done += 1
+
+        async def reporter():
+            while True:
+                await asyncio.sleep(REPORT_INTERVAL)
+                progress.report()
+
+        reporting = asyncio.create_task(reporter())
+        try:
+            await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        finally:
+            reporting.cancel()
+            youtube.shutdown()
+            await clients.shutdown()
+    progress.report(final=True)
+    return progress
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.prewarm", description="Pre-warm the shared cache from a catalog file")
+    parser.add_argument("catalog", help='file with one "artist,title" or video ID per line')
+    parser.add_argument("--concurrency", type=int, default=8, help="items resolved in parallel (default 8)")
+    parser.add_argument("--rate", type=float, default=5, help="max calls per second to each provider (default 5, 0 = unlimited)")
+    parser.add_argument("--checkpoint", help="checkpoint file (default <catalog>.done)")
+    parser.add_argument("--no-stream", action="store_true", help="skip stream resolution")
+    args = parser.parse_args()
+
+    if cache.CACHE_BACKEND == "memory":
+        # An in-process cache would vanish with this process; write where the server can read it
+        print(f"CACHE_BACKEND is memory; writing to the SQLite cache at {cache.CACHE_PATH} instead. "
+              "Run the server with CACHE_BACKEND=sqlite or tiered to use it.")
+        cache.configure(cache.SQLiteBackend(cache.CACHE_PATH))
+
+    try:
+        asyncio.run(run(args))
+    except KeyboardInterrupt:
+        print("Interrupted; rerun the same command to resume from the checkpoint")
+        sys.exit(130)
+
+
+if __name__ == "__main__":
+    main()
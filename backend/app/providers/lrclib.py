@@ -1,107 +1,119 @@
-import httpx
-import re
+import os
 from typing import Optional
 from ..models import Track, LyricLine, LyricsResponse, LyricsMeta
+from .. import clients, lyricstore, singleflight
+from ..lrc import parse as parse_lrc
 
-BASE_URL = "https://lrclib.net/api"
+BASE_URL = os.getenv("LRCLIB_URL", "https://lrclib.net/api")
 
+
+class UpstreamError(Exception):
+    """lrclib answered with an error other than 404: the lyrics may well exist"""
+
+
+def _check(resp) -> bool:
+    """True for a 200; False for a 404 (nothing there); raises for anything else"""
+    if resp.status_code == 404:
+        return False
+    if resp.status_code != 200:
+        raise UpstreamError(f"lrclib {resp.request.url.path} returned {resp.status_code}")
+    return True
+
+@singleflight.coalesce("lrclib.search")
 async def search(query: str) -> list[Track]:
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(f"{BASE_URL}/search", params={"q": query}, timeout=10)
-        if resp.status_code != 200:
-            return []
-        
-        results = []
-        for item in resp.json()[:10]:
-            results.append(Track(
-                id=f"lrclib_{item.get('id', '')}",
-                title=item.get("trackName", "Unknown"),
-                artist=item.get("artistName", "Unknown"),
-                album=item.get("albumName"),
-                coverArt=None,
-                duration=item.get("duration", 0),
-                source="lrclib"
-            ))
-        return results
+    resp = await clients.request("lrclib", "GET", f"{BASE_URL}/search", params={"q": query})
+    if resp.status_code != 200:
+        return []
+    
+    results = []
+    for item in resp.json()[:10]:
+        results.append(Track(
+            id=f"lrclib_{item.get('id', '')}",
+            title=item.get("trackName", "Unknown"),
+            artist=item.get("artistName", "Unknown"),
+            album=item.get("albumName"),
+            coverArt=None,
+            duration=item.get("duration", 0),
+            source="lrclib"
+        ))
+    return results
 
-def _parse_lrc(lrc: str) -> list[LyricLine]:
-    """Parse LRC format to list of LyricLine"""
-    lines = []
-    pattern = r'\[(\d{2}):(\d{2})\.(\d{2,3})\](.*)' 
+def _to_response(data: dict, track_id: str) -> Optional[LyricsResponse]:
+    """Build a LyricsResponse from an lrclib record"""
+    synced = data.get("syncedLyrics")
+    plain = data.get("plainLyrics")
     
-    for line in lrc.strip().split('\n'):
-        match = re.match(pattern, line)
-        if match:
-            mins, secs, ms, text = match.groups()
-            ms = ms.ljust(3, '0')[:3]
-            time = int(mins) * 60 + int(secs) + int(ms) / 1000
-            text = text.strip()
-            is_instrumental = text == "" or text.lower() in ["♪", "instrumental"]
-            lines.append(LyricLine(
-                time=round(time, 2),
-                text=text if text else "♪",
-                isInstrumental=is_instrumental
-            ))
+    word_times = None
+    if synced:
+        parsed = parse_lrc(synced)
+        lyrics, word_times = parsed.lines(), parsed.word_times()
+        lyric_type = "synced"
+    elif plain:
+        lyrics = [LyricLine(time=-1, text=line.strip()) for line in plain.split('\n') if line.strip()]
+        lyric_type = "static"
+    else:
+        return None
     
-    return lines
+    return LyricsResponse(
+        trackId=track_id,
+        type=lyric_type,
+        lyrics=lyrics,
+        meta=LyricsMeta(provider="lrclib", duration=data.get("duration")),
+        wordTimes=word_times,
+    )
+
+def stored(artist: str = "", title: str = "", query: str = "", duration: Optional[float] = None) -> Optional[LyricsResponse]:
+    """Lyrics from the local store, without going upstream"""
+    data = lyricstore.find(artist, title, query, duration)
+    return _to_response(data, f"lrclib_{data['id']}") if data else None
 
+@singleflight.coalesce("lrclib.get")
 async def get_lyrics(track_id: str) -> Optional[LyricsResponse]:
     """Get lyrics by lrclib track ID"""
     lrclib_id = track_id.replace("lrclib_", "")
+    data = lyricstore.get(lrclib_id)
+    if data:
+        return _to_response(data, track_id)
     
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(f"{BASE_URL}/get/{lrclib_id}", timeout=10)
-        if resp.status_code != 200:
-            return None
-        
-        data = resp.json()
-        synced = data.get("syncedLyrics")
-        plain = data.get("plainLyrics")
-        
-        if synced:
-            lyrics = _parse_lrc(synced)
-            lyric_type = "synced"
-        elif plain:
-            lyrics = [LyricLine(time=-1, text=line.strip()) for line in plain.split('\n') if line.strip()]
-            lyric_type = "static"
-        else:
-            return None
-        
-        return LyricsResponse(
-            trackId=track_id,
-            type=lyric_type,
-            lyrics=lyrics,
-            meta=LyricsMeta(provider="lrclib")
-        )
+    resp = await clients.request("lrclib", "GET", f"{BASE_URL}/get/{lrclib_id}")
+    if not _check(resp):
+        return None
+    
+    data = resp.json()
+    lyricstore.save([data])
+    return _to_response(data, track_id)
 
+@singleflight.coalesce("lrclib.query")
 async def get_lyrics_by_query(artist: str, title: str) -> Optional[LyricsResponse]:
     """Direct lookup by artist + title"""
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(f"{BASE_URL}/get", params={
-            "artist_name": artist,
-            "track_name": title
-        }, timeout=10)
-        
-        if resp.status_code != 200:
-            return None
-        
-        data = resp.json()
-        track_id = f"lrclib_{data.get('id', 'unknown')}"
-        synced = data.get("syncedLyrics")
-        plain = data.get("plainLyrics")
-        
-        if synced:
-            lyrics = _parse_lrc(synced)
-            lyric_type = "synced"
-        elif plain:
-            lyrics = [LyricLine(time=-1, text=line.strip()) for line in plain.split('\n') if line.strip()]
-            lyric_type = "static"
-        else:
-            return None
-        
-        return LyricsResponse(
-            trackId=track_id,
-            type=lyric_type,
-            lyrics=lyrics,
-            meta=LyricsMeta(provider="lrclib")
-        )
+    resp = await clients.request("lrclib", "GET", f"{BASE_URL}/get", params={
+        "artist_name": artist,
+        "track_name": title
+    })
+    
+    if not _check(resp):
+        return None
+    
+    data = resp.json()
+    lyricstore.save([data])
+    return _to_response(data, f"lrclib_{data.get('id', 'unknown')}")
+
+@singleflight.coalesce("lrclib.fuzzy")
+async def search_lyrics(query: str, duration: Optional[float] = None) -> Optional[LyricsResponse]:
+    """Fuzzy lookup through /search, preferring synced lyrics closest to the track duration"""
+    resp = await clients.request("lrclib", "GET", f"{BASE_URL}/search", params={"q": query})
+    if not _check(resp):
+        return None
+    
+    def rank(item: dict):
+        distance = abs(item.get("duration", 0) - duration) if duration else 0
+        return (not item.get("syncedLyrics"), not item.get("plainLyrics"), distance)
+    
+    candidates = sorted(resp.json()[:20], key=rank)
+    # Keep every record we were sent; later lookups for them stay local
+    lyricstore.save(candidates)
+    for item in candidates:
+        result = _to_response(item, f"lrclib_{item.get('id', 'unknown')}")
+        if result:
+            return result
+    return None
@@ -1,38 +1,240 @@
 import asyncio
-import yt_dlp
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+from urllib.parse import urlparse, parse_qs
+from .. import cache, limits, metrics, singleflight
 
+# Extraction runs in a fixed pool of long-lived processes, each holding one YoutubeDL
+YTDLP_WORKERS = int(os.getenv("YTDLP_WORKERS", "2"))
+YTDLP_MAX_QUEUE = int(os.getenv("YTDLP_MAX_QUEUE", "8"))
+YTDLP_TIMEOUT = float(os.getenv("YTDLP_TIMEOUT", "30"))
+YTDLP_RETRY_AFTER = int(os.getenv("YTDLP_RETRY_AFTER", "5"))
+
+MIME_TYPES = {"webm": "audio/webm", "m4a": "audio/mp4", "mp4": "audio/mp4", "mp3": "audio/mpeg", "opus": "audio/ogg"}
+
+# Resolved URLs are cached until shortly before the signed URL's expire= timestamp
+URL_EXPIRY_MARGIN = int(os.getenv("YT_URL_EXPIRY_MARGIN", "300"))
+URL_FALLBACK_TTL = 3600
+REFRESH_INTERVAL = 60
+ACTIVE_WINDOW = 900  # a track played within this window counts as actively playing
+
+YDL_OPTS = {
+    'format': 'bestaudio/best',
+    'quiet': True,
+    'no_warnings': True,
+    'extract_flat': False,
+}
+
+class ExtractionBusy(limits.Unavailable):
+    """Raised when the extraction queue is full; callers should retry later"""
+
+    def __init__(self):
+        super().__init__("ytdlp", YTDLP_RETRY_AFTER)
+
+_ydl = None  # a yt_dlp.YoutubeDL, set inside each worker process
+_pool: Optional[ProcessPoolExecutor] = None
+_pending = 0
+# Queued + running extractions adapt between YTDLP_WORKERS and YTDLP_WORKERS + YTDLP_MAX_QUEUE,
+# driven by extraction time in the workers (queueing in front of the pool is expected)
+_upstream = limits.upstream("ytdlp", maximum=YTDLP_WORKERS + YTDLP_MAX_QUEUE,
+                            initial=YTDLP_WORKERS + YTDLP_MAX_QUEUE, minimum=YTDLP_WORKERS)
+_active: dict[str, float] = {}  # video id -> last time it was played
+
+def _init_worker():
+    global _ydl
+    # Only the worker processes pay for importing yt-dlp
+    import yt_dlp
+    _ydl = yt_dlp.YoutubeDL(YDL_OPTS)
+
+def _ping() -> bool:
+    return _ydl is not None
+
+def _extract(vid: str) -> Optional[dict]:
+    """Runs in a worker process; returns only the fields we need to keep pickling cheap"""
+    start = time.perf_counter()
+    try:
+        info = _ydl.extract_info(f"https://www.youtube.com/watch?v={vid}", download=False)
+    except Exception as e:
+        # yt-dlp errors don't always pickle, so report them from the worker
+        print(f"yt-dlp error: {e}")
+        return None
+
+    stream_url = info.get('url')
+
+    # Fallback: get from formats
+    if not stream_url and info.get('formats'):
+        for fmt in reversed(info['formats']):
+            if fmt.get('url') and fmt.get('acodec') != 'none':
+                stream_url = fmt['url']
+                break
+
+    if not stream_url:
+        return None
+
+    # The chosen format's fields are merged into info for single-format selections
+    ext = info.get('audio_ext') if info.get('audio_ext') not in (None, 'none') else info.get('ext')
+    return {
+        "url": stream_url,
+        "duration": info.get('duration'),
+        "mime_type": MIME_TYPES.get(ext, "audio/webm"),
+        "content_length": info.get('filesize') or info.get('filesize_approx'),
+        "bitrate": info.get('abr') or info.get('tbr'),
+        # Time in the worker itself, excluding the wait in the pool's queue
+        "extract_seconds": time.perf_counter() - start,
+    }
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=YTDLP_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        )
+    return _pool
+
+async def start():
+    """Spawn and warm every extraction worker"""
+    loop = asyncio.get_running_loop()
+    pool = _get_pool()
+    await asyncio.gather(*[loop.run_in_executor(pool, _ping) for _ in range(YTDLP_WORKERS)])
+
+def shutdown():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+def _release():
+    global _pending
+    _pending -= 1
+
+def pending() -> int:
+    """Extractions running or queued in the pool"""
+    return _pending
+
+def url_expiry(url: str) -> Optional[float]:
+    """The expire= timestamp embedded in a googlevideo URL"""
+    try:
+        return float(parse_qs(urlparse(url).query)["expire"][0])
+    except (KeyError, IndexError, ValueError):
+        return None
+
+def _ttl(info: dict) -> int:
+    expire = info.get("expire")
+    if not expire:
+        return URL_FALLBACK_TTL
+    return max(0, int(expire - time.time() - URL_EXPIRY_MARGIN))
+
+@singleflight.coalesce("youtube.stream", key=lambda video_id: video_id.replace("ytm_", ""))
 async def get_stream_url(video_id: str) -> dict | None:
-    """Get audio stream URL using yt-dlp"""
+    """Get audio stream URL using yt-dlp; raises ExtractionBusy when the pool is saturated,
+    limits.Unavailable while the breaker is open"""
+    global _pool, _pending
     vid = video_id.replace("ytm_", "")
-    url = f"https://www.youtube.com/watch?v={vid}"
-    
-    ydl_opts = {
-        'format': 'bestaudio/best',
-        'quiet': True,
-        'no_warnings': True,
-        'extract_flat': False,
-    }
+
+    _upstream.check()
+    # Shed when full, or when the queue ahead would not clear within the timeout
+    expected_wait = _upstream.latency * (_pending + 1) / YTDLP_WORKERS
+    if _pending >= int(_upstream.limit) or expected_wait > YTDLP_TIMEOUT:
+        _upstream.stats["shed"] += 1
+        raise ExtractionBusy()
+    # Once the cooldown is over only one extraction probes; its outcome closes or reopens the breaker
+    probe = _upstream.admit()
+
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    try:
+        try:
+            future = _get_pool().submit(_extract, vid)
+        except BrokenProcessPool:
+            _pool = None
+            future = _get_pool().submit(_extract, vid)
+    except Exception as e:
+        print(f"yt-dlp pool error: {e}")
+        _upstream.record(time.perf_counter() - start, ok=False, probe=probe)
+        return None
+    _pending += 1
+    # Release the slot when the worker is actually done, not when we stop waiting
+    future.add_done_callback(lambda _: loop.call_soon_threadsafe(_release))
 
     try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = await asyncio.to_thread(ydl.extract_info, url, download=False)
-            
-            stream_url = info.get('url')
-            
-            # Fallback: get from formats
-            if not stream_url and info.get('formats'):
-                for fmt in reversed(info['formats']):
-                    if fmt.get('url') and fmt.get('acodec') != 'none':
-                        stream_url = fmt['url']
-                        break
-            
-            if not stream_url:
-                return None
-                
-            return {
-                "url": stream_url,
-                "duration": info.get('duration')
-            }
+        with metrics.stage("ytdlp.extract"):
+            info = await asyncio.wait_for(asyncio.wrap_future(future), YTDLP_TIMEOUT)
+    except asyncio.CancelledError:
+        _upstream.abandon(probe)
+        raise
+    except BrokenProcessPool as e:
+        print(f"yt-dlp worker died: {e}")
+        _pool = None
+        _upstream.record(time.perf_counter() - start, ok=False, probe=probe)
+        return None
     except Exception as e:
         print(f"yt-dlp error: {e}")
+        _upstream.record(time.perf_counter() - start, ok=False, probe=probe)
         return None
+    if info:
+        _upstream.record(info.pop("extract_seconds"), ok=True, probe=probe)
+    else:
+        _upstream.record(time.perf_counter() - start, ok=False, probe=probe)
+
+    if info:
+        info["expire"] = url_expiry(info["url"])
+    return info
+
+def cached(video_id: str) -> dict | None:
+    """The resolved-track record if one is cached"""
+    return cache.get("resolved", video_id.replace("ytm_", ""))
+
+async def resolve(video_id: str, playing: bool = False) -> dict | None:
+    """Resolved-track record (url, expire, duration, mime_type, content_length, bitrate),
+    shared by /stream and /audio and extracted at most once while it is valid"""
+    vid = video_id.replace("ytm_", "")
+    if playing:
+        _active[vid] = time.time()
+
+    info = cache.get("resolved", vid)
+    if info:
+        return info
+
+    info = await get_stream_url(vid)
+    if info and info.get("url"):
+        cache.set("resolved", vid, info, ttl=_ttl(info))
+    return info
+
+async def _prefetch(vid: str):
+    try:
+        await resolve(vid)
+    except limits.Unavailable:
+        pass
+
+_background: set[asyncio.Task] = set()
+
+def prefetch(video_id: str):
+    """Start resolving in the background so the following /audio request finds it ready"""
+    task = asyncio.create_task(_prefetch(video_id.replace("ytm_", "")))
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+
+async def refresh_loop():
+    """Re-resolve near-expiry URLs of actively playing tracks before they lapse"""
+    while True:
+        await asyncio.sleep(REFRESH_INTERVAL)
+        now = time.time()
+        for vid, played in list(_active.items()):
+            if now - played > ACTIVE_WINDOW:
+                del _active[vid]
+                continue
+            info = cache.get("resolved", vid)
+            if info and (not info.get("expire") or info["expire"] - URL_EXPIRY_MARGIN - now > 2 * REFRESH_INTERVAL):
+                continue
+            try:
+                fresh = await get_stream_url(vid)
+            except limits.Unavailable:
+                break
+            if fresh and fresh.get("url"):
+                cache.set("resolved", vid, fresh, ttl=_ttl(fresh))
@@ -1,8 +1,64 @@
-from ytmusicapi import YTMusic
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Optional
 from ..models import Track
+from .. import art, limits, metrics, singleflight, suggest
 
-ytm = YTMusic()
+# YTMusic is synchronous and not thread-safe: run it on a bounded pool, one client per thread
+YTM_WORKERS = int(os.getenv("YTM_WORKERS", "4"))
+YTM_MAX_CONCURRENCY = int(os.getenv("YTM_MAX_CONCURRENCY", "16"))
+YTM_TIMEOUT = float(os.getenv("YTM_TIMEOUT", "10"))
+
+_executor = ThreadPoolExecutor(max_workers=YTM_WORKERS, thread_name_prefix="ytmusic")
+_local = threading.local()
+# Concurrency adapts between 1 and YTM_MAX_CONCURRENCY to observed latency
+_upstream = limits.upstream("ytmusic", maximum=YTM_MAX_CONCURRENCY, initial=YTM_WORKERS * 2)
+
+def _client():
+    """YTMusic instance owned by the current worker thread (ytmusicapi is imported on first use)"""
+    ytm = getattr(_local, "ytm", None)
+    if ytm is None:
+        from ytmusicapi import YTMusic
+        ytm = _local.ytm = YTMusic()
+    return ytm
+
+async def start():
+    """Import ytmusicapi and build the worker threads' clients ahead of the first search"""
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(*[loop.run_in_executor(_executor, _client) for _ in range(YTM_WORKERS)])
+
+async def _run(fn, *args):
+    """Run a blocking YTMusic call on the pool, under the adaptive limit and YTM_TIMEOUT"""
+    loop = asyncio.get_running_loop()
+    with metrics.stage(f"ytmusic.{fn.__name__.lstrip('_')}"):
+        probe = _upstream.admit()
+        try:
+            await _upstream.acquire()
+        except BaseException:
+            _upstream.abandon(probe)
+            raise
+        start = time.perf_counter()
+        try:
+            future = _executor.submit(fn, *args)
+        except BaseException:
+            _upstream.release()
+            _upstream.abandon(probe)
+            raise
+        # Release the slot when the thread is actually done, not when we stop waiting
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(_upstream.release))
+        try:
+            result = await asyncio.wait_for(asyncio.wrap_future(future), YTM_TIMEOUT)
+        except asyncio.CancelledError:
+            _upstream.abandon(probe)
+            raise
+        except Exception:
+            _upstream.record(time.perf_counter() - start, ok=False, probe=probe)
+            raise
+        _upstream.record(time.perf_counter() - start, ok=True, probe=probe)
+        return result
 
 def _get_thumbnail(thumbnails: list, size: int = 544) -> str:
     """Get YT Music thumbnail resized to target size"""
@@ -30,16 +86,75 @@ def _parse_duration(duration_str: str) -> float:
         pass
     return 0
 
+@singleflight.coalesce("ytmusic.search", key=lambda query, limit=20: (query, limit))
 async def search(query: str, limit: int = 20) -> List[Track]:
     """Search YouTube Music for songs"""
     try:
-        results = ytm.search(query, filter="songs", limit=limit)
-        tracks = []
+        results = await _run(_search, query, limit)
+        suggest.add(results)
+        return results
+    except limits.Unavailable:
+        raise
+    except Exception as e:
+        print(f"YTMusic search error: {e}")
+        return []
+
+def _search(query: str, limit: int) -> List[Track]:
+    results = _client().search(query, filter="songs", limit=limit)
+    tracks = []
+    
+    for item in results:
+        if item.get("resultType") != "song":
+            continue
         
-        for item in results:
-            if item.get("resultType") != "song":
-                continue
-            
+        video_id = item.get("videoId")
+        if not video_id:
+            continue
+        
+        artists = item.get("artists", [])
+        artist_name = artists[0].get("name", "Unknown") if artists else "Unknown"
+        
+        album_info = item.get("album")
+        album_name = album_info.get("name") if album_info else None
+        
+        thumbnails = item.get("thumbnails", [])
+        
+        duration = _parse_duration(item.get("duration", ""))
+        if not duration:
+            duration = item.get("duration_seconds", 0)
+        
+        tracks.append(Track(
+            id=f"ytm_{video_id}",
+            title=item.get("title", "Unknown"),
+            artist=artist_name,
+            album=album_name,
+            coverArt=art.url_for(_get_thumbnail(thumbnails, 544)),
+            duration=float(duration),
+            source="ytmusic"
+        ))
+    
+    return tracks
+
+async def get_recommendations(limit: int = 20) -> List[Track]:
+    """Get recommended/trending songs from YouTube Music home"""
+    try:
+        results = await _run(_get_recommendations, limit)
+        suggest.add(results)
+        return results
+    except limits.Unavailable:
+        raise
+    except Exception as e:
+        print(f"YTMusic recommendations error: {e}")
+        return []
+
+def _get_recommendations(limit: int) -> List[Track]:
+    home = _client().get_home(limit=5)
+    tracks = []
+    
+    for section in home:
+        contents = section.get("contents", [])
+        for item in contents:
+            # Only process songs/videos with videoId
             video_id = item.get("videoId")
             if not video_id:
                 continue
@@ -52,73 +167,29 @@ async def search(query: str, limit: int = 20) -> List[Track]:
             
             thumbnails = item.get("thumbnails", [])
             
-            duration = _parse_duration(item.get("duration", ""))
-            if not duration:
-                duration = item.get("duration_seconds", 0)
-            
             tracks.append(Track(
                 id=f"ytm_{video_id}",
                 title=item.get("title", "Unknown"),
                 artist=artist_name,
                 album=album_name,
-                coverArt=_get_thumbnail(thumbnails, 544),
-                duration=float(duration),
+                coverArt=art.url_for(_get_thumbnail(thumbnails, 544)),
+                duration=0,
                 source="ytmusic"
             ))
-        
-        return tracks
-    except Exception as e:
-        print(f"YTMusic search error: {e}")
-        return []
-
-async def get_recommendations(limit: int = 20) -> List[Track]:
-    """Get recommended/trending songs from YouTube Music home"""
-    try:
-        home = ytm.get_home(limit=5)
-        tracks = []
-        
-        for section in home:
-            contents = section.get("contents", [])
-            for item in contents:
-                # Only process songs/videos with videoId
-                video_id = item.get("videoId")
-                if not video_id:
-                    continue
-                
-                artists = item.get("artists", [])
-                artist_name = artists[0].get("name", "Unknown") if artists else "Unknown"
-                
-                album_info = item.get("album")
-                album_name = album_info.get("name") if album_info else None
-                
-                thumbnails = item.get("thumbnails", [])
-                
-                tracks.append(Track(
-                    id=f"ytm_{video_id}",
-                    title=item.get("title", "Unknown"),
-                    artist=artist_name,
-                    album=album_name,
-                    coverArt=_get_thumbnail(thumbnails, 544),
-                    duration=0,
-                    source="ytmusic"
-                ))
-                
-                if len(tracks) >= limit:
-                    break
             
             if len(tracks) >= limit:
                 break
         
-        return tracks
-    except Exception as e:
-        print(f"YTMusic recommendations error: {e}")
-        return []
+        if len(tracks) >= limit:
+            break
+    
+    return tracks
 
 async def get_track(video_id: str) -> Optional[Track]:
     """Get single track info by video ID"""
     try:
         vid = video_id.replace("ytm_", "")
-        info = ytm.get_song(vid)
+        info = await _run(_get_song, vid)
         
         if not info:
             return None
@@ -131,7 +202,7 @@ async def get_track(video_id: str) -> Optional[Track]:
             title=details.get("title", "Unknown"),
             artist=details.get("author", "Unknown"),
             album=None,
-            coverArt=_get_thumbnail(thumbnails, 544),
+            coverArt=art.url_for(_get_thumbnail(thumbnails, 544)),
             duration=float(details.get("lengthSeconds", 0)),
             source="ytmusic"
         )
@@ -139,11 +210,14 @@ async def get_track(video_id: str) -> Optional[Track]:
         print(f"YTMusic get_track error: {e}")
         return None
 
+def _get_song(vid: str) -> dict:
+    return _client().get_song(vid)
+
 async def get_stream_url(video_id: str) -> Optional[dict]:
     """Get audio stream URL directly from YouTube Music API"""
     try:
         vid = video_id.replace("ytm_", "")
-        info = ytm.get_song(vid)
+        info = await _run(_get_song, vid)
         
         if not info:
             return None
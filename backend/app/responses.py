@@ -0,0 +1,80 @@
+import gzip
+import hashlib
+import json
+from typing import Any, Optional
+from fastapi import Request
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+# Cached API responses are stored as final bodies, compressed once at write time:
+# b"<etag> <content-encoding>\n" + body
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MIN_COMPRESS_SIZE = 1024
+MEDIA_TYPE = "application/json"
+
+def dumps(data: Any) -> bytes:
+    """JSON-encode a model or plain data, with orjson when it is installed"""
+    if isinstance(data, BaseModel):
+        return data.model_dump_json().encode()
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(",", ":")).encode()
+
+def pack(body: bytes) -> bytes:
+    etag = hashlib.md5(body).hexdigest()
+    if len(body) < MIN_COMPRESS_SIZE:
+        encoding = "identity"
+    elif brotli is not None:
+        encoding, body = "br", brotli.compress(body, quality=5)
+    else:
+        encoding, body = "gzip", gzip.compress(body, compresslevel=6)
+    return f"{etag} {encoding}\n".encode() + body
+
+def _unpack(packed: bytes) -> tuple[str, str, bytes]:
+    header, body = packed.split(b"\n", 1)
+    etag, encoding = header.decode().split(" ")
+    return etag, encoding, body
+
+def _decompress(encoding: str, body: bytes) -> bytes:
+    if encoding == "br":
+        return brotli.decompress(body)
+    if encoding == "gzip":
+        return gzip.decompress(body)
+    return body
+
+def decode(packed: bytes) -> bytes:
+    """The uncompressed JSON body of a packed response"""
+    _etag, encoding, body = _unpack(packed)
+    return _decompress(encoding, body)
+
+def _accepts(request: Request, encoding: str) -> bool:
+    accepted = request.headers.get("accept-encoding", "")
+    return any(part.split(";")[0].strip() == encoding for part in accepted.split(","))
+
+def serve(request: Request, packed: bytes, max_age: int, status_code: int = 200) -> Response:
+    """Return a packed body as-is, or 304 when the client already has it"""
+    etag, encoding, body = _unpack(packed)
+    headers = {
+        "ETag": f'"{etag}"',
+        "Cache-Control": f"public, max-age={max_age}",
+        "Vary": "Accept-Encoding",
+    }
+    if_none_match: Optional[str] = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or headers["ETag"] in [t.strip().removeprefix("W/") for t in if_none_match.split(",")]):
+        return Response(status_code=304, headers=headers)
+
+    if encoding != "identity":
+        if _accepts(request, encoding):
+            headers["Content-Encoding"] = encoding
+        else:
+            body = _decompress(encoding, body)
+    return Response(body, status_code=status_code, headers=headers, media_type=MEDIA_TYPE)
@@ -0,0 +1,56 @@
+import asyncio
+import contextvars
+import functools
+from collections import Counter
+from typing import Any, Callable, Hashable, Optional
+
+# In-flight calls: (group, key) -> shared task
+_inflight: dict[tuple, asyncio.Task] = {}
+
+calls = Counter()
+coalesced = Counter()
+
+_bypass = contextvars.ContextVar("singleflight_bypass", default=False)
+
+def bypass():
+    """Calls made from the current task run independently (used for hedged requests)"""
+    _bypass.set(True)
+
+def _forget(k: tuple, task: asyncio.Task):
+    if _inflight.get(k) is task:
+        del _inflight[k]
+    # Mark the result as retrieved even if every caller went away
+    if not task.cancelled():
+        task.exception()
+
+async def do(group: str, key: Hashable, fn: Callable, *args, **kwargs) -> Any:
+    """Run fn once per (group, key); concurrent callers await the same result"""
+    k = (group, key)
+    calls[group] += 1
+    if _bypass.get():
+        return await fn(*args, **kwargs)
+    task = _inflight.get(k)
+    if task is None:
+        task = asyncio.ensure_future(fn(*args, **kwargs))
+        _inflight[k] = task
+        task.add_done_callback(functools.partial(_forget, k))
+    else:
+        coalesced[group] += 1
+    # Shield so one caller disconnecting does not cancel the call for the others
+    return await asyncio.shield(task)
+
+def coalesce(group: str, key: Optional[Callable[..., Hashable]] = None):
+    """Decorator form of do(); key(*args, **kwargs) defaults to the call arguments"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            k = key(*args, **kwargs) if key else (args, tuple(sorted(kwargs.items())))
+            return await do(group, k, fn, *args, **kwargs)
+        return wrapper
+    return decorator
+
+def stats() -> dict:
+    return {
+        group: {"calls": calls[group], "coalesced": coalesced[group], "inflight": sum(1 for g, _ in _inflight if g == group)}
+        for group in calls
+    }
@@ -0,0 +1,149 @@
+import mimetypes
+import os
+from dataclasses import dataclass, field
+from typing import Optional
+import anyio
+from starlette.routing import Mount
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+# The built frontend is served ahead of the router. A deploy never changes the files,
+# so they are indexed once, together with the .br/.gz siblings written by the build.
+ASSETS_PREFIX = "/assets/"
+IMMUTABLE = "public, max-age=31536000, immutable"   # Vite puts a content hash in these names
+REVALIDATE = "no-cache"                             # index.html and other fixed names: check the ETag
+MEMORY_LIMIT = 512 * 1024                           # files up to this size are kept in memory
+READ_CHUNK_SIZE = 64 * 1024
+ENCODINGS = {".br": "br", ".gz": "gzip"}            # preferred first
+
+
+@dataclass
+class StaticFile:
+    path: str
+    size: int
+    etag: str
+    media_type: str
+    cache_control: str
+    encoding: Optional[str] = None
+    body: Optional[bytes] = None
+    variants: dict[str, "StaticFile"] = field(default_factory=dict)
+
+
+def _load(path: str, url: str, media_type: str, encoding: Optional[str] = None) -> StaticFile:
+    stat = os.stat(path)
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}{"-" + encoding if encoding else ""}"'
+    body = None
+    if stat.st_size <= MEMORY_LIMIT:
+        with open(path, "rb") as f:
+            body = f.read()
+    cache_control = IMMUTABLE if url.startswith(ASSETS_PREFIX) else REVALIDATE
+    return StaticFile(path, stat.st_size, etag, media_type, cache_control, encoding, body)
+
+
+def scan(directory: str) -> dict[str, StaticFile]:
+    """URL path -> file for everything under directory, with precompressed variants attached"""
+    files = {}
+    for root, _dirs, names in os.walk(directory):
+        for name in names:
+            base, ext = os.path.splitext(name)
+            if ext in ENCODINGS and base in names:
+                continue
+            path = os.path.join(root, name)
+            url = "/" + os.path.relpath(path, directory).replace(os.sep, "/")
+            media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+            if media_type.startswith("text/") or media_type in ("application/javascript", "application/json"):
+                media_type += "; charset=utf-8"
+            entry = _load(path, url, media_type)
+            for suffix, encoding in ENCODINGS.items():
+                if name + suffix in names:
+                    entry.variants[encoding] = _load(path + suffix, url, media_type, encoding)
+            files[url] = entry
+    return files
+
+
+def _accepted(scope: Scope) -> set[str]:
+    for key, value in scope["headers"]:
+        if key == b"accept-encoding":
+            accepted = set()
+            for part in value.decode("latin-1").split(","):
+                coding, _, q = part.partition(";")
+                q = q.strip().removeprefix("q=")
+                try:
+                    if q and float(q) == 0:
+                        continue  # explicitly refused
+                except ValueError:
+                    pass
+                accepted.add(coding.strip())
+            return accepted
+    return set()
+
+
+def _header(scope: Scope, name: bytes) -> Optional[str]:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+async def serve(file: StaticFile, scope: Scope, send: Send):
+    """Send the best precompressed variant the client accepts, or 304 if its ETag still matches"""
+    if file.variants:
+        accepted = _accepted(scope)
+        file = next((variant for encoding, variant in file.variants.items() if encoding in accepted), file)
+    headers = [(b"etag", file.etag.encode()), (b"cache-control", file.cache_control.encode())]
+    if file.encoding or file.variants:
+        headers.append((b"vary", b"Accept-Encoding"))
+
+    if_none_match = _header(scope, b"if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or file.etag in [t.strip().removeprefix("W/") for t in if_none_match.split(",")]):
+        await send({"type": "http.response.start", "status": 304, "headers": headers})
+        await send({"type": "http.response.body", "body": b""})
+        return
+
+    headers += [(b"content-type", file.media_type.encode()), (b"content-length", str(file.size).encode())]
+    if file.encoding:
+        headers.append((b"content-encoding", file.encoding.encode()))
+    await send({"type": "http.response.start", "status": 200, "headers": headers})
+    if scope["method"] == "HEAD":
+        await send({"type": "http.response.body", "body": b""})
+    elif file.body is not None:
+        await send({"type": "http.response.body", "body": file.body})
+    else:
+        with open(file.path, "rb") as f:
+            offset = 0
+            while offset < file.size:
+                chunk = await anyio.to_thread.run_sync(os.pread, f.fileno(), READ_CHUNK_SIZE, offset)
+                if not chunk:
+                    break
+                offset += len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": offset < file.size})
+        if offset < file.size:
+            await send({"type": "http.response.body", "body": b""})
+
+
+class SPAMiddleware:
+    """Serves the built SPA without entering the router: files by exact path, index.html for
+    client-side routes. /api/ and the app's own routes (/health, /docs, ...) pass straight through."""
+
+    def __init__(self, app: ASGIApp, directory: str):
+        self.app = app
+        self.files = scan(directory)
+        self.index = self.files.get("/index.html")
+        self._routes: Optional[set[str]] = None
+
+    def _is_route(self, scope: Scope, path: str) -> bool:
+        if self._routes is None:
+            self._routes = {route.path for route in scope["app"].routes if not isinstance(route, Mount)}
+        return path in self._routes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD") or scope["path"].startswith("/api/"):
+            await self.app(scope, receive, send)
+            return
+        path = scope["path"]
+        file = self.files.get(path)
+        if file is None:
+            if self.index is None or path.startswith(ASSETS_PREFIX) or self._is_route(scope, path):
+                await self.app(scope, receive, send)
+                return
+            file = self.index
+        await serve(file, scope, send)
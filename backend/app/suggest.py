@@ -0,0 +1,313 @@
+import asyncio
+import heapq
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from bisect import bisect_left, insort
+from itertools import islice
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Iterable, Optional
+from .canonical import name as normalize
+from .models import Track
+
+# Typeahead from the tracks the providers have already returned. Every track is indexed
+# under the word suffixes of "artist title" and "title artist" in one sorted key list, kept
+# as small sorted blocks so adding or dropping a key never re-sorts the whole index; a
+# prefix is a bisect plus a short scan; one to three letter prefixes, which match too much
+# to scan, keep their top tracks ready. Popularity (how often and how high a track came
+# back, and how often it was played) orders the matches. Tracks and weights live in SQLite
+# and the lists are rebuilt from there in the background on startup; writes go to SQLite
+# from a single writer thread.
+SUGGEST_ENABLED = os.getenv("SUGGEST_ENABLED", "true").lower() == "true"
+SUGGEST_INDEX_PATH = os.getenv("SUGGEST_INDEX_PATH", "/tmp/lyricgen-suggest.sqlite3")
+SUGGEST_MAX_TRACKS = int(os.getenv("SUGGEST_MAX_TRACKS", "50000"))
+SUGGEST_BUSY_TIMEOUT = float(os.getenv("SUGGEST_BUSY_TIMEOUT", "0.5"))  # seconds the writer waits for another worker's lock
+MAX_RESULTS = 20      # the most /suggest returns, and what each short prefix keeps ready
+HEAD_LENGTH = 3       # prefixes up to this long are answered from their kept top list
+KEY_LENGTH = 48       # longer keys (and queries) are cut here; nobody types further than this
+SCAN_LIMIT = 2000     # keys looked at per list for a longer prefix
+BLOCK = 1024          # keys per sorted block; a block splits in two when it doubles
+PLAY_WEIGHT = 5.0     # a play counts as much as topping five result lists
+START_BONUS = 2.0     # matches at the start of "artist title" / "title artist" rank above inner words
+
+_SEPARATOR = "\x00"   # sorts before any character a normalized name can contain
+
+
+@dataclass
+class Entry:
+    weight: float
+    body: bytes           # the Track as JSON, returned as-is
+    keys: tuple[str, ...]
+
+
+_lock = threading.Lock()
+_db: Optional[sqlite3.Connection] = None
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="suggest")
+
+# Keys are "<name or suffix>\0<1 if it is a whole name else 0><track id>", in sorted blocks
+# of up to 2 * BLOCK; _maxes holds the last key of each block to find the one a key goes in
+_tracks: dict[str, Entry] = {}
+_blocks: list[list[str]] = []
+_maxes: list[str] = []
+_heads: dict[str, list[tuple[float, str]]] = {}   # short prefix -> best (score, track id) first
+
+stats = {"queries": 0, "sparse": 0, "upstream_merges": 0, "upstream_timeouts": 0,
+         "indexed": 0, "played": 0, "evictions": 0, "write_errors": 0}
+
+
+def _connect() -> sqlite3.Connection:
+    global _db
+    if _db is None:
+        db = sqlite3.connect(SUGGEST_INDEX_PATH, timeout=5, isolation_level=None, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS tracks ("
+            " id TEXT PRIMARY KEY, artist TEXT NOT NULL, title TEXT NOT NULL, body BLOB NOT NULL,"
+            " weight REAL NOT NULL, seen REAL NOT NULL)"
+        )
+        # Setup may wait for workers starting alongside; writes give up sooner
+        db.execute(f"PRAGMA busy_timeout = {int(SUGGEST_BUSY_TIMEOUT * 1000)}")
+        _db = db
+    return _db
+
+
+def _write_now(sql: str, rows: list[tuple]):
+    try:
+        with _lock:
+            _connect().executemany(sql, rows)
+    except sqlite3.Error as e:
+        stats["write_errors"] += 1
+        print(f"Suggest index write error: {e}")
+
+def _write(sql: str, rows: list[tuple]):
+    """Persist on the writer thread, in order, without holding up the event loop"""
+    _writer.submit(_write_now, sql, rows)
+
+
+# ============ KEYS ============
+
+def _keys(track_id: str, artist: str, title: str) -> tuple[str, ...]:
+    keys = {}
+    # Each name on its own, so a "feat." in one can't swallow the other
+    artist_words, title_words = normalize(artist).split(), normalize(title).split()
+    for words in (artist_words + title_words, title_words + artist_words):
+        for i in range(len(words)):
+            key = " ".join(words[i:])[:KEY_LENGTH]
+            # A key that is both a whole name and an inner suffix keeps the whole-name flag
+            keys[key] = keys.get(key) or i == 0
+    return tuple(f"{key}{_SEPARATOR}{int(whole)}{track_id}" for key, whole in keys.items())
+
+def _split(key: str) -> tuple[str, bool, str]:
+    """name, whole-name flag, track id"""
+    at = key.index(_SEPARATOR)
+    return key[:at], key[at + 1] == "1", key[at + 2:]
+
+def _prefix_scores(entry: Entry) -> dict[str, float]:
+    """The score this track has under each short prefix of its keys"""
+    scores = {}
+    for key in entry.keys:
+        text, whole, _track_id = _split(key)
+        score = entry.weight * (START_BONUS if whole else 1.0)
+        for n in range(1, min(HEAD_LENGTH, len(text)) + 1):
+            if score > scores.get(text[:n], 0.0):
+                scores[text[:n]] = score
+    return scores
+
+
+# ============ SORTED KEYS ============
+
+def _add_key(key: str):
+    if not _blocks:
+        _blocks.append([key])
+        _maxes.append(key)
+        return
+    i = min(bisect_left(_maxes, key), len(_blocks) - 1)
+    block = _blocks[i]
+    insort(block, key)
+    _maxes[i] = block[-1]
+    if len(block) > 2 * BLOCK:
+        _blocks[i:i + 1] = [block[:BLOCK], block[BLOCK:]]
+        _maxes[i:i + 1] = [block[BLOCK - 1], block[-1]]
+
+def _remove_key(key: str):
+    i = bisect_left(_maxes, key)
+    if i == len(_blocks):
+        return
+    block = _blocks[i]
+    j = bisect_left(block, key)
+    if j < len(block) and block[j] == key:
+        del block[j]
+        if block:
+            _maxes[i] = block[-1]
+        else:
+            del _blocks[i], _maxes[i]
+
+def _keys_from(wanted: str):
+    """Keys >= wanted, in order"""
+    i = bisect_left(_maxes, wanted)
+    if i == len(_blocks):
+        return
+    block = _blocks[i]
+    yield from islice(block, bisect_left(block, wanted), None)
+    for block in islice(_blocks, i + 1, None):
+        yield from block
+
+
+# ============ INDEX ============
+
+def _promote(track_id: str, entry: Entry):
+    """Move a track up (or into) the top lists of its short prefixes after its weight grew"""
+    for prefix, score in _prefix_scores(entry).items():
+        head = _heads.setdefault(prefix, [])
+        if len(head) == MAX_RESULTS and score <= head[-1][0]:
+            continue   # not (or no longer) among the best, nor moving up
+        for i, (_score, other) in enumerate(head):
+            if other == track_id:
+                del head[i]
+                break
+        if len(head) < MAX_RESULTS or score > head[-1][0]:
+            i = next((i for i, (other_score, _other) in enumerate(head) if score > other_score), len(head))
+            head.insert(i, (score, track_id))
+            del head[MAX_RESULTS:]
+
+def _demote(track_id: str, entry: Entry):
+    for prefix in _prefix_scores(entry):
+        head = _heads.get(prefix)
+        if head:
+            head[:] = [item for item in head if item[1] != track_id]
+    for key in entry.keys:
+        _remove_key(key)
+
+def _insert(track_id: str, entry: Entry):
+    _tracks[track_id] = entry
+    for key in entry.keys:
+        _add_key(key)
+    _promote(track_id, entry)
+
+
+def _read() -> tuple[dict[str, Entry], list[list[str]], dict[str, list[tuple[float, str]]]]:
+    """Runs on a worker thread: the stored tracks, their sorted key blocks and the short-prefix tops"""
+    with _lock:
+        rows = _connect().execute("SELECT id, artist, title, body, weight FROM tracks").fetchall()
+    tracks, keys, candidates = {}, [], defaultdict(list)
+    for track_id, artist, title, body, weight in rows:
+        entry = tracks[track_id] = Entry(weight, bytes(body), _keys(track_id, artist, title))
+        keys.extend(entry.keys)
+        for prefix, score in _prefix_scores(entry).items():
+            candidates[prefix].append((score, track_id))
+    keys.sort()
+    blocks = [keys[i:i + BLOCK] for i in range(0, len(keys), BLOCK)]
+    heads = {prefix: heapq.nlargest(MAX_RESULTS, items) for prefix, items in candidates.items()}
+    return tracks, blocks, heads
+
+async def load():
+    """Rebuild the in-memory index from disk, keeping anything indexed while it was read"""
+    global _tracks, _blocks, _maxes, _heads
+    if not SUGGEST_ENABLED:
+        return
+    started = time.perf_counter()
+    try:
+        tracks, blocks, heads = await asyncio.to_thread(_read)
+    except sqlite3.Error as e:
+        print(f"Suggest index load error: {e}")
+        return
+    recent = [(track_id, entry) for track_id, entry in _tracks.items() if track_id not in tracks]
+    _tracks, _blocks, _maxes, _heads = tracks, blocks, [block[-1] for block in blocks], heads
+    for track_id, entry in recent:
+        _insert(track_id, entry)
+    print(f"Suggest index: {len(_tracks)} tracks loaded in {time.perf_counter() - started:.2f}s")
+
+
+def add(tracks: Iterable[Track], weight: float = 1.0):
+    """Index tracks a provider returned; earlier positions in a result list count for more"""
+    if not SUGGEST_ENABLED:
+        return
+    rows = []
+    now = time.time()
+    for position, track in enumerate(tracks):
+        body = track.model_dump_json().encode()
+        entry = _tracks.get(track.id)
+        gain = weight / (position + 1)
+        if entry is None:
+            _insert(track.id, Entry(gain, body, _keys(track.id, track.artist, track.title)))
+            stats["indexed"] += 1
+        else:
+            entry.weight += gain
+            if entry.body != body:
+                keys = _keys(track.id, track.artist, track.title)
+                if keys != entry.keys:
+                    _demote(track.id, entry)
+                    entry.keys = keys
+                    _insert(track.id, entry)
+                entry.body = body
+            _promote(track.id, entry)
+        rows.append((track.id, track.artist, track.title, body, gain, now))
+    if rows:
+        # Weights are added to what is stored, so nothing is lost to a load still in progress
+        _write("INSERT INTO tracks (id, artist, title, body, weight, seen) VALUES (?, ?, ?, ?, ?, ?)"
+               " ON CONFLICT (id) DO UPDATE SET artist = excluded.artist, title = excluded.title,"
+               " body = excluded.body, weight = weight + excluded.weight, seen = excluded.seen", rows)
+    if len(_tracks) > SUGGEST_MAX_TRACKS:
+        _evict()
+
+
+def played(track_id: str):
+    """A track was picked: boost it"""
+    entry = _tracks.get(track_id)
+    if entry is None:
+        return
+    entry.weight += PLAY_WEIGHT
+    _promote(track_id, entry)
+    stats["played"] += 1
+    _write("UPDATE tracks SET weight = weight + ?, seen = ? WHERE id = ?", [(PLAY_WEIGHT, time.time(), track_id)])
+
+
+def _evict():
+    """Drop the least popular tenth of the index"""
+    drop = heapq.nsmallest(len(_tracks) - int(SUGGEST_MAX_TRACKS * 0.9), _tracks, key=lambda track_id: _tracks[track_id].weight)
+    for track_id in drop:
+        _demote(track_id, _tracks.pop(track_id))
+    stats["evictions"] += len(drop)
+    _write("DELETE FROM tracks WHERE id = ?", [(track_id,) for track_id in drop])
+
+
+# ============ LOOKUP ============
+
+def prefix(query: str) -> str:
+    """The normalized form a query is matched on ("" when there is nothing to match)"""
+    return normalize(query)[:KEY_LENGTH]
+
+def lookup(query: str, limit: int) -> list[str]:
+    """Ids of the most popular tracks with a name or word sequence starting with query"""
+    stats["queries"] += 1
+    wanted = prefix(query)
+    if not wanted:
+        return []
+    head = _heads.get(wanted, []) if len(wanted) <= HEAD_LENGTH else []
+    # A short top list means few matches (or tracks lost to eviction): scanning them is cheap
+    if len(head) >= limit:
+        return [track_id for _score, track_id in head[:limit]]
+
+    scores: dict[str, float] = {}
+    for key in islice(_keys_from(wanted), SCAN_LIMIT):
+        if not key.startswith(wanted):
+            break
+        _text, whole, track_id = _split(key)
+        score = _tracks[track_id].weight * (START_BONUS if whole else 1.0)
+        if score > scores.get(track_id, 0.0):
+            scores[track_id] = score
+    return heapq.nlargest(limit, scores, key=scores.__getitem__)
+
+def body(track_id: str) -> bytes:
+    return _tracks[track_id].body
+
+def size() -> int:
+    """Tracks in the index"""
+    return len(_tracks)
+
+def summary() -> dict:
+    return {**stats, "tracks": size(), "keys": sum(map(len, _blocks))}
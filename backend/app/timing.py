@@ -0,0 +1,68 @@
+import re
+from typing import Optional
+from .models import LyricLine, WordTimes, WordTiming
+
+# Word-level timing for the Story/Drill/Kinetic renderers, computed once per track.
+# Mirrors the frontend heuristics: each word weighs 2 + its length (+ a pause bonus
+# if it carries punctuation) and gets its share of the line's reveal window. Lines with
+# enhanced-LRC word tags for every word use those times instead.
+PUNCTUATION = re.compile(r"[.,!?;:]")
+LAST_LINE_DURATION = 3.0
+
+MODES = {
+    # mode: (start offset, punctuation bonus, reveal window as a fraction of the line, minimum window)
+    "story": (0.1, 4.0, 0.85, 0.0),   # "Hybrid Kinetic": 0.1s offset, 85% window
+    "drill": (0.0, 4.0, 1.0, 0.0),    # "Staccato": words fill the whole line
+    "kinetic": (0.0, 3.0, 0.8, 0.5),
+}
+
+def compute(lines: list[LyricLine], mode: str, word_times: Optional[WordTimes] = None) -> Optional[WordTiming]:
+    """Per-word start/end times (seconds from track start) for every line of synced lyrics"""
+    if not lines or lines[0].time < 0:
+        return None
+    import numpy as np  # deferred: it is the heaviest import on the request path
+    offset, bonus, fraction, min_window = MODES[mode]
+
+    counts = []
+    lengths = []
+    punctuated = []
+    for line in lines:
+        words = line.text.split()
+        counts.append(len(words))
+        lengths.extend(len(word) for word in words)
+        punctuated.extend(PUNCTUATION.search(word) is not None for word in words)
+
+    counts = np.asarray(counts, dtype=np.int64)
+    line_of_word = np.repeat(np.arange(len(lines)), counts)
+    weights = 2.0 + np.asarray(lengths, dtype=np.float64) + bonus * np.asarray(punctuated, dtype=np.float64)
+
+    times = np.fromiter((line.time for line in lines), dtype=np.float64, count=len(lines))
+    durations = np.append(np.diff(times), LAST_LINE_DURATION)
+    windows = np.maximum(durations * fraction, min_window)
+
+    totals = np.bincount(line_of_word, weights=weights, minlength=len(lines))
+    line_base = np.cumsum(totals) - totals
+    weight_before = np.cumsum(weights) - weights - line_base[line_of_word]
+    scale = windows[line_of_word] / totals[line_of_word]
+
+    start = times[line_of_word] + offset + weight_before * scale
+    end = start + weights * scale
+
+    if word_times is not None and len(word_times.lineOffsets) == len(lines) + 1:
+        tagged_counts = np.diff(np.asarray(word_times.lineOffsets, dtype=np.int64))
+        tagged = tagged_counts == counts   # a tag for every word
+        if tagged.any():
+            real = np.asarray(word_times.start, dtype=np.float64)
+            is_real = tagged[line_of_word]
+            start[is_real] = real[np.repeat(tagged, tagged_counts)]
+            # A tagged word lasts until the next one; a line's last word keeps its modelled length
+            followed = np.append(line_of_word[1:] == line_of_word[:-1], False) & is_real
+            end = np.where(is_real, start + weights * scale, end)
+            end[followed] = start[1:][followed[:-1]]
+
+    return WordTiming(
+        mode=mode,
+        lineOffsets=np.concatenate(([0], np.cumsum(counts))).tolist(),
+        start=np.round(start, 3).tolist(),
+        end=np.round(end, 3).tolist(),
+    )
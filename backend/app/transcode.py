@@ -0,0 +1,290 @@
+import asyncio
+import os
+import re
+import shutil
+from typing import Awaitable, Callable, Optional
+
+from fastapi.responses import FileResponse, Response
+from . import audiocache, limits
+
+# Optional Opus delivery for weak links: /stream?bitrate=N starts a background render of
+# the track to disk and, once it is there, hands out /audio/{id}/opus/{N} instead of the
+# passthrough URL, so a player never gets two formats from one URL and seeks like in any
+# cached file; /audio/{id}/hls/{N}/index.m3u8 cuts the stream into short segments for
+# players that speak HLS. Nothing changes when ffmpeg is missing: callers keep the
+# passthrough proxy.
+FFMPEG_PATH = os.getenv("FFMPEG_PATH") or shutil.which("ffmpeg")
+TRANSCODE_ENABLED = os.getenv("TRANSCODE_ENABLED", "true").lower() == "true" and FFMPEG_PATH is not None
+# Each ffmpeg job keeps roughly one core busy while it runs
+TRANSCODE_JOBS = int(os.getenv("TRANSCODE_JOBS", str(max(1, (os.cpu_count() or 2) // 2))))
+TRANSCODE_CACHE_DIR = os.getenv("TRANSCODE_CACHE_DIR", "/tmp/lyricgen-renditions")
+TRANSCODE_CACHE_MAX_BYTES = int(os.getenv("TRANSCODE_CACHE_MAX_BYTES", str(1024 ** 3)))
+TRANSCODE_CACHE_AFTER = int(os.getenv("TRANSCODE_CACHE_AFTER", "1"))  # plays before a rendition is made
+SEGMENT_SECONDS = 6
+PLAYLIST_WAIT = 15.0        # seconds to wait for the first segment before giving up
+
+BITRATES = (32, 64, 96, 128)    # kbps
+MIME_TYPE = "audio/webm"
+PLAYLIST_TYPE = "application/vnd.apple.mpegurl"
+SEGMENT_NAME = re.compile(r"^(init\.mp4|seg\d{5}\.m4s)$")
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+
+# Fixed-size job pool: the limit never adapts (ffmpeg is CPU-bound, not an upstream), but
+# it sheds when every slot is taken and trips a breaker if ffmpeg keeps failing
+_jobs = limits.upstream("ffmpeg", maximum=TRANSCODE_JOBS, initial=TRANSCODE_JOBS, minimum=TRANSCODE_JOBS)
+_plays: dict[str, int] = {}
+_running: dict[str, asyncio.Task] = {}   # cache entry name -> background job writing it
+
+stats = {"fallbacks": 0, "cache_hits": 0, "renditions": 0, "segmenters": 0, "failures": 0, "evictions": 0}
+
+
+class Rendition:
+    """A finished file in the rendition cache (duck-types audiocache.Entry for range serving)"""
+
+    def __init__(self, path: str):
+        stat = os.stat(path)
+        self.path = path
+        self.size = stat.st_size
+        self.mime_type = MIME_TYPE
+        self.etag = f'"{os.path.basename(path)}-{stat.st_size}-{int(stat.st_mtime)}"'
+
+
+def available() -> bool:
+    return TRANSCODE_ENABLED
+
+def snap(bitrate: int) -> int:
+    """The highest offered bitrate not above the requested one"""
+    return max((b for b in BITRATES if b <= bitrate), default=BITRATES[0])
+
+def _key(video_id: str, bitrate: int) -> str:
+    """Cache entry name: <key>.webm is the whole rendition, <key>/ its HLS segments"""
+    return f"{video_id}-opus{bitrate}"
+
+def _copyable(info: dict, bitrate: int) -> bool:
+    """YouTube's WebM audio is already Opus: at or below the target it only needs remuxing"""
+    return info.get("mime_type") == MIME_TYPE and 0 < (info.get("bitrate") or 0) <= bitrate * 1.1
+
+def _input(video_id: str, info: dict) -> list[str]:
+    # Read from the audio cache when the whole stream is already on disk
+    local = audiocache.complete_path(audiocache.key_for(video_id, info["url"]))
+    if local:
+        return ["-i", local]
+    return ["-user_agent", USER_AGENT, "-reconnect", "1", "-reconnect_streamed", "1", "-i", info["url"]]
+
+def _command(video_id: str, info: dict, bitrate: int, copy: bool = False) -> list[str]:
+    codec = ["-c:a", "copy"] if copy else ["-c:a", "libopus", "-b:a", f"{bitrate}k", "-vbr", "on", "-application", "audio"]
+    return [FFMPEG_PATH, "-nostdin", "-hide_banner", "-loglevel", "error",
+            *_input(video_id, info), "-vn", "-map", "0:a:0", *codec]
+
+async def _spawn(args: list[str]) -> asyncio.subprocess.Process:
+    return await asyncio.create_subprocess_exec(
+        *args, stdin=asyncio.subprocess.DEVNULL, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE,
+    )
+
+async def _finish(process: asyncio.subprocess.Process, what: str) -> bool:
+    stderr = await process.stderr.read()
+    if await process.wait() != 0:
+        stats["failures"] += 1
+        print(f"ffmpeg {what} failed ({process.returncode}): {stderr.decode(errors='replace').strip()[-300:]}")
+        return False
+    return True
+
+async def _kill(process: asyncio.subprocess.Process):
+    if process.returncode is None:
+        process.kill()
+        await process.wait()
+
+
+# ============ RENDITION CACHE ============
+
+def _path(key: str) -> str:
+    return os.path.join(TRANSCODE_CACHE_DIR, key)
+
+def _usage() -> list[tuple[float, int, str]]:
+    """(mtime, bytes, path) for every rendition file and segment directory"""
+    found = []
+    try:
+        names = os.listdir(TRANSCODE_CACHE_DIR)
+    except OSError:
+        return found
+    for name in names:
+        if name.endswith(".tmp"):
+            continue
+        path = _path(name)
+        try:
+            if os.path.isdir(path):
+                size = sum(entry.stat().st_size for entry in os.scandir(path))
+            else:
+                size = os.path.getsize(path)
+            found.append((os.path.getmtime(path), size, path))
+        except OSError:
+            continue
+    return found
+
+def _evict(busy: set[str]):
+    """Oldest renditions first, skipping the ones still being written (runs on a worker thread)"""
+    usage = _usage()
+    total = sum(size for _mtime, size, _name in usage)
+    for _mtime, size, path in sorted(usage):
+        if total <= TRANSCODE_CACHE_MAX_BYTES:
+            break
+        if path in busy:
+            continue
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+        total -= size
+        stats["evictions"] += 1
+
+def _done(name: str, task: asyncio.Task):
+    _running.pop(name, None)
+    if not task.cancelled():
+        task.exception()   # retrieved here, or by whoever awaits it
+
+def _start(name: str, job) -> asyncio.Task:
+    """One background job per cache entry; job() is only called if none is running"""
+    task = _running.get(name)
+    if task is None:
+        task = _running[name] = asyncio.create_task(job())
+        task.add_done_callback(lambda t: _done(name, t))
+    return task
+
+async def _render(name: str, args: list[str]):
+    """Transcode a whole rendition to disk in the background"""
+    path = _path(name)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        async with _jobs.guard() as call:
+            os.makedirs(TRANSCODE_CACHE_DIR, exist_ok=True)
+            process = await _spawn(args + ["-f", "webm", "-y", tmp])
+            try:
+                call.ok = await _finish(process, "rendition")
+            finally:
+                await _kill(process)
+        if call.ok:
+            os.replace(tmp, path)
+            stats["renditions"] += 1
+            await asyncio.to_thread(_evict, {_path(name) for name in _running})
+    except limits.Unavailable:
+        pass   # busy: a later play will try again
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+# ============ RENDITIONS ============
+
+def ready(video_id: str, bitrate: int) -> bool:
+    """Whether the rendition is on disk (and /audio/{id}/opus/{bitrate} can be handed out)"""
+    return os.path.exists(_path(_key(video_id, snap(bitrate)) + ".webm"))
+
+def prepare(video_id: str, bitrate: int, resolve: Callable[[str], Awaitable[Optional[dict]]]):
+    """A weak-link client got the passthrough URL: render the rendition in the background
+    once the track has been played often enough (unless the source is small enough already)"""
+    name = _key(video_id, snap(bitrate)) + ".webm"
+    stats["fallbacks"] += 1
+    _plays[name] = _plays.get(name, 0) + 1
+    if _plays[name] >= TRANSCODE_CACHE_AFTER:
+        _start(name, lambda: _render_resolved(video_id, snap(bitrate), name, resolve))
+
+async def _render_resolved(video_id: str, bitrate: int, name: str, resolve):
+    info = await resolve(video_id)
+    if info and info.get("url") and not _copyable(info, bitrate):
+        await _render(name, _command(video_id, info, bitrate))
+
+def serve(video_id: str, bitrate: int, range_header: Optional[str]) -> Optional[Response]:
+    """The rendition with range support, or None if it is not on disk"""
+    try:
+        rendition = Rendition(_path(_key(video_id, snap(bitrate)) + ".webm"))
+    except OSError:
+        return None
+    headers = {"ETag": rendition.etag, "Cache-Control": "public, max-age=86400"}
+    byte_range = audiocache.parse_range(range_header)
+    if byte_range is None:
+        byte_range, range_header = (0, None), None   # a range we don't support: send it all
+    start, end = byte_range
+    if start >= rendition.size:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{rendition.size}"})
+    end = rendition.size - 1 if end is None else min(end, rendition.size - 1)
+    try:
+        response = audiocache.RangeFileResponse(rendition, start, end, partial=range_header is not None, headers=headers)
+    except OSError:
+        return None   # evicted just now
+    stats["cache_hits"] += 1
+    return response
+
+
+# ============ SEGMENTED ============
+
+async def _segment(name: str, args: list[str]):
+    directory = _path(name)
+    ok = False
+    try:
+        async with _jobs.guard() as call:
+            shutil.rmtree(directory, ignore_errors=True)   # leftovers of an interrupted run
+            os.makedirs(directory)
+            # temp_file: a segment (or playlist) only appears under its name once complete
+            process = await _spawn(args + [
+                "-f", "hls", "-hls_time", str(SEGMENT_SECONDS), "-hls_playlist_type", "event",
+                "-hls_flags", "temp_file", "-hls_segment_type", "fmp4", "-hls_fmp4_init_filename", "init.mp4",
+                "-hls_segment_filename", os.path.join(directory, "seg%05d.m4s"),
+                os.path.join(directory, "index.m3u8"),
+            ])
+            try:
+                ok = call.ok = await _finish(process, "segmenter")
+            finally:
+                await _kill(process)
+    finally:
+        if ok:
+            stats["segmenters"] += 1
+            await asyncio.to_thread(_evict, {_path(name) for name in _running})
+        else:
+            shutil.rmtree(directory, ignore_errors=True)
+
+def _complete(playlist: str) -> bool:
+    try:
+        with open(playlist, "rb") as f:
+            f.seek(max(0, os.path.getsize(playlist) - 64))
+            return b"#EXT-X-ENDLIST" in f.read()
+    except OSError:
+        return False
+
+async def playlist(video_id: str, info: dict, bitrate: int) -> Optional[Response]:
+    """The HLS playlist for a rendition, starting the segmenter if needed; raises
+    limits.Unavailable when no ffmpeg slot is free, None if no segment appeared in time"""
+    bitrate = snap(bitrate)
+    name = _key(video_id, bitrate)
+    path = os.path.join(_path(name), "index.m3u8")
+    task = _running.get(name)
+    if task is None and not _complete(path):
+        _jobs.check()
+        task = _start(name, lambda: _segment(name, _command(video_id, info, bitrate, copy=_copyable(info, bitrate))))
+    # ffmpeg writes the playlist once the first segment is out
+    waited = 0.0
+    while not os.path.exists(path):
+        if task is None or task.done():
+            if task is not None and isinstance(task.exception(), limits.Unavailable):
+                raise task.exception()
+            return None
+        await asyncio.sleep(0.05)
+        waited += 0.05
+        if waited >= PLAYLIST_WAIT:
+            return None
+    with open(path, "rb") as f:
+        body = f.read()
+    # An EVENT playlist grows while ffmpeg runs; players reload it until it ends
+    cache_control = "public, max-age=86400" if b"#EXT-X-ENDLIST" in body else "no-cache"
+    return Response(body, media_type=PLAYLIST_TYPE, headers={"Cache-Control": cache_control})
+
+def segment(video_id: str, bitrate: int, name: str) -> Optional[Response]:
+    if not SEGMENT_NAME.match(name):
+        return None
+    path = os.path.join(_path(_key(video_id, snap(bitrate))), name)
+    if not os.path.exists(path):
+        return None
+    media_type = "audio/mp4" if name.endswith(".m4s") else "video/mp4"
+    return FileResponse(path, media_type=media_type, headers={"Cache-Control": "public, max-age=86400, immutable"})
@@ -0,0 +1,274 @@
+"""Load test: the real app against local upstream stand-ins, with machine-readable results.
+
+    python -m bench.load [--scenarios search_cold,plays_warm] [--requests 200]
+                         [--concurrency 16] [--latency 0.05] [--jitter 0.02] [--output results.json]
+
+Starts bench.standins and bench.server as subprocesses (fresh caches in a temp
+dir), drives each scenario and prints one JSON document: RPS, p50/p95/p99 and
+error counts per scenario and per endpoint, plus the RSS of the server process
+and its extraction workers. Compare the output of two commits to spot regressions.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+import httpx
+from bench import standins
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+SONGS = [(r["artistName"], r["trackName"]) for r in standins.fixture("lrclib_records")]
+VIDEO_IDS = [item["videoId"] for item in standins.fixture("ytmusic_search")]
+SEEK_SIZE = 256 * 1024
+SEEKS_PER_PLAY = 3
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _rss_mb(pid: int) -> float:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return 0.0
+
+def _children(pid: int) -> list[int]:
+    found = []
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    if int(f.read().rsplit(")", 1)[1].split()[1]) == pid:
+                        found.append(int(entry))
+            except (OSError, IndexError, ValueError):
+                continue
+    return found
+
+def memory(pid: int) -> dict:
+    return {"server_rss_mb": _rss_mb(pid), "workers_rss_mb": [_rss_mb(child) for child in _children(pid)]}
+
+
+# ============ SCENARIOS ============
+# Each scenario yields "plays": coroutines factories that issue one or more requests
+
+async def _get(client: httpx.AsyncClient, record, kind: str, url: str, **kwargs):
+    start = time.perf_counter()
+    try:
+        response = await client.get(url, **kwargs)
+        status = response.status_code
+    except httpx.HTTPError as e:
+        status = type(e).__name__
+    record(kind, time.perf_counter() - start, status)
+    return status
+
+def search_cold(i: int):
+    return lambda c, rec: _get(c, rec, "search", "/api/v1/search", params={"q": f"bench query {i}"})
+
+def search_warm(i: int):
+    # A burst over a few popular queries: coalesced while cold, cache hits after
+    artist, title = SONGS[i % len(SONGS)]
+    return lambda c, rec: _get(c, rec, "search", "/api/v1/search", params={"q": f"{artist} {title}"})
+
+def lyrics_cold(i: int):
+    return lambda c, rec: _get(c, rec, "lyrics", "/api/v1/lyrics", params={"artist": f"Bench Artist {i}", "title": f"Song {i}", "mode": "story"})
+
+def lyrics_warm(i: int):
+    artist, title = SONGS[i % len(SONGS)]
+    return lambda c, rec: _get(c, rec, "lyrics", "/api/v1/lyrics", params={"artist": artist, "title": title, "mode": "story"})
+
+def _play(video_id: str):
+    async def play(client: httpx.AsyncClient, record):
+        if await _get(client, record, "stream", "/api/v1/stream", params={"videoId": video_id}) != 200:
+            return
+        # Start of the track, then a few seeks
+        offsets = [0] + [random.randrange(0, standins.AUDIO_SIZE - SEEK_SIZE) for _ in range(SEEKS_PER_PLAY)]
+        for offset in offsets:
+            headers = {"Range": f"bytes={offset}-{offset + SEEK_SIZE - 1}"}
+            await _get(client, record, "audio", f"/api/v1/audio/{video_id}", headers=headers)
+    return play
+
+def plays_cold(i: int):
+    return _play(f"cold{i:07d}"[-11:])
+
+def plays_warm(i: int):
+    return _play(VIDEO_IDS[i % len(VIDEO_IDS)])
+
+SCENARIOS = {
+    "search_cold": search_cold,
+    "search_warm": search_warm,
+    "lyrics_cold": lyrics_cold,
+    "lyrics_warm": lyrics_warm,
+    "plays_cold": plays_cold,
+    "plays_warm": plays_warm,
+}
+# Warm scenarios are primed with one pass at low concurrency first
+PRIMED = {"search_warm", "lyrics_warm", "plays_warm"}
+
+
+def _percentile(ordered: list[float], p: float) -> float:
+    if not ordered:
+        return 0.0
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000, 2)
+
+def _summary(samples: list[tuple[float, object]], elapsed: float) -> dict:
+    latencies = sorted(latency for latency, _ in samples)
+    statuses = Counter(str(status) for _, status in samples)
+    return {
+        "requests": len(samples),
+        "errors": sum(n for status, n in statuses.items() if not status.startswith(("2", "3"))),
+        "statuses": dict(statuses),
+        "rps": round(len(samples) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": _percentile(latencies, 0.50),
+        "p95_ms": _percentile(latencies, 0.95),
+        "p99_ms": _percentile(latencies, 0.99),
+    }
+
+async def run_scenario(client: httpx.AsyncClient, name: str, count: int, concurrency: int) -> dict:
+    factory = SCENARIOS[name]
+    if name in PRIMED:
+        await _drive(client, [factory(i) for i in range(len(SONGS))], 2, lambda *_: None)
+
+    samples: dict[str, list] = defaultdict(list)
+    def record(kind: str, latency: float, status):
+        samples[kind].append((latency, status))
+
+    start = time.perf_counter()
+    await _drive(client, [factory(i) for i in range(count)], concurrency, record)
+    elapsed = time.perf_counter() - start
+
+    result = _summary([s for kind in samples.values() for s in kind], elapsed)
+    result["duration_s"] = round(elapsed, 3)
+    if len(samples) > 1:
+        result["by_endpoint"] = {kind: _summary(s, elapsed) for kind, s in samples.items()}
+    return result
+
+async def _drive(client: httpx.AsyncClient, plays: list, concurrency: int, record):
+    queue = asyncio.Queue()
+    for play in plays:
+        queue.put_nowait(play)
+
+    async def user():
+        while not queue.empty():
+            await queue.get_nowait()(client, record)
+
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+
+
+# ============ PROCESSES ============
+
+def _wait_ready(url: str, process: subprocess.Popen, timeout: float = 60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} exited with {process.returncode}")
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+async def _run_all(base: str, server_pid: int, args) -> dict:
+    results = {}
+    limits = httpx.Limits(max_connections=args.concurrency * 2)
+    async with httpx.AsyncClient(base_url=base, limits=limits, timeout=60) as client:
+        for name in args.scenarios:
+            results[name] = await run_scenario(client, name, args.requests, args.concurrency)
+            results[name]["memory"] = memory(server_pid)
+            print(f"{name}: {results[name]['rps']} rps, p95 {results[name]['p95_ms']} ms, "
+                  f"{results[name]['errors']} errors", file=sys.stderr)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m bench.load", description="Load-test the API against local upstream stand-ins")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"comma-separated, from: {', '.join(SCENARIOS)}")
+    parser.add_argument("--requests", type=int, default=200, help="requests (or plays) per scenario")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent virtual users")
+    parser.add_argument("--latency", type=float, default=0.05, help="upstream latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.02, help="upstream latency standard deviation")
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    args = parser.parse_args()
+    args.scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = [s for s in args.scenarios if s not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    upstream_port, server_port = _free_port(), _free_port()
+    upstream = f"http://127.0.0.1:{upstream_port}"
+    with tempfile.TemporaryDirectory(prefix="lyricgen-bench-") as tmp:
+        env = dict(
+            os.environ,
+            PYTHONPATH=str(BACKEND_DIR),
+            BENCH_UPSTREAM=upstream,
+            BENCH_LATENCY=str(args.latency),
+            BENCH_JITTER=str(args.jitter),
+            LRCLIB_URL=f"{upstream}/lrclib/api",
+            ITUNES_URL=f"{upstream}/itunes/search",
+            CACHE_BACKEND="memory",
+            CACHE_SNAPSHOT_PATH=os.path.join(tmp, "snapshot.sqlite3"),
+            LYRICS_STORE_PATH=os.path.join(tmp, "lyrics.sqlite3"),
+            AUDIO_CACHE_DIR=os.path.join(tmp, "audio"),
+            CACHE_PATH=os.path.join(tmp, "cache.sqlite3"),
+            SUGGEST_INDEX_PATH=os.path.join(tmp, "suggest.sqlite3"),
+            ART_CACHE_DIR=os.path.join(tmp, "art"),
+            TRANSCODE_CACHE_DIR=os.path.join(tmp, "renditions"),
+        )
+        processes = []
+        try:
+            # Server output goes to stderr so stdout stays a single JSON document
+            processes.append(subprocess.Popen([sys.executable, "-m", "bench.standins", "--port", str(upstream_port)], cwd=BACKEND_DIR, env=env, stdout=sys.stderr))
+            _wait_ready(f"{upstream}/itunes/search", processes[-1])
+            processes.append(subprocess.Popen([sys.executable, "-m", "bench.server", "--port", str(server_port)], cwd=BACKEND_DIR, env=env, stdout=sys.stderr))
+            base = f"http://127.0.0.1:{server_port}"
+            _wait_ready(f"{base}/health", processes[-1])
+
+            started = time.time()
+            results = asyncio.run(_run_all(base, processes[-1].pid, args))
+        finally:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                try:
+                    process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+
+    report = {
+        "commit": _git_commit(),
+        "timestamp": int(started),
+        "python": platform.python_version(),
+        "config": {
+            "requests": args.requests, "concurrency": args.concurrency,
+            "upstream_latency_s": args.latency, "upstream_jitter_s": args.jitter,
+            "audio_size": standins.AUDIO_SIZE,
+        },
+        "scenarios": results,
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
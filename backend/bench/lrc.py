@@ -0,0 +1,100 @@
+"""LRC parsing and lyrics cache-hit micro-benchmark.
+
+    python -m bench.lrc
+
+Checks app.lrc on the edge cases the old regex-per-line parser got wrong
+(repeated timestamps, [offset:], enhanced word tags) and against the old
+parser on a generated corpus (200 ordinary files and one 20,000-line file),
+then times both, and times a lyrics cache hit served from stored bytes
+against the old json + pydantic round-trip. Offline; nothing is sent upstream.
+Exits with an AssertionError if a check fails.
+"""
+import random
+import re
+import time
+from app import cache, timing
+from app.lrc import parse
+from app.models import LyricLine, LyricsResponse, LyricsMeta
+
+WORDS = "love night baby fire heart dance yeah we you never gonna give up tonight".split()
+
+
+def legacy_parse_lrc(lrc: str) -> list[LyricLine]:
+    lines = []
+    pattern = r'\[(\d{2}):(\d{2})\.(\d{2,3})\](.*)'
+    for line in lrc.strip().split('\n'):
+        match = re.match(pattern, line)
+        if match:
+            mins, secs, ms, text = match.groups()
+            ms = ms.ljust(3, '0')[:3]
+            t = int(mins) * 60 + int(secs) + int(ms) / 1000
+            text = text.strip()
+            is_instrumental = text == "" or text.lower() in ["♪", "instrumental"]
+            lines.append(LyricLine(time=round(t, 2), text=text if text else "♪", isInstrumental=is_instrumental))
+    return lines
+
+def make_lrc(lines: int, gap: float = 5.0) -> str:
+    out = ["[ar:Bench]", "[ti:Corpus]"]
+    t = 0.0
+    for _ in range(lines):
+        t += random.uniform(gap * 0.3, gap)
+        text = " ".join(random.choice(WORDS) for _ in range(random.randint(0, 9)))
+        out.append(f"[{int(t // 60):02d}:{t % 60:05.2f}]{text}")
+    return "\n".join(out)
+
+def check():
+    lines = parse("[ar:x]\n[00:12.00][01:40.00]Chorus\n[00:20.5]Verse\n[00:30.00]\n").lines()
+    assert [(l.time, l.text, l.isInstrumental) for l in lines] == [
+        (12.0, "Chorus", False), (20.5, "Verse", False), (30.0, "♪", True), (100.0, "Chorus", False)]
+    assert [l.time for l in parse("[offset:+500]\n[00:00.20]a\n[00:01.00]b").lines()] == [0.0, 0.5]
+    assert [l.time for l in parse("[offset:-250]\n[120:00]a").lines()] == [7200.25]
+
+    # Word tags: one per word (a trailing tag ends the last word), moved with repeated lines
+    lyrics = parse("[00:10.00][00:40.00]<00:10.00>Hello <00:10.50>big <00:11.00>world<00:11.60>\n"
+                   "[00:20.00]<00:20.00>two words <00:21.00>here\n[00:30.00]plain")
+    assert [l.text for l in lyrics.lines()] == ["Hello big world", "two words here", "plain", "Hello big world"]
+    words = lyrics.word_times()
+    assert words.lineOffsets == [0, 3, 3, 3, 6] and words.start == [10.0, 10.5, 11.0, 40.0, 40.5, 41.0]
+    assert parse("[00:01.00]no tags").word_times() is None
+
+    # Timing follows tagged words and models the rest
+    result = timing.compute(lyrics.lines(), "story", words)
+    assert result.start[:3] == [10.0, 10.5, 11.0] and result.end[:2] == [10.5, 11.0]
+    assert result.start[3] > 20.0 and result.end[-1] > 41.0
+    print("edge cases: ok")
+
+def bench(label: str, fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f"{label:<28} {elapsed * 1000:9.3f} ms")
+    return elapsed
+
+
+def main():
+    check()
+    random.seed(7)
+    corpus = [make_lrc(random.randint(40, 120)) for _ in range(200)]
+    big = make_lrc(20000, gap=0.4)  # stays under 100 minutes, which the legacy parser requires
+
+    for c in corpus + [big]:
+        assert [l.model_dump() for l in legacy_parse_lrc(c)] == [l.model_dump() for l in parse(c).lines()]
+
+    print(f"corpus: {len(corpus)} files, {sum(map(len, corpus)) // 1024} KiB; big file: {len(big) // 1024} KiB")
+    for label, files, repeat in (("corpus", corpus, 5), ("big", [big], 3)):
+        old = bench(f"legacy parser ({label})", lambda: [legacy_parse_lrc(c) for c in files], repeat)
+        columnar = bench(f"columnar parse ({label})", lambda: [parse(c) for c in files], repeat)
+        models = bench(f"parse + models ({label})", lambda: [parse(c).lines() for c in files], repeat)
+        print(f"ratio: {old / columnar:.1f}x columnar, {old / models:.1f}x with models")
+
+    result = LyricsResponse(trackId="lrclib_1", type="synced", lyrics=parse(big).lines(), meta=LyricsMeta(provider="lrclib"))
+    cache.set("lyrics", "old", result.model_dump())
+    cache.set_bytes("lyrics", "new", result.model_dump_json().encode())
+    old = bench("cache hit: json + pydantic", lambda: LyricsResponse(**cache.get("lyrics", "old")).model_dump_json(), 5)
+    new = bench("cache hit: stored bytes", lambda: cache.get_bytes("lyrics", "new"), 5)
+    print(f"ratio: {old / new:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
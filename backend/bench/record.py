@@ -0,0 +1,58 @@
+"""Re-record the upstream fixtures from the live services.
+
+    python -m bench.record ["Coldplay,Yellow" ...]
+
+Fetches lrclib records for the given songs (default: the ones already in the
+fixtures), plus one iTunes search, YouTube Music search/home/song and a yt-dlp
+info dict, and overwrites bench/fixtures/*.json. The yt-dlp stream URL is
+replaced by a template pointing at the local range server.
+"""
+import json
+import sys
+import httpx
+import yt_dlp
+from ytmusicapi import YTMusic
+from bench.standins import FIXTURES, fixture
+
+YTDLP_FIELDS = ("id", "title", "duration", "ext", "audio_ext", "acodec", "abr", "tbr", "filesize", "format_id")
+
+
+def save(name: str, data):
+    with open(FIXTURES / f"{name}.json", "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=1, ensure_ascii=False)
+    print(f"recorded {name}")
+
+def main():
+    songs = [tuple(arg.split(",", 1)) for arg in sys.argv[1:]] or \
+        [(r["artistName"], r["trackName"]) for r in fixture("lrclib_records")]
+
+    with httpx.Client(timeout=20, follow_redirects=True) as client:
+        records = []
+        for artist, title in songs:
+            response = client.get("https://lrclib.net/api/get", params={"artist_name": artist, "track_name": title})
+            if response.status_code == 200:
+                records.append(response.json())
+            else:
+                print(f"no lrclib record for {artist} - {title}")
+        save("lrclib_records", records)
+        artist, title = songs[0]
+        save("itunes_search", client.get("https://itunes.apple.com/search", params={
+            "term": f"{artist} {title}", "entity": "song", "limit": 20, "media": "music"}).json())
+
+    ytm = YTMusic()
+    results = ytm.search(f"{artist} {title}", filter="songs", limit=20)
+    save("ytmusic_search", results)
+    save("ytmusic_home", ytm.get_home(limit=3))
+    video_id = next(item["videoId"] for item in results if item.get("videoId"))
+    song = ytm.get_song(video_id)
+    save("ytmusic_song", {key: song[key] for key in ("playabilityStatus", "videoDetails") if key in song})
+
+    with yt_dlp.YoutubeDL({"format": "bestaudio/best", "quiet": True}) as ydl:
+        info = ydl.extract_info(f"https://www.youtube.com/watch?v={video_id}", download=False)
+    trimmed = {key: info.get(key) for key in YTDLP_FIELDS}
+    trimmed["url"] = "{upstream}/videoplayback?id={id}&itag=" + str(info.get("format_id")) + "&expire={expire}"
+    save("ytdlp_info", trimmed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+"""The API server with YouTube Music and yt-dlp replaced by fixture replays.
+
+    python -m bench.server --port 9200
+
+Run by bench.load; HTTP upstreams are redirected with LRCLIB_URL / ITUNES_URL.
+"""
+import argparse
+import uvicorn
+from bench import standins
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m bench.server")
+    parser.add_argument("--port", type=int, default=9200)
+    args = parser.parse_args()
+
+    standins.install()
+    from app.main import app
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
@@ -0,0 +1,162 @@
+"""Local stand-ins for the upstream services, replaying recorded fixtures.
+
+HTTP upstreams (lrclib, iTunes, a googlevideo-like range server) are served by
+`python -m bench.standins --port N`. YouTube Music and yt-dlp are called as
+libraries, so install() swaps in fakes that return the same fixtures through
+the app's real thread and process pools. Every response is delayed by
+BENCH_LATENCY seconds, +/- BENCH_JITTER (normally distributed, never negative).
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+from pathlib import Path
+
+FIXTURES = Path(__file__).parent / "fixtures"
+LATENCY = float(os.getenv("BENCH_LATENCY", "0.05"))
+JITTER = float(os.getenv("BENCH_JITTER", "0.02"))
+UPSTREAM = os.getenv("BENCH_UPSTREAM", "http://127.0.0.1:9100")
+AUDIO_SIZE = int(os.getenv("BENCH_AUDIO_SIZE", str(4 * 1024 * 1024)))
+AUDIO_CHUNK = 64 * 1024
+
+
+def fixture(name: str):
+    with open(FIXTURES / f"{name}.json", encoding="utf-8") as f:
+        return json.load(f)
+
+def delay() -> float:
+    return max(0.0, random.gauss(LATENCY, JITTER)) if JITTER else LATENCY
+
+def _stable_id(*parts: str) -> int:
+    return int(hashlib.md5("\0".join(parts).lower().encode()).hexdigest()[:7], 16)
+
+
+# ============ HTTP STAND-INS ============
+
+def create_app():
+    from starlette.applications import Starlette
+    from starlette.responses import JSONResponse, Response, StreamingResponse
+    from starlette.routing import Route
+
+    records = fixture("lrclib_records")
+    itunes = fixture("itunes_search")
+    audio = random.Random(7).randbytes(AUDIO_SIZE)
+
+    def record_for(artist: str, title: str) -> dict:
+        # A cold key still gets lyrics: the closest recorded record, renamed
+        for record in records:
+            if record["artistName"].lower() == artist.lower() and record["trackName"].lower() == title.lower():
+                return record
+        template = records[_stable_id(artist, title) % len(records)]
+        return dict(template, id=_stable_id(artist, title), artistName=artist, trackName=title, name=title)
+
+    async def lrclib_get(request):
+        await asyncio.sleep(delay())
+        artist, title = request.query_params.get("artist_name", ""), request.query_params.get("track_name", "")
+        if not artist or not title:
+            return JSONResponse({"code": 400, "name": "BadRequest"}, status_code=400)
+        return JSONResponse(record_for(artist, title))
+
+    async def lrclib_get_id(request):
+        await asyncio.sleep(delay())
+        lrclib_id = int(request.path_params["id"])
+        record = next((r for r in records if r["id"] == lrclib_id), records[lrclib_id % len(records)])
+        return JSONResponse(dict(record, id=lrclib_id))
+
+    async def lrclib_search(request):
+        await asyncio.sleep(delay())
+        q = request.query_params.get("q", "")
+        start = _stable_id(q) % len(records)
+        return JSONResponse(records[start:] + records[:start])
+
+    async def itunes_search(request):
+        await asyncio.sleep(delay())
+        return JSONResponse(itunes)
+
+    async def videoplayback(request):
+        if int(request.query_params.get("expire", "0")) < time.time():
+            return Response(status_code=403)
+        start, end = 0, AUDIO_SIZE - 1
+        header = request.headers.get("range")
+        if header and header.startswith("bytes="):
+            first, _, last = header[6:].partition("-")
+            start = int(first or 0)
+            end = min(int(last), AUDIO_SIZE - 1) if last else AUDIO_SIZE - 1
+            if start >= AUDIO_SIZE:
+                return Response(status_code=416, headers={"Content-Range": f"bytes */{AUDIO_SIZE}"})
+
+        async def body():
+            await asyncio.sleep(delay())   # time to first byte
+            for offset in range(start, end + 1, AUDIO_CHUNK):
+                yield audio[offset:min(offset + AUDIO_CHUNK, end + 1)]
+
+        headers = {"Accept-Ranges": "bytes", "Content-Length": str(end - start + 1)}
+        if header:
+            headers["Content-Range"] = f"bytes {start}-{end}/{AUDIO_SIZE}"
+        return StreamingResponse(body(), status_code=206 if header else 200, headers=headers, media_type="audio/webm")
+
+    return Starlette(routes=[
+        Route("/lrclib/api/get", lrclib_get),
+        Route("/lrclib/api/get/{id:int}", lrclib_get_id),
+        Route("/lrclib/api/search", lrclib_search),
+        Route("/itunes/search", itunes_search),
+        Route("/videoplayback", videoplayback),
+    ])
+
+
+# ============ LIBRARY FAKES ============
+
+class FakeYTMusic:
+    """Replays recorded ytmusicapi results (runs on the app's YTMusic thread pool)"""
+
+    def search(self, query: str, filter: str = None, limit: int = 20):
+        time.sleep(delay())
+        return fixture("ytmusic_search")[:limit]
+
+    def get_home(self, limit: int = 3):
+        time.sleep(delay())
+        return fixture("ytmusic_home")[:limit]
+
+    def get_song(self, video_id: str):
+        time.sleep(delay())
+        song = fixture("ytmusic_song")
+        song["videoDetails"]["videoId"] = video_id
+        return song
+
+
+class FakeYoutubeDL:
+    """Replays a recorded yt-dlp info dict pointing at the local range server"""
+
+    def extract_info(self, url: str, download: bool = False):
+        time.sleep(delay())
+        info = fixture("ytdlp_info")
+        vid = url.rsplit("=", 1)[-1]
+        info["id"] = vid
+        info["url"] = info["url"].format(upstream=UPSTREAM, id=vid, expire=int(time.time()) + 6 * 3600)
+        return info
+
+
+def extract(vid: str):
+    """Stands in for youtube._extract inside the real extraction worker processes"""
+    from app.providers import youtube
+    if not isinstance(youtube._ydl, FakeYoutubeDL):
+        youtube._ydl = FakeYoutubeDL()
+    return youtube._extract(vid)
+
+
+def install():
+    """Point the app's library-backed providers at the fakes (call before serving)"""
+    from app.providers import youtube, ytmusic
+    ytmusic._client = FakeYTMusic
+    youtube._extract = extract
+
+
+if __name__ == "__main__":
+    import uvicorn
+    parser = argparse.ArgumentParser(prog="python -m bench.standins")
+    parser.add_argument("--port", type=int, default=9100)
+    args = parser.parse_args()
+    uvicorn.run(create_app(), host="127.0.0.1", port=args.port, log_level="warning")
@@ -0,0 +1,125 @@
+"""Cold-start report: import-time profile and time until /health answers.
+
+    python -m bench.startup [--module app.main] [--top 15] [--runs 3] [--output startup.json]
+
+Imports the app in a fresh interpreter under `python -X importtime` and
+aggregates the cost by top-level package, then boots uvicorn with FAST_START
+on and off and measures how long /health takes to answer and how long the
+background warm-up (yt-dlp workers, ytmusicapi, numpy) takes to finish.
+Everything runs offline: nothing is sent upstream during startup.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+import httpx
+from bench.load import BACKEND_DIR, _free_port, _git_commit
+
+# Imported lazily by the app; listed so the report shows whether they leaked back into startup
+DEFERRED = ("yt_dlp", "ytmusicapi", "numpy")
+
+
+def import_profile(module: str, top: int) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+    ).stderr
+    by_package = defaultdict(int)
+    cumulative = {}
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        by_package[name.split(".")[0]] += int(self_us)
+        cumulative[name] = int(cumulative_us)
+    ranked = sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {
+        "total_ms": round(cumulative.get(module, 0) / 1000, 1),
+        "by_package_ms": {name: round(us / 1000, 1) for name, us in ranked},
+        "deferred_imported": [name for name in DEFERRED if name in cumulative],
+    }
+
+
+def _boot(fast_start: bool, tmp: str) -> dict:
+    """Spawn uvicorn, then time the first /health and the end of the background warm-up"""
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    env = dict(
+        os.environ,
+        PYTHONPATH=str(BACKEND_DIR),
+        FAST_START=str(fast_start).lower(),
+        CACHE_BACKEND="memory",
+        CACHE_SNAPSHOT_PATH=os.path.join(tmp, "snapshot.sqlite3"),
+        LYRICS_STORE_PATH=os.path.join(tmp, "lyrics.sqlite3"),
+        AUDIO_CACHE_DIR=os.path.join(tmp, "audio"),
+        CACHE_PATH=os.path.join(tmp, "cache.sqlite3"),
+        SUGGEST_INDEX_PATH=os.path.join(tmp, "suggest.sqlite3"),
+        ART_CACHE_DIR=os.path.join(tmp, "art"),
+        TRANSCODE_CACHE_DIR=os.path.join(tmp, "renditions"),
+    )
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+    )
+    result = {"health_ms": None, "warm_ms": None}
+    try:
+        deadline = start + 60
+        while time.perf_counter() < deadline and process.poll() is None:
+            try:
+                if result["health_ms"] is None:
+                    httpx.get(f"{base}/health", timeout=1)
+                    result["health_ms"] = round((time.perf_counter() - start) * 1000, 1)
+                if httpx.get(f"{base}/stats", timeout=5).json()["startup"]["warm_seconds"] is not None:
+                    result["warm_ms"] = round((time.perf_counter() - start) * 1000, 1)
+                    break
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.01)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+    return result
+
+
+def boot_times(runs: int) -> dict:
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="lyricgen-startup-") as tmp:
+        for fast_start in (False, True):
+            samples = [_boot(fast_start, tmp) for _ in range(runs)]
+            results["fast_start" if fast_start else "eager"] = {
+                key: sorted(s[key] for s in samples if s[key] is not None)[len(samples) // 2]
+                if any(s[key] is not None for s in samples) else None
+                for key in ("health_ms", "warm_ms")
+            }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m bench.startup", description="Profile imports and time to first /health")
+    parser.add_argument("--module", default="app.main", help="module to profile")
+    parser.add_argument("--top", type=int, default=15, help="packages to list")
+    parser.add_argument("--runs", type=int, default=3, help="boots per mode (the median is reported)")
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    args = parser.parse_args()
+
+    report = {
+        "commit": _git_commit(),
+        "python": sys.version.split()[0],
+        "imports": import_profile(args.module, args.top),
+        "boot": boot_times(args.runs),
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+// Writes .br and .gz siblings for the compressible files in dist/ so the
+// backend can serve them without compressing per request.
+import { readdirSync, readFileSync, statSync, writeFileSync } from 'node:fs'
+import { join } from 'node:path'
+import { brotliCompressSync, constants, gzipSync } from 'node:zlib'
+
+const DIST = process.argv[2] ?? 'dist'
+const COMPRESSIBLE = /\.(html|js|mjs|css|svg|json|txt|xml|map|webmanifest)$/
+const MIN_SIZE = 1024
+
+function* walk(dir) {
+  for (const name of readdirSync(dir)) {
+    const path = join(dir, name)
+    if (statSync(path).isDirectory()) yield* walk(path)
+    else yield path
+  }
+}
+
+let written = 0
+for (const path of walk(DIST)) {
+  if (!COMPRESSIBLE.test(path)) continue
+  const body = readFileSync(path)
+  if (body.length < MIN_SIZE) continue
+  const variants = {
+    '.br': brotliCompressSync(body, { params: { [constants.BROTLI_PARAM_QUALITY]: 11 } }),
+    '.gz': gzipSync(body, { level: 9 }),
+  }
+  for (const [suffix, compressed] of Object.entries(variants)) {
+    // Only keep a variant that actually saves bytes
+    if (compressed.length < body.length) {
+      writeFileSync(path + suffix, compressed)
+      written++
+    }
+  }
+}
+console.log(`compress: wrote ${written} precompressed files in ${DIST}`)
@@ -1,6 +1,6 @@
 import { useEffect, useRef, useState } from "react";
 import { motion } from "framer-motion";
-import { LyricLine } from "@/lib/types";
+import { LyricLine, TimedWord } from "@/lib/types";
 import { cn } from "@/lib/utils";
 import { useAppStore } from "@/lib/store";
 import LyricKinetic from "./LyricKinetic";
@@ -17,7 +17,7 @@ interface Props {
 export default function LyricDisplay({ lyrics, currentTime, type, isImmersive = false }: Props) {
   const containerRef = useRef<HTMLDivElement>(null);
   const [activeIndex, setActiveIndex] = useState(0);
-  const { lyricFontSize, isLyricClickToSeek, requestSeek, lyricStyle, lyricCasing } = useAppStore();
+  const { lyricFontSize, isLyricClickToSeek, requestSeek, lyricStyle, lyricCasing, lyricTiming } = useAppStore();
 
   const getProcessedText = (text: string) => {
     if (lyricCasing === 'uppercase') return text.toUpperCase();
@@ -25,6 +25,20 @@ export default function LyricDisplay({ lyrics, currentTime, type, isImmersive =
     return text;
   };
 
+  // The active line's words from the server timing, when it was computed for this style
+  const getActiveWords = (): TimedWord[] | undefined => {
+    if (!lyricTiming || lyricTiming.mode !== lyricStyle) return undefined;
+    const { lineOffsets, start, end } = lyricTiming;
+    const line = lyrics[activeIndex];
+    if (!line || lineOffsets.length !== lyrics.length + 1) return undefined;
+    const lineTime = line.time;
+    const words: TimedWord[] = [];
+    for (let k = lineOffsets[activeIndex]; k < lineOffsets[activeIndex + 1]; k++) {
+      words.push({ delay: Math.max(0, start[k] - lineTime), duration: end[k] - start[k] });
+    }
+    return words;
+  };
+
   useEffect(() => {
     if (type !== 'synced') return;
     let index = 0;
@@ -82,6 +96,7 @@ export default function LyricDisplay({ lyrics, currentTime, type, isImmersive =
        <LyricKinetic 
          activeLine={processedLine} 
          duration={duration}
+         words={getActiveWords()}
        />
      );
   }
@@ -103,6 +118,7 @@ export default function LyricDisplay({ lyrics, currentTime, type, isImmersive =
        <LyricDrill 
          activeLine={processedLine} 
          duration={duration}
+         words={getActiveWords()}
        />
      );
   }
@@ -124,6 +140,7 @@ export default function LyricDisplay({ lyrics, currentTime, type, isImmersive =
        <LyricStory 
          activeLine={processedLine} 
          duration={duration}
+         words={getActiveWords()}
        />
      );
   }
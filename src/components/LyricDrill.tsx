@@ -1,13 +1,15 @@
 import { motion, AnimatePresence } from "framer-motion";
-import { LyricLine } from "@/lib/types";
+import { LyricLine, TimedWord } from "@/lib/types";
 import { cn } from "@/lib/utils";
 
 interface Props {
   activeLine: LyricLine | null;
   duration: number;
+  // Server timing for this line; computed below when missing or when it doesn't match the words
+  words?: TimedWord[];
 }
 
-export default function LyricDrill({ activeLine, duration }: Props) {
+export default function LyricDrill({ activeLine, duration, words }: Props) {
   if (!activeLine) return null;
 
   // 1. DATA CLEANING
@@ -30,7 +32,11 @@ export default function LyricDrill({ activeLine, duration }: Props) {
   // Hitung durasi dan delay akumulatif untuk setiap kata
   let accumulatedDelay = 0;
   
-  const wordsWithTiming = wordMeta.map((item) => {
+  const serverWords = words && words.length === wordMeta.length ? words : null;
+
+  const wordsWithTiming = serverWords
+    ? wordMeta.map((item, i) => ({ text: item.word, duration: serverWords[i].duration, delay: serverWords[i].delay }))
+    : wordMeta.map((item) => {
     // Proporsi durasi berdasarkan bobot kata terhadap total bobot kalimat
     const wordDuration = (item.weight / totalWeight) * duration;
     const startDelay = accumulatedDelay;
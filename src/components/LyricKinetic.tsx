@@ -1,13 +1,15 @@
 import { motion, AnimatePresence } from "framer-motion";
-import { LyricLine } from "@/lib/types";
+import { LyricLine, TimedWord } from "@/lib/types";
 import { cn } from "@/lib/utils";
 
 interface Props {
   activeLine: LyricLine | null;
   duration: number;
+  // Server timing for this line; computed below when missing or when it doesn't match the words
+  words?: TimedWord[];
 }
 
-export default function LyricKinetic({ activeLine, duration }: Props) {
+export default function LyricKinetic({ activeLine, duration, words }: Props) {
   if (!activeLine) return null;
 
   // 1. DATA CLEANING
@@ -23,7 +25,13 @@ export default function LyricKinetic({ activeLine, duration }: Props) {
   const totalWeight = wordMeta.reduce((sum, item) => sum + item.weight, 0);
   let accumulatedDelay = 0;
 
-  const wordsWithTiming = wordMeta.map((item) => {
+  const isPunchy = (word: string) => word.length <= 3 || /[!A-Z]{2,}/.test(word); // Deteksi kata "kuat"
+
+  const serverWords = words && words.length === wordMeta.length ? words : null;
+
+  const wordsWithTiming = serverWords
+    ? wordMeta.map((item, i) => ({ text: item.word, delay: serverWords[i].delay, isPunchy: isPunchy(item.word) }))
+    : wordMeta.map((item) => {
     // Kita pakai 70% dari durasi total untuk reveal semua kata
     // Sisanya (30%) untuk diam/baca sebelum ganti baris
     const revealWindow = Math.max(duration * 0.8, 0.5); 
@@ -36,7 +44,7 @@ export default function LyricKinetic({ activeLine, duration }: Props) {
     return {
       text: item.word,
       delay: delay,
-      isPunchy: item.word.length <= 3 || /[!A-Z]{2,}/.test(item.word) // Deteksi kata "kuat"
+      isPunchy: isPunchy(item.word)
     };
   });
 
@@ -1,11 +1,13 @@
 import { useMemo } from "react";
 import { motion, AnimatePresence } from "framer-motion";
-import { LyricLine } from "@/lib/types";
+import { LyricLine, TimedWord } from "@/lib/types";
 import { cn } from "@/lib/utils";
 
 interface Props {
   activeLine: LyricLine | null;
   duration: number;
+  // Server timing for this line; computed below when missing or when it doesn't match the words
+  words?: TimedWord[];
 }
 
 // Helper to get random integer
@@ -20,7 +22,7 @@ const VARIANTS = [
   { size: "text-8xl md:text-[8rem]", weight: 4 },  // Huge
 ];
 
-export default function LyricStory({ activeLine, duration }: Props) {
+export default function LyricStory({ activeLine, duration, words }: Props) {
   if (!activeLine) return null;
 
   if (activeLine.isInstrumental) {
@@ -45,7 +47,7 @@ export default function LyricStory({ activeLine, duration }: Props) {
       );
   }
 
-  const { visualLines, totalWeight, startOffset, revealWindow } = useMemo(() => {
+  const { visualLines, totalWeight, startOffset, revealWindow, wordCount } = useMemo(() => {
     const text = activeLine.text;
     const allWords = text.split(" ").filter(w => w.trim() !== "");
     
@@ -106,10 +108,13 @@ export default function LyricStory({ activeLine, duration }: Props) {
     // 2. Window of 85% duration. 
     const revealWindow = duration * 0.85;
 
-    return { visualLines: lines, totalWeight, startOffset, revealWindow };
+    return { visualLines: lines, totalWeight, startOffset, revealWindow, wordCount: allWords.length };
 
   }, [activeLine.text, activeLine.time, duration]);
 
+  const serverWords = words && words.length === wordCount ? words : null;
+  let wordIndex = 0;
+
   // Start the delay counter at the Offset
   let accumulatedDelay = startOffset;
 
@@ -128,8 +133,9 @@ export default function LyricStory({ activeLine, duration }: Props) {
                 <div key={`${activeLine.time}-line-${lineIdx}`} className="leading-[0.85] w-full text-left">
                     {line.words.map((wordObj, wordIdx) => {
                         const wordDuration = (wordObj.weight / totalWeight) * revealWindow;
-                        const delay = accumulatedDelay;
+                        const delay = serverWords ? serverWords[wordIndex].delay : accumulatedDelay;
                         accumulatedDelay += wordDuration;
+                        wordIndex += 1;
 
                         return (
                             <span key={`${activeLine.time}-l${lineIdx}-w${wordIdx}`} className="inline-block mr-3 last:mr-0">
@@ -5,6 +5,7 @@ import { useNavigate } from 'react-router-dom';
 import { useAppStore } from '@/lib/store';
 import { audioManager } from '@/lib/audioManager';
 import { formatTime, cn } from '@/lib/utils';
+import { artUrl } from '@/lib/api';
 
 interface Props {
   src?: string;
@@ -131,7 +132,7 @@ export default function PlayerControls({ src }: Props) {
               <div className="w-12 h-12 bg-white/5 rounded-xl overflow-hidden shrink-0 flex items-center justify-center">
                 {currentTrack.coverArt && !coverError ? (
                   <img 
-                    src={currentTrack.coverArt} 
+                    src={artUrl(currentTrack.coverArt, 96)} 
                     className="w-full h-full object-cover" 
                     onError={() => setCoverError(true)}
                   />
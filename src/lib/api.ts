@@ -1,4 +1,4 @@
-import { SearchResponse, LyricsResponse } from './types';
+import { SearchResponse, LyricsResponse, WordTiming } from './types';
 
 const API_BASE = import.meta.env.VITE_API_URL || (import.meta.env.DEV ? 'http://localhost:8000/api/v1' : '/api/v1');
 
@@ -8,17 +8,27 @@ export async function searchTracks(query: string): Promise<SearchResponse> {
   return res.json();
 }
 
+// Instant matches from the tracks the server has already seen (upstream fills in when there are few)
+export async function suggestTracks(query: string, signal?: AbortSignal): Promise<SearchResponse> {
+  const res = await fetch(`${API_BASE}/suggest?q=${encodeURIComponent(query)}`, { signal });
+  if (!res.ok) throw new Error('Suggest failed');
+  return res.json();
+}
+
 export async function getLyrics(
   trackId?: string,
   query?: string,
   artist?: string,
-  title?: string
+  title?: string,
+  mode?: WordTiming['mode']
 ): Promise<LyricsResponse> {
   const params = new URLSearchParams();
   if (trackId) params.set('trackId', trackId);
   if (query) params.set('query', query);
   if (artist) params.set('artist', artist);
   if (title) params.set('title', title);
+  // Adds server-computed word timing for that renderer
+  if (mode) params.set('mode', mode);
 
   const res = await fetch(`${API_BASE}/lyrics?${params.toString()}`);
   if (!res.ok) throw new Error('Lyrics not found');
@@ -31,6 +41,22 @@ export async function getRecommendations(): Promise<SearchResponse> {
   return res.json();
 }
 
+// Track.coverArt is an /api/v1/art/{id} path for proxied art (sized on request), else an upstream URL
+export function artUrl(coverArt: string | null | undefined, size: 96 | 256 | 544 = 544): string {
+  if (!coverArt) return '';
+  if (!coverArt.startsWith('/api/v1/art/')) return coverArt;
+  return `${API_BASE}${coverArt.slice('/api/v1'.length)}?size=${size}`;
+}
+
+// On slow or data-saving connections ask for a lighter Opus rendition (served once the server has one on disk)
+function preferredBitrate(): number | undefined {
+  const connection = (navigator as Navigator & { connection?: { effectiveType?: string; saveData?: boolean } }).connection;
+  if (!connection) return undefined;
+  if (connection.effectiveType === 'slow-2g' || connection.effectiveType === '2g') return 32;
+  if (connection.effectiveType === '3g' || connection.saveData) return 64;
+  return undefined;
+}
+
 export async function getStreamUrl(
   videoId?: string,
   artist?: string,
@@ -40,8 +66,58 @@ export async function getStreamUrl(
   if (videoId) params.set('videoId', videoId);
   if (artist) params.set('artist', artist);
   if (title) params.set('title', title);
+  const bitrate = preferredBitrate();
+  if (bitrate) params.set('bitrate', String(bitrate));
   
   const res = await fetch(`${API_BASE}/stream?${params.toString()}`);
   if (!res.ok) throw new Error('Stream not found');
   return res.json();
 }
+
+export interface BatchResult<T> {
+  index: number;
+  status: number;
+  result?: T;
+  error?: { error: string; code: string };
+}
+
+// POST up to 50 items; onResult fires as each item finishes (NDJSON, one line per item)
+async function batch<T>(kind: string, items: object[], onResult: (r: BatchResult<T>) => void): Promise<void> {
+  const res = await fetch(`${API_BASE}/batch/${kind}`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ items }),
+  });
+  if (!res.ok || !res.body) throw new Error('Batch request failed');
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffered = '';
+  for (;;) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffered += decoder.decode(value, { stream: true });
+    const lines = buffered.split('\n');
+    buffered = lines.pop() ?? '';
+    for (const line of lines) if (line) onResult(JSON.parse(line));
+  }
+  if (buffered) onResult(JSON.parse(buffered));
+}
+
+export function batchLyrics(
+  items: { trackId?: string; query?: string; artist?: string; title?: string; duration?: number }[],
+  onResult: (r: BatchResult<LyricsResponse>) => void
+) {
+  return batch('lyrics', items, onResult);
+}
+
+export function batchStream(
+  items: { videoId?: string; artist?: string; title?: string }[],
+  onResult: (r: BatchResult<{ url: string; duration?: number }>) => void
+) {
+  return batch('stream', items, onResult);
+}
+
+export function batchSearch(items: { q: string }[], onResult: (r: BatchResult<SearchResponse>) => void) {
+  return batch('search', items, onResult);
+}
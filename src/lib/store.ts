@@ -1,11 +1,13 @@
 import { create } from 'zustand';
-import { Track, LyricLine } from './types';
+import { Track, LyricLine, WordTiming } from './types';
 
 interface AppState {
   currentTrack: Track | null;
   streamUrl: string | null;
   lyrics: LyricLine[];
   lyricsType: 'synced' | 'static' | null;
+  // Server word timing for the current lyrics (for the mode it was requested with)
+  lyricTiming: WordTiming | null;
   isPlaying: boolean;
   currentTime: number;
   duration: number;
@@ -32,6 +34,7 @@ interface AppState {
   setTrack: (track: Track) => void;
   setStreamUrl: (url: string | null) => void;
   setLyrics: (lyrics: LyricLine[], type: 'synced' | 'static' | null) => void;
+  setLyricTiming: (timing: WordTiming | null) => void;
   setPlaybackState: (isPlaying: boolean) => void;
   setLyricFontSize: (size: number) => void;
   setCustomBackground: (url: string | null) => void;
@@ -53,6 +56,7 @@ export const useAppStore = create<AppState>((set) => ({
   streamUrl: null,
   lyrics: [],
   lyricsType: null,
+  lyricTiming: null,
   isPlaying: false,
   currentTime: 0,
   duration: 0,
@@ -71,7 +75,8 @@ export const useAppStore = create<AppState>((set) => ({
 
   setTrack: (track) => set({ currentTrack: track, error: null }),
   setStreamUrl: (url) => set({ streamUrl: url }),
-  setLyrics: (lyrics, type) => set({ lyrics, lyricsType: type }),
+  setLyrics: (lyrics, type) => set({ lyrics, lyricsType: type, lyricTiming: null }),
+  setLyricTiming: (timing) => set({ lyricTiming: timing }),
   setPlaybackState: (isPlaying) => set({ isPlaying }),
   setLyricFontSize: (size) => set({ lyricFontSize: size }),
   setCustomBackground: (url) => set({ customBackground: url }),
@@ -97,6 +102,7 @@ export const useAppStore = create<AppState>((set) => ({
     streamUrl: null,
     lyrics: [],
     lyricsType: null,
+    lyricTiming: null,
     isPlaying: false,
     currentTime: 0,
     duration: 0,
@@ -21,7 +21,32 @@ export interface LyricsResponse {
   meta?: {
     provider?: string;
     copyright?: string | null;
+    duration?: number | null;
   };
+  // Word start times from enhanced LRC tags, when the source has them
+  wordTimes?: WordTimes | null;
+  // Present when requested with ?mode=story|drill|kinetic
+  timing?: WordTiming | null;
+}
+
+export interface WordTimes {
+  // Words of line i start at start[lineOffsets[i] .. lineOffsets[i + 1]] (none if the line has no tags)
+  lineOffsets: number[];
+  start: number[];
+}
+
+export interface WordTiming {
+  mode: 'story' | 'drill' | 'kinetic';
+  // Words of line i are start/end[lineOffsets[i] .. lineOffsets[i + 1]], in seconds from track start
+  lineOffsets: number[];
+  start: number[];
+  end: number[];
+}
+
+// One word of the active line as the renderers use it, in seconds from the line's start
+export interface TimedWord {
+  delay: number;
+  duration: number;
 }
 
 export interface SearchResponse {
@@ -1,8 +1,8 @@
-import { useState, useEffect } from "react";
+import { useState, useEffect, useRef } from "react";
 import { useNavigate } from "react-router-dom";
 import { motion, AnimatePresence } from "framer-motion";
 import { Search, Music, Disc, Loader2, Sparkles, Zap, Aperture } from "lucide-react";
-import { searchTracks, getRecommendations } from "@/lib/api";
+import { searchTracks, suggestTracks, getRecommendations, artUrl } from "@/lib/api";
 import { Track } from "@/lib/types";
 import { cn } from "@/lib/utils";
 import { useAppStore } from "@/lib/store";
@@ -17,6 +17,7 @@ export default function Home() {
   const [isLoadingRecs, setIsLoadingRecs] = useState(false);
   const [debouncedQuery, setDebouncedQuery] = useState(lastSearchQuery || "");
   const [isFocused, setIsFocused] = useState(false);
+  const searchedQuery = useRef(lastSearchQuery || "");
   const navigate = useNavigate();
 
   // Load recommendations on mount
@@ -49,6 +50,23 @@ export default function Home() {
     return () => clearTimeout(timer);
   }, [query]);
 
+  // Suggestions show while typing; the full search replaces them once it lands
+  useEffect(() => {
+    if (!query.trim() || query === searchedQuery.current) return;
+    const controller = new AbortController();
+    const timer = setTimeout(() => {
+      suggestTracks(query, controller.signal)
+        .then((data) => {
+          if (data.results.length > 0 && searchedQuery.current !== query) setResults(data.results);
+        })
+        .catch(() => {});
+    }, 80);
+    return () => {
+      clearTimeout(timer);
+      controller.abort();
+    };
+  }, [query]);
+
   useEffect(() => {
     if (!debouncedQuery.trim() || debouncedQuery === lastSearchQuery) {
       if (!debouncedQuery.trim()) setResults([]);
@@ -59,6 +77,7 @@ export default function Home() {
       setIsSearching(true);
       try {
         const data = await searchTracks(debouncedQuery);
+        searchedQuery.current = debouncedQuery;
         setResults(data.results);
         setLastSearch(debouncedQuery, data.results);
       } catch (e) {
@@ -296,7 +315,7 @@ function ResultCard({ track, index, onClick }: { track: Track; index: number; on
         
         {track.coverArt && !imgError ? (
           <img 
-            src={track.coverArt} 
+            src={artUrl(track.coverArt, 256)} 
             alt={track.title} 
             className="w-full h-full object-cover transition-transform duration-700 ease-out group-hover:scale-105 filter grayscale-[30%] group-hover:grayscale-0"
             onError={() => setImgError(true)}
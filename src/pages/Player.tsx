@@ -2,7 +2,7 @@ import { useEffect, useState } from "react";
 import { useSearchParams, useNavigate } from "react-router-dom";
 import { motion, AnimatePresence } from "framer-motion";
 import { ChevronDown, SlidersHorizontal, Maximize2, Minimize2, AlertCircle, Loader2, Music } from "lucide-react";
-import { getLyrics, getStreamUrl } from "@/lib/api";
+import { getLyrics, getStreamUrl, artUrl } from "@/lib/api";
 import { useAppStore } from "@/lib/store";
 import { Track } from "@/lib/types";
 import LyricDisplay from "@/components/LyricDisplay";
@@ -26,6 +26,7 @@ export default function Player() {
     currentTime,
     setLoading, setError, isLoading, error,
     lyricsType,
+    lyricStyle, lyricTiming, setLyricTiming,
     customBackground, isBackgroundBlurred
   } = useAppStore();
 
@@ -35,7 +36,7 @@ export default function Player() {
   const [isSettingsOpen, setIsSettingsOpen] = useState(false);
 
   // Background Source Logic
-  const activeBackground = customBackground || currentTrack?.coverArt;
+  const activeBackground = customBackground || artUrl(currentTrack?.coverArt);
 
   // Initialize track from URL params
   useEffect(() => {
@@ -65,8 +66,10 @@ export default function Player() {
       setError(null);
       
       try {
-        const lyricsData = await getLyrics(undefined, undefined, urlArtist, urlTitle);
+        const mode = lyricStyle === 'classic' ? undefined : lyricStyle;
+        const lyricsData = await getLyrics(undefined, undefined, urlArtist, urlTitle, mode);
         setLyrics(lyricsData.lyrics, lyricsData.type);
+        setLyricTiming(lyricsData.timing ?? null);
       } catch (e) {
         console.error(e);
         setError("Lyrics unavailable");
@@ -79,6 +82,17 @@ export default function Player() {
     fetchLyrics();
   }, [urlTitle, urlArtist]);
 
+  // Word timing for a renderer picked after the lyrics loaded (renderers time words locally until it arrives)
+  useEffect(() => {
+    if (lyricStyle === 'classic' || lyricsType !== 'synced' || !urlTitle || !urlArtist) return;
+    if (lyricTiming?.mode === lyricStyle) return;
+    let cancelled = false;
+    getLyrics(undefined, undefined, urlArtist, urlTitle, lyricStyle)
+      .then((data) => { if (!cancelled) setLyricTiming(data.timing ?? null); })
+      .catch((e) => console.error("Timing error:", e));
+    return () => { cancelled = true; };
+  }, [lyricStyle, lyricsType, lyricTiming, urlTitle, urlArtist]);
+
   // Fetch audio stream
   useEffect(() => {
     const fetchStream = async () => {
@@ -173,7 +187,7 @@ export default function Player() {
                   {currentTrack?.coverArt && !coverError ? (
                      <div className="w-full h-full rounded-2xl overflow-hidden shadow-[0_30px_60px_rgba(0,0,0,0.6)] border border-white/10 relative z-10">
                        <img 
-                         src={currentTrack.coverArt} 
+                         src={artUrl(currentTrack.coverArt)} 
                          className="w-full h-full object-cover" 
                          alt="Art"
                          onError={() => setCoverError(true)}